@@ -1,8 +1,24 @@
 from django.contrib import admin
 
-from .models import Category, Location, Post, Comment
+from .autocomplete import AutocompleteSelect
+from .models import BannedPhrase, Category, Location, Post, Comment
 
 admin.site.register(Category)
 admin.site.register(Location)
-admin.site.register(Post)
 admin.site.register(Comment)
+admin.site.register(BannedPhrase)
+
+
+@admin.register(Post)
+class PostAdmin(admin.ModelAdmin):
+    autocomplete_sources = {
+        'author': 'users',
+        'category': 'categories',
+        'location': 'locations',
+    }
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        source = self.autocomplete_sources.get(db_field.name)
+        if source:
+            kwargs['widget'] = AutocompleteSelect(source)
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
@@ -0,0 +1,216 @@
+import threading
+from bisect import bisect_left, insort
+
+from django import forms
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.urls import reverse
+
+from .models import Category, Location
+
+User = get_user_model()
+
+AUTOCOMPLETE_PAGE_SIZE = 20
+VERSION_KEY = 'blog:autocomplete:{}'
+CHANGE_KEY = 'blog:autocomplete-change:{}:{}'
+CHANGE_TIMEOUT = 60 * 60
+# A process further behind than this reloads its index from scratch.
+MAX_REPLAYED_CHANGES = 500
+
+# Source name -> (model, label field) searched by prefix.
+SOURCES = {
+    'users': (User, 'username'),
+    'categories': (Category, 'title'),
+    'locations': (Location, 'name'),
+}
+# Sources only the admin uses; other users may not list them.
+STAFF_SOURCES = {'users'}
+
+
+def normalize(label):
+    return label.casefold()
+
+
+class PrefixIndex:
+    # Labels kept sorted by their normalized form, so every label with a
+    # given prefix is one contiguous run found by bisection.
+
+    def __init__(self):
+        self.entries = []
+        self.labels = {}
+
+    def add(self, pk, label):
+        self.remove(pk)
+        self.labels[pk] = label
+        insort(self.entries, (normalize(label), label, pk))
+
+    def load(self, rows):
+        # Fills an empty index with one sort rather than an insort, which
+        # shifts the list, per row.
+        self.labels = dict(rows)
+        self.entries = sorted(
+            (normalize(label), label, pk) for pk, label in self.labels.items()
+        )
+
+    def remove(self, pk):
+        label = self.labels.pop(pk, None)
+        if label is None:
+            return
+        entry = (normalize(label), label, pk)
+        position = bisect_left(self.entries, entry)
+        if position < len(self.entries) and self.entries[position] == entry:
+            del self.entries[position]
+
+    def search(self, prefix, offset=0, limit=AUTOCOMPLETE_PAGE_SIZE):
+        # Returns up to `limit` (pk, label) pairs and whether more follow.
+        prefix = normalize(prefix)
+        position = bisect_left(self.entries, (prefix,)) + offset
+        found = []
+        for key, label, pk in self.entries[position:position + limit + 1]:
+            if not key.startswith(prefix):
+                break
+            found.append((pk, label))
+        return found[:limit], len(found) > limit
+
+
+class SourceIndex:
+    # The prefix index of one source in this process. Model signals log
+    # changed primary keys in the shared cache under increasing versions
+    # (see `record_change`), and every process replays the log before a
+    # search, reloading just the changed rows.
+
+    def __init__(self, name):
+        self.name = name
+        self.model, self.label_field = SOURCES[name]
+        self.index = None
+        self.version = None
+        self.lock = threading.Lock()
+
+    def rows(self, queryset):
+        return queryset.values_list('pk', self.label_field).iterator()
+
+    def rebuild(self, version):
+        index = PrefixIndex()
+        index.load(self.rows(self.model.objects.all()))
+        self.index, self.version = index, version
+
+    def replay(self, version):
+        keys = [
+            CHANGE_KEY.format(self.name, number)
+            for number in range(self.version + 1, version + 1)
+        ]
+        changes = cache.get_many(keys)
+        if len(changes) < len(keys):
+            return False
+        changed = set(changes.values())
+        present = dict(self.rows(self.model.objects.filter(pk__in=changed)))
+        for pk in changed:
+            if pk in present:
+                self.index.add(pk, present[pk])
+            else:
+                self.index.remove(pk)
+        self.version = version
+        return True
+
+    def refresh(self):
+        version = current_version(self.name)
+        with self.lock:
+            if self.index is not None and self.version == version:
+                return
+            if (
+                self.index is None
+                or not self.version <= version
+                <= self.version + MAX_REPLAYED_CHANGES
+                or not self.replay(version)
+            ):
+                self.rebuild(version)
+
+    def search(self, prefix, offset=0, limit=AUTOCOMPLETE_PAGE_SIZE):
+        self.refresh()
+        with self.lock:
+            return self.index.search(prefix, offset, limit)
+
+
+_indexes = {name: SourceIndex(name) for name in SOURCES}
+
+
+def get_index(name):
+    return _indexes[name]
+
+
+def current_version(name):
+    key = VERSION_KEY.format(name)
+    cache.add(key, 0, timeout=None)
+    return cache.get(key, 0)
+
+
+def record_change(name, pk):
+    key = VERSION_KEY.format(name)
+    cache.add(key, 0, timeout=None)
+    try:
+        version = cache.incr(key)
+    except ValueError:
+        return
+    cache.set(CHANGE_KEY.format(name, version), pk, CHANGE_TIMEOUT)
+
+
+def source_of(model):
+    for name, (source_model, _) in SOURCES.items():
+        if source_model is model:
+            return name
+    return None
+
+
+def valid_pk(model, value):
+    # Bound data is raw user input; the form reports an invalid choice.
+    try:
+        model._meta.pk.to_python(value)
+    except (ValidationError, ValueError):
+        return False
+    return True
+
+
+class AutocompleteSelect(forms.Select):
+    # A select rendering only its current option; static/js/autocomplete.js
+    # fills it from the autocomplete endpoint as the user types.
+
+    class Media:
+        js = ('js/autocomplete.js',)
+
+    def __init__(self, source, attrs=None):
+        super().__init__(attrs)
+        self.source = source
+
+    def build_attrs(self, base_attrs, extra_attrs=None):
+        attrs = super().build_attrs(base_attrs, extra_attrs)
+        attrs['data-autocomplete-url'] = reverse(
+            'blog:autocomplete', args=(self.source,)
+        )
+        return attrs
+
+    def optgroups(self, name, value, attrs=None):
+        model, label_field = SOURCES[self.source]
+        selected = {
+            str(item) for item in value
+            if item not in ('', None) and valid_pk(model, item)
+        }
+        field = self.choices.field
+        options = []
+        if not field.required or not selected:
+            options.append(('', field.empty_label or ''))
+        if selected:
+            options += [
+                (str(pk), label) for pk, label in
+                model.objects.filter(pk__in=selected)
+                .values_list('pk', label_field)
+            ]
+        return [
+            (None, [
+                self.create_option(
+                    name, option_value, label, option_value in selected,
+                    index, attrs=attrs,
+                )
+            ], index)
+            for index, (option_value, label) in enumerate(options)
+        ]
@@ -0,0 +1,128 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .routing import reading_from_replica
+
+GENERATION_KEY = 'blog:generation:{}'
+PAGE_KEY = 'blog:page:{}'
+STATS_KEY = 'blog:page-cache-stats:{}'
+STATS = ('hits', 'misses', 'invalidations')
+
+# Data shown on almost every page (categories, locations, user names):
+# changing it invalidates all cached pages at once.
+SHARED_SCOPE = 'shared'
+FEED_SCOPE = 'feed'
+
+
+def category_scope(slug):
+    return f'category:{slug}'
+
+
+def author_scope(username):
+    return f'author:{username}'
+
+
+def post_scope(post_id):
+    return f'post:{post_id}'
+
+
+def _initial_generation():
+    # Start from the clock rather than zero, so that an evicted counter
+    # never comes back to a value some cached page was stored under.
+    return int(time.time() * 1000)
+
+
+def get_generations(scopes):
+    keys = {scope: GENERATION_KEY.format(scope) for scope in scopes}
+    stored = cache.get_many(keys.values())
+    generations = {}
+    for scope, key in keys.items():
+        if key not in stored:
+            cache.add(key, _initial_generation(), timeout=None)
+            stored[key] = cache.get(key)
+        generations[scope] = stored[key]
+    return generations
+
+
+def _increment(key, initial, delta=1):
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        cache.add(key, initial, timeout=None)
+
+
+def bump_generations(*scopes):
+    scopes = set(scopes)
+    if not scopes:
+        return
+    for scope in scopes:
+        _increment(GENERATION_KEY.format(scope), _initial_generation())
+    _increment(STATS_KEY.format('invalidations'), len(scopes), len(scopes))
+
+
+def get_stats():
+    stored = cache.get_many([STATS_KEY.format(name) for name in STATS])
+    return {name: stored.get(STATS_KEY.format(name), 0) for name in STATS}
+
+
+def reset_stats():
+    cache.delete_many([STATS_KEY.format(name) for name in STATS])
+
+
+def page_cache_key(request, generations):
+    fingerprint = ';'.join(
+        f'{scope}={generation}'
+        for scope, generation in sorted(generations.items())
+    )
+    digest = hashlib.md5(
+        f'{request.get_full_path()}|{fingerprint}'.encode()
+    ).hexdigest()
+    return PAGE_KEY.format(digest)
+
+
+def cache_anonymous_page(get_scopes):
+    # `get_scopes` receives the view keyword arguments and returns the
+    # generation scopes the rendered page depends on.
+    from .scheduling import cache_timeout
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            timeout = settings.BLOG_PAGE_CACHE_TIMEOUT
+            if (
+                not timeout
+                or request.method not in ('GET', 'HEAD')
+                or request.user.is_authenticated
+            ):
+                return view(request, *args, **kwargs)
+
+            scopes = (SHARED_SCOPE, *get_scopes(**kwargs))
+            key = page_cache_key(request, get_generations(scopes))
+            response = cache.get(key)
+            if response is not None:
+                _increment(STATS_KEY.format('hits'), 1)
+                response['X-Page-Cache'] = 'HIT'
+                return response
+
+            _increment(STATS_KEY.format('misses'), 1)
+            response = view(request, *args, **kwargs)
+            if (
+                request.method == 'GET'
+                and response.status_code == 200
+                and not response.streaming
+                and not response.cookies
+            ):
+                timeout = cache_timeout(scopes, timeout)
+                if reading_from_replica():
+                    # The replica may not have the change that bumped
+                    # the generations yet.
+                    timeout = min(timeout, settings.BLOG_PRIMARY_PIN_SECONDS)
+                cache.set(key, response, timeout)
+            response['X-Page-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,114 @@
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.db.models import Max
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date
+
+from .cache import (
+    FEED_SCOPE, SHARED_SCOPE, author_scope, category_scope, get_generations,
+    post_scope,
+)
+from .models import Category, Location, Post
+from .scheduling import next_publication, published_before
+
+
+def latest_update(*querysets):
+    timestamps = [
+        queryset.aggregate(latest=Max('updated_at'))['latest']
+        for queryset in querysets
+    ]
+    return max(filter(None, timestamps), default=None)
+
+
+def feed_last_modified(scope, posts):
+    # A scheduled post going live changes the page without touching any
+    # updated_at, so the latest passed publication counts as well.
+    latest_publication = posts.filter(
+        is_publicly_visible=True, **published_before(scope)
+    ).aggregate(latest=Max('pub_date'))['latest']
+    return max(filter(None, (
+        latest_update(posts, Category.objects.all(), Location.objects.all()),
+        latest_publication,
+    )), default=None)
+
+
+def post_last_modified(post_id):
+    row = Post.objects.filter(pk=post_id).values_list(
+        'updated_at', 'category__updated_at', 'location__updated_at'
+    ).first()
+    return max(filter(None, row), default=None) if row else None
+
+
+def index_validators():
+    return (FEED_SCOPE,), feed_last_modified(FEED_SCOPE, Post.objects.all())
+
+
+def category_validators(category_slug):
+    scope = category_scope(category_slug)
+    return (scope,), feed_last_modified(
+        scope, Post.objects.filter(category__slug=category_slug)
+    )
+
+
+def profile_validators(username):
+    scope = author_scope(username)
+    return (scope,), feed_last_modified(
+        scope, Post.objects.filter(author__username=username)
+    )
+
+
+def post_validators(post_id):
+    return (post_scope(post_id),), post_last_modified(post_id)
+
+
+def page_etag(request, scopes, last_modified):
+    # MAX(updated_at) does not move when a post is deleted or leaves the
+    # subset, so the cache generations of the page scopes are mixed in.
+    # The viewer matters too: authors see their hidden posts, and pages
+    # for signed-in users embed the CSRF token.
+    generations = get_generations((SHARED_SCOPE, *scopes))
+    parts = [
+        f'{scope}={generation}'
+        for scope, generation in sorted(generations.items())
+    ]
+    parts += [
+        str(next_publication(scope)) for scope in sorted(scopes)
+    ]
+    parts += [
+        last_modified.isoformat() if last_modified else '',
+        str(request.user.pk),
+        request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''),
+    ]
+    return quote_etag(hashlib.md5('|'.join(parts).encode()).hexdigest())
+
+
+def conditional_page(get_validators):
+    # `get_validators` receives the view keyword arguments and returns
+    # the page scopes and the Last-Modified timestamp of the page, both
+    # cheap to compute, so 304 is answered before any heavy query runs.
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            scopes, last_modified = get_validators(**kwargs)
+            etag = page_etag(request, scopes, last_modified)
+            last_modified_ts = (
+                int(last_modified.timestamp()) if last_modified else None
+            )
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified_ts
+            )
+            if response is None:
+                response = view(request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                if last_modified_ts and not response.has_header(
+                    'Last-Modified'
+                ):
+                    response['Last-Modified'] = http_date(last_modified_ts)
+                response.setdefault('ETag', etag)
+            return response
+        return wrapper
+    return decorator
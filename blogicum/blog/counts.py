@@ -0,0 +1,86 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from .cache import SHARED_SCOPE, get_generations
+from .scheduling import next_publication
+
+COUNT_KEY = 'blog:count:{}'
+REFRESH_LOCK_KEY = 'blog:count-refresh:{}'
+REFRESH_LOCK_TIMEOUT = 60
+
+_refresher = ThreadPoolExecutor(max_workers=1, thread_name_prefix='blog-count')
+
+
+def count_fingerprint(scopes):
+    # A stored count is exact while none of the scopes changed and no
+    # scheduled post of them went live.
+    generations = get_generations((SHARED_SCOPE, *scopes))
+    return tuple(
+        (scope, generation, str(next_publication(scope)))
+        for scope, generation in sorted(generations.items())
+    )
+
+
+def exact_count(queryset):
+    # Stored under the current generations, so counted on the primary:
+    # a lagging replica would store a stale total for them.
+    return queryset.using(DEFAULT_DB_ALIAS).count()
+
+
+def _refresh(name, queryset, fingerprint):
+    try:
+        cache.set(
+            COUNT_KEY.format(name), (fingerprint, exact_count(queryset)),
+            timeout=settings.BLOG_COUNT_CACHE_TIMEOUT,
+        )
+    finally:
+        cache.delete(REFRESH_LOCK_KEY.format(name))
+
+
+def _refresh_in_background(name, queryset, fingerprint):
+    try:
+        _refresh(name, queryset, fingerprint)
+    finally:
+        connections.close_all()
+
+
+def refresh_count(name, queryset, fingerprint):
+    if not cache.add(
+        REFRESH_LOCK_KEY.format(name), True, timeout=REFRESH_LOCK_TIMEOUT
+    ):
+        return
+    if settings.BLOG_COUNT_REFRESH_ASYNC:
+        _refresher.submit(_refresh_in_background, name, queryset, fingerprint)
+    else:
+        _refresh(name, queryset, fingerprint)
+
+
+def cached_count(name, queryset, scopes):
+    # The number of rows in `queryset`, counted exactly only when nothing
+    # is stored under `name`. A count left behind by a change of the
+    # scopes is still returned, while a fresh one is taken elsewhere.
+    fingerprint = count_fingerprint(scopes)
+    stored = cache.get(COUNT_KEY.format(name))
+    if stored is None:
+        count = exact_count(queryset)
+        cache.set(
+            COUNT_KEY.format(name), (fingerprint, count),
+            timeout=settings.BLOG_COUNT_CACHE_TIMEOUT,
+        )
+        return count
+    stored_fingerprint, count = stored
+    if stored_fingerprint != fingerprint:
+        refresh_count(name, queryset, fingerprint)
+    return count
+
+
+def store_count(name, queryset, scopes):
+    count = exact_count(queryset)
+    cache.set(
+        COUNT_KEY.format(name), (count_fingerprint(scopes), count),
+        timeout=settings.BLOG_COUNT_CACHE_TIMEOUT,
+    )
+    return count
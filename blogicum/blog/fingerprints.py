@@ -0,0 +1,130 @@
+import hashlib
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+
+from .models import Fingerprint, FingerprintBucket
+from .search import TERM_RE, fold
+
+# MinHash over pairs of neighbouring words: the share of equal values in
+# two signatures estimates the Jaccard similarity of the texts. The
+# signature is cut into BANDS bands of ROWS values, each stored as one
+# bucket key; texts sharing a bucket are the only ones compared, so a
+# lookup reads a few index entries whatever the number of texts. With
+# 8 bands of 4 rows, texts at 0.8 similarity share a bucket with 99%
+# probability, unrelated texts practically never do.
+HASHES = 32
+BANDS = 8
+ROWS = HASHES // BANDS
+SIMILARITY = 0.6
+SHINGLE_WORDS = 2
+# Shorter texts ("Спасибо!") repeat legitimately and are not checked.
+MIN_WORDS = 6
+
+_SEEDS = np.random.default_rng(20190).integers(
+    0, 1 << 63, HASHES, dtype=np.uint64
+)
+
+
+def _hash64(data):
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), 'big')
+
+
+def _mix(values):
+    # The SplitMix64 finalizer: a permutation of 64-bit values random
+    # enough for every seed to act as an independent hash function.
+    with np.errstate(over='ignore'):
+        values = (values ^ values >> np.uint64(30)) * np.uint64(
+            0xbf58476d1ce4e5b9
+        )
+        values = (values ^ values >> np.uint64(27)) * np.uint64(
+            0x94d049bb133111eb
+        )
+    return values ^ values >> np.uint64(31)
+
+
+def minhash(text):
+    words = TERM_RE.findall(fold(text.lower()))
+    if len(words) < MIN_WORDS:
+        return None
+    shingles = {
+        ' '.join(words[start:start + SHINGLE_WORDS])
+        for start in range(len(words) - SHINGLE_WORDS + 1)
+    }
+    hashes = np.fromiter(
+        (_hash64(shingle.encode()) for shingle in shingles),
+        dtype=np.uint64, count=len(shingles),
+    )
+    return _mix(hashes[:, None] ^ _SEEDS).min(axis=0)
+
+
+def bucket_keys(kind, signature):
+    # Signed, to fit a BigIntegerField.
+    return [
+        _hash64(
+            f'{kind}:{band}:'.encode()
+            + signature[band * ROWS:(band + 1) * ROWS].tobytes()
+        ) - (1 << 63)
+        for band in range(BANDS)
+    ]
+
+
+def similarity(first, second):
+    return float(np.mean(first == second))
+
+
+def from_bytes(value):
+    return np.frombuffer(bytes(value), dtype=np.uint64)
+
+
+def store_fingerprint(kind, object_id, text):
+    signature = minhash(text)
+    with transaction.atomic():
+        forget_fingerprint(kind, object_id)
+        if signature is None:
+            return
+        fingerprint = Fingerprint.objects.create(
+            kind=kind, object_id=object_id, signature=signature.tobytes()
+        )
+        FingerprintBucket.objects.bulk_create(
+            FingerprintBucket(fingerprint=fingerprint, key=key)
+            for key in bucket_keys(kind, signature)
+        )
+
+
+def forget_fingerprint(kind, object_id):
+    Fingerprint.objects.filter(kind=kind, object_id=object_id).delete()
+
+
+def candidates(kind, signature):
+    return FingerprintBucket.objects.filter(
+        key__in=bucket_keys(kind, signature)
+    )
+
+
+def find_signature(kind, signature, exclude=None):
+    found = candidates(kind, signature)
+    if exclude is not None:
+        found = found.exclude(fingerprint__object_id=exclude)
+    rows = found.values_list(
+        'fingerprint__object_id', 'fingerprint__signature'
+    ).distinct()
+    for object_id, stored in rows:
+        if similarity(signature, from_bytes(stored)) >= SIMILARITY:
+            return object_id
+    return None
+
+
+def find_duplicate(kind, text, exclude=None):
+    # Id of a stored object whose text is a near-duplicate of `text`.
+    signature = minhash(text)
+    if signature is None:
+        return None
+    return find_signature(kind, signature, exclude)
+
+
+def duplicate_action():
+    # 'reject' fails form validation, 'flag' saves the text unpublished
+    # for a moderator, anything else turns the check off.
+    return settings.BLOG_NEAR_DUPLICATES
@@ -1,18 +1,81 @@
 from django import forms
 
-from .models import Post, Comment
+from .autocomplete import AutocompleteSelect
+from .fingerprints import duplicate_action, find_duplicate
+from .models import Comment, Fingerprint, Post
+from .moderation import find_banned
 
+REPORTED_MATCHES = 5
+
+
+class BannedPhrasesMixin:
+
+    def clean_text(self):
+        text = self.cleaned_data['text']
+        matches = find_banned(text)
+        if matches:
+            raise forms.ValidationError(
+                'Текст содержит запрещённые фразы: %(found)s.',
+                code='banned_phrase',
+                params={'found': ', '.join(
+                    f'«{match.phrase}» (символ {match.start + 1})'
+                    for match in matches[:REPORTED_MATCHES]
+                )},
+            )
+        return text
+
+
+class NearDuplicateCheckMixin:
+    # Spam floods the site with copies of one text in slight variations.
+    # The fields are joined by newlines, as in the stored fingerprints.
+    fingerprint_kind = None
+    fingerprint_fields = ('text',)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        action = duplicate_action()
+        if action not in ('reject', 'flag') or self.errors:
+            return cleaned_data
+        duplicate = find_duplicate(
+            self.fingerprint_kind,
+            '\n'.join(
+                self.cleaned_data[field] for field in self.fingerprint_fields
+            ),
+            exclude=self.instance.pk,
+        )
+        if duplicate is None:
+            return cleaned_data
+        if action == 'reject':
+            raise forms.ValidationError(
+                'Почти такой же текст уже опубликован.',
+                code='near_duplicate',
+            )
+        # Saved hidden until a moderator publishes it.
+        self.instance.is_published = False
+        if 'is_published' in cleaned_data:
+            cleaned_data['is_published'] = False
+        return cleaned_data
+
+
+class PostForm(BannedPhrasesMixin, NearDuplicateCheckMixin,
+               forms.ModelForm):
+    fingerprint_kind = Fingerprint.POST
+    fingerprint_fields = ('title', 'text')
 
-class PostForm(forms.ModelForm):
     class Meta:
         model = Post
         exclude = ('created_at', 'author',)
         widgets = {
-            'pub_date': forms.DateInput(attrs={'type': 'datetime-local'})
+            'pub_date': forms.DateInput(attrs={'type': 'datetime-local'}),
+            'category': AutocompleteSelect('categories'),
+            'location': AutocompleteSelect('locations'),
         }
 
 
-class CommentForm(forms.ModelForm):
+class CommentForm(BannedPhrasesMixin, NearDuplicateCheckMixin,
+                  forms.ModelForm):
+    fingerprint_kind = Fingerprint.COMMENT
+
     class Meta:
         model = Comment
         fields = ('text',)
@@ -0,0 +1,105 @@
+from io import BytesIO
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.templatetags.static import static
+from PIL import Image, ImageOps
+
+VARIANTS_DIR = 'variants'
+PLACEHOLDER = 'img/placeholder.svg'
+PLACEHOLDER_SIZE = (640, 360)
+# The `src` of browsers without srcset support.
+FALLBACK_WIDTH = 640
+
+
+def has_alpha(image):
+    return 'A' in image.getbands() or (
+        image.mode == 'P' and 'transparency' in image.info
+    )
+
+
+def encode(image):
+    # Photos are re-encoded as progressive JPEG, transparent images stay
+    # PNG. Returns the bytes and the file extension.
+    buffer = BytesIO()
+    if has_alpha(image):
+        image.save(buffer, 'PNG', optimize=True)
+        return buffer.getvalue(), '.png'
+    image.convert('RGB').save(
+        buffer, 'JPEG', quality=settings.BLOG_IMAGE_QUALITY,
+        optimize=True, progressive=True,
+    )
+    return buffer.getvalue(), '.jpg'
+
+
+def variant_name(name, width, extension):
+    path = PurePosixPath(name)
+    return str(
+        path.parent / VARIANTS_DIR / f'{path.stem}-{width}w{extension}'
+    )
+
+
+def make_variants(image):
+    # Resized copies of a stored image, one per BLOG_IMAGE_WIDTHS entry
+    # narrower than the original, followed by the original itself:
+    # a list of {'name', 'width', 'height'} from the narrowest. An
+    # unreadable file is listed alone, without a size.
+    storage = image.storage
+    try:
+        with storage.open(image.name) as file, Image.open(file) as opened:
+            # Browsers apply the EXIF orientation to the original too.
+            original = ImageOps.exif_transpose(opened)
+            width, height = original.size
+            variants = []
+            for target in sorted(settings.BLOG_IMAGE_WIDTHS):
+                if target >= width:
+                    break
+                resized = original.resize(
+                    (target, max(round(height * target / width), 1)),
+                    Image.Resampling.LANCZOS,
+                )
+                content, extension = encode(resized)
+                name = storage.save(
+                    variant_name(image.name, target, extension),
+                    ContentFile(content),
+                )
+                variants.append(
+                    {'name': name, 'width': target, 'height': resized.height}
+                )
+    except OSError:
+        return [{'name': image.name, 'width': None, 'height': None}]
+    variants.append({'name': image.name, 'width': width, 'height': height})
+    return variants
+
+
+def responsive_attrs(image, variants, placeholder=False):
+    # What an <img> needs: the fallback `src`, `srcset` and the intrinsic
+    # size, which reserves the space before the image arrives. While the
+    # variants are being made, `placeholder` shows a stub instead of the
+    # full-size original.
+    attrs = {'src': image.url}
+    if not variants or variants[-1]['name'] != image.name:
+        if placeholder:
+            attrs.update(
+                src=static(PLACEHOLDER), width=PLACEHOLDER_SIZE[0],
+                height=PLACEHOLDER_SIZE[1], pending=True,
+            )
+        return attrs
+    storage = image.storage
+    original = variants[-1]
+    # An unreadable upload is listed without a size and gets no srcset.
+    sized = [item for item in variants if item['width']]
+    fallback = next(
+        (item for item in sized if item['width'] >= FALLBACK_WIDTH),
+        original,
+    )
+    attrs['src'] = storage.url(fallback['name'])
+    if original['width']:
+        attrs.update(width=original['width'], height=original['height'])
+    if len(sized) > 1:
+        attrs['srcset'] = ', '.join(
+            f"{storage.url(item['name'])} {item['width']}w"
+            for item in sized
+        )
+    return attrs
@@ -0,0 +1,145 @@
+import logging
+import random
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# Task name -> function called with the job payload as keyword arguments.
+TASKS = {}
+# Task name -> function called with the payload once a job has failed
+# for good.
+FAILURE_HANDLERS = {}
+# Queued jobs a worker looks at per claim attempt; losing the race for
+# one of them to another worker just moves on to the next.
+CLAIM_CANDIDATES = 10
+
+
+def task(name, on_failure=None):
+    def decorator(func):
+        TASKS[name] = func
+        if on_failure is not None:
+            FAILURE_HANDLERS[name] = on_failure
+        return func
+    return decorator
+
+
+def give_up(job):
+    handler = FAILURE_HANDLERS.get(job.task)
+    if handler is None:
+        return
+    try:
+        handler(**job.payload)
+    except Exception:
+        logger.exception('Failure handler of job %s failed', job)
+
+
+def enqueue(task_name, **payload):
+    if task_name not in TASKS:
+        raise KeyError(f'Unknown task {task_name!r}')
+    return Job.objects.create(
+        task=task_name, payload=payload, run_after=timezone.now()
+    )
+
+
+def claim(worker):
+    # Takes the oldest due job by flipping its status with a conditional
+    # UPDATE: of several workers racing for a row exactly one changes it,
+    # on any backend and without holding row locks.
+    now = timezone.now()
+    candidates = Job.objects.filter(
+        status=Job.QUEUED, run_after__lte=now
+    ).order_by('run_after', 'id').values_list('pk', flat=True)
+    for pk in candidates[:CLAIM_CANDIDATES]:
+        claimed = Job.objects.filter(pk=pk, status=Job.QUEUED).update(
+            status=Job.RUNNING,
+            worker=worker,
+            started_at=now,
+            attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return Job.objects.get(pk=pk)
+    return None
+
+
+def backoff(attempts):
+    # About BLOG_JOB_BACKOFF * 2 ** (attempts - 1) seconds, jittered so
+    # that jobs failing together are not retried together.
+    delay = settings.BLOG_JOB_BACKOFF * 2 ** (attempts - 1)
+    return timedelta(seconds=delay * random.uniform(0.5, 1.5))
+
+
+def run(job):
+    started = time.perf_counter()
+    try:
+        TASKS[job.task](**job.payload)
+    except Exception:
+        job.error = traceback.format_exc()
+        if job.attempts < settings.BLOG_JOB_MAX_ATTEMPTS:
+            job.status = Job.QUEUED
+            job.run_after = timezone.now() + backoff(job.attempts)
+        else:
+            job.status = Job.FAILED
+        logger.warning('Job %s failed:\n%s', job, job.error)
+    else:
+        job.status = Job.DONE
+    job.duration = time.perf_counter() - started
+    job.finished_at = timezone.now()
+    job.save(update_fields=(
+        'status', 'run_after', 'error', 'duration', 'finished_at',
+    ))
+    if job.status == Job.FAILED:
+        give_up(job)
+    return job
+
+
+def requeue_stale():
+    # Jobs of a worker that died midway; they run again from scratch,
+    # so tasks must tolerate a repeated run.
+    now = timezone.now()
+    stale = Job.objects.filter(
+        status=Job.RUNNING,
+        started_at__lt=now - timedelta(seconds=settings.BLOG_JOB_TIMEOUT),
+    )
+    exhausted = stale.filter(attempts__gte=settings.BLOG_JOB_MAX_ATTEMPTS)
+    for job in exhausted:
+        # Conditional, like claim(): another worker may be failing it too.
+        if Job.objects.filter(pk=job.pk, status=Job.RUNNING).update(
+            status=Job.FAILED, finished_at=now,
+            error='Обработчик не ответил.',
+        ):
+            give_up(job)
+    return stale.update(status=Job.QUEUED, run_after=now)
+
+
+def work(worker, stop=None, poll_interval=1.0, once=False):
+    # Runs due jobs until `stop` is set; with `once`, until none is due,
+    # and returns the jobs run.
+    finished = []
+    last_requeue = None
+    while stop is None or not stop.is_set():
+        if (
+            last_requeue is None
+            or time.monotonic() - last_requeue > settings.BLOG_JOB_TIMEOUT / 2
+        ):
+            requeue_stale()
+            last_requeue = time.monotonic()
+        job = claim(worker)
+        if job is not None:
+            run(job)
+            if once:
+                finished.append(job)
+        elif once:
+            break
+        elif stop is not None:
+            stop.wait(poll_interval)
+        else:
+            time.sleep(poll_interval)
+    return finished
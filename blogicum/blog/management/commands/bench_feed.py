@@ -0,0 +1,92 @@
+import time
+import tracemalloc
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from blog.models import Category, Location, Post
+
+User = get_user_model()
+
+PAGE_SIZE = 10
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает время и память на страницу ленты: полные модели '
+            'Post против облегчённых строк card_rows(). Тестовые данные '
+            'создаются в транзакции и откатываются.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=500)
+        parser.add_argument('--pages', type=int, default=200)
+        parser.add_argument('--text-length', type=int, default=20000)
+
+    def handle(self, *args, posts, pages, text_length, **options):
+        with transaction.atomic():
+            post_ids = self.create_posts(posts, text_length)
+            feed = Post.objects.filter(pk__in=post_ids).order_by('-pub_date')
+            modes = {
+                'models': feed.select_related(
+                    'author', 'category', 'location'
+                ),
+                'card_rows': feed.card_rows(),
+            }
+            results = {
+                name: self.measure(queryset, posts, pages)
+                for name, queryset in modes.items()
+            }
+            transaction.set_rollback(True)
+
+        for name, (seconds, peak) in results.items():
+            self.stdout.write(
+                f'{name:>10}: {seconds * 1000:.2f} мс, '
+                f'{peak / 1024:.1f} КиБ на страницу'
+            )
+        (model_time, model_peak), (row_time, row_peak) = results.values()
+        self.stdout.write(
+            f'Экономия: {1 - row_time / model_time:.0%} времени, '
+            f'{1 - row_peak / model_peak:.0%} памяти.'
+        )
+
+    def create_posts(self, count, text_length):
+        suffix = int(time.time())
+        author = User.objects.create(username=f'bench-{suffix}')
+        category = Category.objects.create(
+            title='Bench', description='Bench', slug=f'bench-{suffix}'
+        )
+        location = Location.objects.create(name='Bench')
+        words = ('lorem ipsum dolor sit amet ' * (text_length // 26 + 1))
+        now = timezone.now()
+        Post.objects.bulk_create(
+            Post(
+                title=f'Post {number}',
+                text=words[:text_length],
+                pub_date=now - timedelta(minutes=number),
+                author=author,
+                category=category,
+                location=location,
+                is_publicly_visible=True,
+            )
+            for number in range(count)
+        )
+        return list(Post.objects.filter(author=author).values_list(
+            'pk', flat=True
+        ))
+
+    def measure(self, queryset, posts, pages):
+        last_offset = max(posts - PAGE_SIZE, 0)
+        elapsed = peak = 0
+        for page in range(pages):
+            offset = page * PAGE_SIZE % (last_offset + 1)
+            tracemalloc.start()
+            started = time.perf_counter()
+            rows = list(queryset[offset:offset + PAGE_SIZE])
+            for row in rows:
+                row.author.username, row.category.slug, row.location.name
+            elapsed += time.perf_counter() - started
+            peak += tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        return elapsed / pages, peak / pages
@@ -0,0 +1,110 @@
+import statistics
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Max
+
+from blog.fingerprints import (
+    HASHES, SIMILARITY, bucket_keys, candidates, find_signature,
+)
+from blog.models import Fingerprint, FingerprintBucket
+
+KIND = 'bench'
+# Share of signature values a planted near-duplicate keeps.
+PLANTED_SIMILARITY = 0.8
+
+
+class Command(BaseCommand):
+    help = ('Измеряет время поиска почти одинаковых текстов среди '
+            'миллионов отпечатков. Случайные отпечатки создаются в '
+            'транзакции и откатываются.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--signatures', type=int, default=10_000_000)
+        parser.add_argument('--lookups', type=int, default=1000)
+        parser.add_argument('--batch-size', type=int, default=50_000)
+        parser.add_argument('--seed', type=int, default=None)
+
+    def handle(self, *args, signatures, lookups, batch_size, seed,
+               **options):
+        generator = np.random.default_rng(seed)
+        with transaction.atomic():
+            planted = self.fill(generator, signatures, lookups, batch_size)
+            near = [self.perturb(generator, value) for value in planted]
+            fresh = list(self.random_signatures(generator, lookups))
+            results = {
+                'похожий текст': self.measure(near),
+                'новый текст': self.measure(fresh),
+            }
+            transaction.set_rollback(True)
+
+        self.stdout.write(
+            f'Отпечатков: {signatures}, порог сходства {SIMILARITY}.'
+        )
+        for name, (found, timings, candidate_counts) in results.items():
+            timings.sort()
+            self.stdout.write(
+                f'{name:>14}: найдено {found}/{len(timings)}, '
+                f'в среднем {statistics.mean(timings) * 1000:.2f} мс, '
+                f'p99 {timings[int(len(timings) * 0.99)] * 1000:.2f} мс, '
+                f'{statistics.mean(candidate_counts):.1f} кандидатов'
+            )
+
+    def random_signatures(self, generator, count):
+        return generator.integers(
+            0, 1 << 63, (count, HASHES), dtype=np.uint64
+        )
+
+    def fill(self, generator, signatures, lookups, batch_size):
+        # Inserted with plain executemany: building ten million models
+        # would measure the ORM instead of the lookup.
+        first_id = (
+            Fingerprint.objects.aggregate(last=Max('pk'))['last'] or 0
+        ) + 1
+        fingerprint_sql = (
+            f'INSERT INTO {Fingerprint._meta.db_table} '
+            f'(id, kind, object_id, signature) VALUES (%s, %s, %s, %s)'
+        )
+        bucket_sql = (
+            f'INSERT INTO {FingerprintBucket._meta.db_table} '
+            f'(fingerprint_id, key) VALUES (%s, %s)'
+        )
+        planted = []
+        with connection.cursor() as cursor:
+            for start in range(0, signatures, batch_size):
+                batch = self.random_signatures(
+                    generator, min(batch_size, signatures - start)
+                )
+                ids = range(first_id + start, first_id + start + len(batch))
+                cursor.executemany(fingerprint_sql, [
+                    (pk, KIND, pk, value.tobytes())
+                    for pk, value in zip(ids, batch)
+                ])
+                cursor.executemany(bucket_sql, [
+                    (pk, key)
+                    for pk, value in zip(ids, batch)
+                    for key in bucket_keys(KIND, value)
+                ])
+                planted += list(batch[:max(lookups - len(planted), 0)])
+        return planted
+
+    def perturb(self, generator, signature):
+        signature = signature.copy()
+        changed = generator.choice(
+            HASHES, round(HASHES * (1 - PLANTED_SIMILARITY)), replace=False
+        )
+        signature[changed] = self.random_signatures(generator, 1)[0, changed]
+        return signature
+
+    def measure(self, signatures):
+        found = 0
+        timings = []
+        candidate_counts = []
+        for signature in signatures:
+            started = time.perf_counter()
+            found += find_signature(KIND, signature) is not None
+            timings.append(time.perf_counter() - started)
+            candidate_counts.append(candidates(KIND, signature).count())
+        return found, timings, candidate_counts
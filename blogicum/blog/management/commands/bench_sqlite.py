@@ -0,0 +1,147 @@
+import threading
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+from django.utils import timezone
+
+from blog.models import Category, Comment, Location, Post
+from blog.sqlite import serialized_write
+
+User = get_user_model()
+
+PAGE_SIZE = 10
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает пропускную способность чтения ленты без записи и '
+            'во время всплеска записи комментариев. Тестовые данные '
+            'сохраняются в базе на время замера и затем удаляются.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument('--seconds', type=float, default=5)
+        parser.add_argument('--posts', type=int, default=200)
+        parser.add_argument(
+            '--unserialized', action='store_true',
+            help='Писать без очереди записи и повторов.',
+        )
+
+    def handle(self, *args, readers, writers, seconds, posts,
+               unserialized, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Замер рассчитан на базу SQLite.')
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            journal_mode = cursor.fetchone()[0]
+        self.stdout.write(f'journal_mode={journal_mode}')
+
+        author, post_ids = self.create_posts(posts)
+        try:
+            quiet = self.run(author, post_ids, readers, 0, seconds, True)
+            burst = self.run(
+                author, post_ids, readers, writers, seconds,
+                not unserialized,
+            )
+        finally:
+            Category.objects.filter(slug=f'bench-{author.username}').delete()
+            Location.objects.filter(name=f'bench-{author.username}').delete()
+            author.delete()
+
+        quiet_reads = quiet['reads'] / seconds
+        burst_reads = burst['reads'] / seconds
+        self.stdout.write(f'Чтение без записи: {quiet_reads:.0f} стр/с')
+        self.stdout.write(
+            f'Чтение при записи: {burst_reads:.0f} стр/с '
+            f'({burst_reads / quiet_reads:.0%})'
+        )
+        self.stdout.write(
+            f'Запись: {burst["writes"] / seconds:.0f} комм/с, '
+            f'ошибок блокировки: {burst["errors"]}'
+        )
+
+    def create_posts(self, count):
+        author = User.objects.create(username=f'bench-{int(time.time())}')
+        category = Category.objects.create(
+            title='Bench', description='Bench', slug=f'bench-{author}'
+        )
+        Location.objects.create(name=f'bench-{author}')
+        now = timezone.now()
+        Post.objects.bulk_create(
+            Post(
+                title=f'Post {number}',
+                text='lorem ipsum dolor sit amet',
+                pub_date=now - timedelta(minutes=number),
+                author=author,
+                category=category,
+                is_publicly_visible=True,
+            )
+            for number in range(count)
+        )
+        return author, list(Post.objects.filter(author=author).values_list(
+            'pk', flat=True
+        ))
+
+    def run(self, author, post_ids, readers, writers, seconds, serialized):
+        self.stop = threading.Event()
+        self.totals = {'reads': 0, 'writes': 0, 'errors': 0}
+        self.totals_lock = threading.Lock()
+        threads = [
+            threading.Thread(target=self.read, args=(author, post_ids))
+            for _ in range(readers)
+        ]
+        threads += [
+            threading.Thread(
+                target=self.write,
+                args=(author, post_ids, number, serialized),
+            )
+            for number in range(writers)
+        ]
+        for thread in threads:
+            thread.start()
+        time.sleep(seconds)
+        self.stop.set()
+        for thread in threads:
+            thread.join()
+        return self.totals
+
+    def add(self, **counts):
+        with self.totals_lock:
+            for name, value in counts.items():
+                self.totals[name] += value
+
+    def read(self, author, post_ids):
+        feed = Post.objects.filter(author=author).card_rows()
+        last_offset = max(len(post_ids) - PAGE_SIZE, 0)
+        reads = 0
+        try:
+            while not self.stop.is_set():
+                offset = reads * PAGE_SIZE % (last_offset + 1)
+                list(feed[offset:offset + PAGE_SIZE])
+                reads += 1
+        finally:
+            self.add(reads=reads)
+            connections.close_all()
+
+    def write(self, author, post_ids, number, serialized):
+        create = Comment.objects.create
+        if serialized:
+            create = serialized_write(create)
+        writes = errors = 0
+        try:
+            while not self.stop.is_set():
+                try:
+                    create(
+                        post_id=post_ids[writes % len(post_ids)],
+                        author=author,
+                        text=f'Bench {number}-{writes}',
+                    )
+                    writes += 1
+                except OperationalError:
+                    errors += 1
+        finally:
+            self.add(writes=writes, errors=errors)
+            connections.close_all()
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from blog.related import (
+    BLOCK_SIZE, DIMS, RELATED_PER_POST, compute_all, compute_pending,
+)
+
+
+class Command(BaseCommand):
+    help = ('Подбирает похожие публикации по TF-IDF векторам заголовка '
+            'и текста; с --incremental обрабатывает только новые и '
+            'изменённые публикации. При сохранении публикации похожие не '
+            'пересчитываются: правки учитываются при следующем запуске, '
+            'поэтому команду стоит запускать по расписанию.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--incremental', action='store_true')
+        parser.add_argument('--k', type=int, default=RELATED_PER_POST)
+        parser.add_argument('--dims', type=int, default=DIMS)
+        parser.add_argument('--block-size', type=int, default=BLOCK_SIZE)
+
+    def handle(self, *args, incremental, k, dims, block_size, **options):
+        if incremental:
+            computed = compute_pending(k=k, block_size=block_size)
+        else:
+            computed = compute_all(k=k, dims=dims, block_size=block_size)
+        self.stdout.write(f'Обработано публикаций: {computed}.')
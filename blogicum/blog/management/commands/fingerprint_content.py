@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from blog.fingerprints import bucket_keys, minhash
+from blog.models import Comment, Fingerprint, FingerprintBucket, Post
+
+
+class Command(BaseCommand):
+    help = ('Вычисляет отпечатки текстов публикаций и комментариев, '
+            'сохранённых до включения поиска почти одинаковых текстов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, batch_size, **options):
+        sources = (
+            (Fingerprint.POST,
+             Post.objects.values_list('pk', 'title', 'text')),
+            (Fingerprint.COMMENT, Comment.objects.values_list('pk', 'text')),
+        )
+        for kind, rows in sources:
+            total = self.fingerprint(kind, rows, batch_size)
+            self.stdout.write(f'{kind}: обработано {total}.')
+
+    def fingerprint(self, kind, rows, batch_size):
+        last_id = 0
+        total = 0
+        while True:
+            batch = list(
+                rows.filter(pk__gt=last_id).order_by('pk')[:batch_size]
+            )
+            if not batch:
+                return total
+            last_id = batch[-1][0]
+            signatures = {}
+            for pk, *texts in batch:
+                signature = minhash('\n'.join(texts))
+                if signature is not None:
+                    signatures[pk] = signature
+            with transaction.atomic():
+                self.store(kind, [row[0] for row in batch], signatures)
+            total += len(batch)
+
+    def store(self, kind, object_ids, signatures):
+        Fingerprint.objects.filter(
+            kind=kind, object_id__in=object_ids
+        ).delete()
+        Fingerprint.objects.bulk_create(
+            Fingerprint(
+                kind=kind, object_id=pk, signature=signature.tobytes()
+            )
+            for pk, signature in signatures.items()
+        )
+        # bulk_create does not return primary keys on every backend.
+        stored = Fingerprint.objects.filter(
+            kind=kind, object_id__in=signatures
+        ).values_list('object_id', 'pk')
+        FingerprintBucket.objects.bulk_create(
+            FingerprintBucket(fingerprint_id=fingerprint_id, key=key)
+            for object_id, fingerprint_id in stored
+            for key in bucket_keys(kind, signatures[object_id])
+        )
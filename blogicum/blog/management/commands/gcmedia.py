@@ -0,0 +1,45 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.template.defaultfilters import filesizeformat
+
+from blog.models import Post
+from blog.orphans import SORT_CHUNK, collect
+
+
+class Command(BaseCommand):
+    help = ('Удаляет файлы фото, на которые не ссылается ни одна '
+            'публикация: оставшиеся после удаления публикаций, замены '
+            'фото и удаления пользователей.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать, что будет удалено.',
+        )
+        parser.add_argument(
+            '--grace-hours', type=float, default=24,
+            help='Не трогать файлы моложе этого: их загрузка может быть '
+                 'ещё не сохранена в публикации.',
+        )
+        parser.add_argument('--chunk-size', type=int, default=SORT_CHUNK)
+
+    def handle(self, *args, dry_run, grace_hours, chunk_size, verbosity,
+               **options):
+        cutoff = time.time() - grace_hours * 60 * 60
+        directory = Post._meta.get_field('image').upload_to
+        count = size = 0
+        for file in collect(
+            settings.MEDIA_ROOT, directory, cutoff,
+            dry_run=dry_run, chunk_size=chunk_size,
+        ):
+            count += 1
+            size += file.size
+            if verbosity > 1:
+                self.stdout.write(file.name)
+        verb = 'Можно удалить' if dry_run else 'Удалено'
+        self.stdout.write(
+            f'{verb} файлов: {count}, {filesizeformat(size)} '
+            f'({size} байт).'
+        )
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+
+from blog.cache import SHARED_SCOPE, bump_generations
+from blog.models import Post
+from blog.tasks import replace_image_variants
+
+
+class Command(BaseCommand):
+    help = ('Создаёт уменьшенные копии фото публикаций, загруженных до '
+            'появления адаптивных изображений.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument(
+            '--all', action='store_true', dest='redo',
+            help='Пересоздать копии и для фото, у которых они уже есть.',
+        )
+
+    def handle(self, *args, batch_size, redo, **options):
+        posts = Post.objects.exclude(image='')
+        if not redo:
+            posts = posts.filter(image_variants=[])
+        last_id = 0
+        total = 0
+        while True:
+            batch = list(
+                posts.filter(pk__gt=last_id).order_by('pk')
+                .only('pk', 'image', 'image_variants')[:batch_size]
+            )
+            if not batch:
+                break
+            last_id = batch[-1].pk
+            for post in batch:
+                # update() leaves updated_at and the post signals alone:
+                # the text and the original image did not change.
+                replace_image_variants(post)
+            total += len(batch)
+        if total:
+            bump_generations(SHARED_SCOPE)
+        self.stdout.write(f'Обработано фото: {total}.')
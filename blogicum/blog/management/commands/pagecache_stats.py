@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from blog.cache import get_stats, reset_stats
+
+
+class Command(BaseCommand):
+    help = 'Показывает счётчики кэша страниц для анонимных читателей.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset', action='store_true', help='Обнулить счётчики.'
+        )
+
+    def handle(self, *args, reset, **options):
+        stats = get_stats()
+        lookups = stats['hits'] + stats['misses']
+        hit_ratio = stats['hits'] / lookups if lookups else 0
+        for name, value in stats.items():
+            self.stdout.write(f'{name}: {value}')
+        self.stdout.write(f'hit ratio: {hit_ratio:.1%}')
+        if reset:
+            reset_stats()
@@ -0,0 +1,73 @@
+from collections import Counter, defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from blog.models import Comment
+from blog.sharding import comment_shards, shard_for_post, sharding_enabled
+
+
+class Command(BaseCommand):
+    help = ('Переносит комментарии в шарды, положенные им по текущему '
+            'BLOG_COMMENT_SHARDS: после добавления или удаления шарда и '
+            'при включении шардирования. Счётчики публикаций не меняются.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--source', action='append', default=[],
+            help='Ещё одна база, из которой нужно забрать комментарии, '
+                 'например убранный из списка шард.',
+        )
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, batch_size, source, dry_run, **options):
+        for alias in source:
+            if alias not in connections:
+                raise CommandError(f'Неизвестная база: {alias}')
+        sources = dict.fromkeys(
+            (DEFAULT_DB_ALIAS, *comment_shards(), *source)
+        )
+        moved = Counter()
+        for alias in sources:
+            moved.update(self.drain(alias, batch_size, dry_run))
+        for (from_alias, to_alias), count in sorted(moved.items()):
+            self.stdout.write(f'{from_alias} -> {to_alias}: {count}')
+        verb = 'Будет перенесено' if dry_run else 'Перенесено'
+        self.stdout.write(f'{verb} комментариев: {sum(moved.values())}.')
+
+    def target_of(self, comment):
+        if sharding_enabled():
+            return shard_for_post(comment.post_id)
+        return DEFAULT_DB_ALIAS
+
+    def drain(self, alias, batch_size, dry_run):
+        comments = Comment._base_manager.using(alias).order_by('pk')
+        moved = Counter()
+        last_id = 0
+        while True:
+            batch = list(comments.filter(pk__gt=last_id)[:batch_size])
+            if not batch:
+                return moved
+            last_id = batch[-1].pk
+            by_target = defaultdict(list)
+            for comment in batch:
+                target = self.target_of(comment)
+                if target != alias:
+                    by_target[target].append(comment)
+            for target, misplaced in by_target.items():
+                moved[alias, target] += len(misplaced)
+                if not dry_run:
+                    self.move(misplaced, alias, target)
+
+    def move(self, comments, from_alias, to_alias):
+        # Copy first: an interrupted run leaves duplicates, which the
+        # next run skips on insert and removes from the source.
+        with transaction.atomic(using=to_alias):
+            Comment._base_manager.using(to_alias).bulk_create(
+                comments, ignore_conflicts=True
+            )
+        with transaction.atomic(using=from_alias):
+            Comment._base_manager.using(from_alias).filter(
+                pk__in=[comment.pk for comment in comments]
+            )._raw_delete(from_alias)
@@ -0,0 +1,67 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Q
+
+from blog.models import Comment, Post
+from blog.sharding import sharding_enabled
+from blog.utils import published_comment_count_subquery
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает количество опубликованных комментариев '
+            'у публикаций, где счётчик разошёлся с данными.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, batch_size, **options):
+        last_id = 0
+        checked = fixed = 0
+        recount = (
+            self.recount_sharded if sharding_enabled() else self.recount
+        )
+        while True:
+            batch = list(
+                Post.objects.filter(pk__gt=last_id)
+                .order_by('pk')
+                .values_list('pk', flat=True)[:batch_size]
+            )
+            if not batch:
+                break
+            last_id = batch[-1]
+            checked += len(batch)
+            fixed += recount(batch)
+        self.stdout.write(
+            f'Проверено публикаций: {checked}, исправлено: {fixed}.'
+        )
+
+    def recount(self, post_ids):
+        batch = Post.objects.filter(pk__in=post_ids).annotate(actual=Count(
+            'comments', filter=Q(comments__is_published=True)
+        )).values_list('pk', 'published_comment_count', 'actual')
+        drifted = [pk for pk, stored, actual in batch if stored != actual]
+        if not drifted:
+            return 0
+        # Recount inside the UPDATE itself so that comments written
+        # since the batch was read are not lost.
+        return Post.objects.filter(pk__in=drifted).update(
+            published_comment_count=published_comment_count_subquery()
+        )
+
+    def recount_sharded(self, post_ids):
+        # Comments are in other databases, so no join or subquery here:
+        # each shard counts its own posts.
+        actual = dict.fromkeys(post_ids, 0)
+        for row in Comment.objects.filter(
+            post_id__in=post_ids, is_published=True
+        ).order_by().values('post_id').annotate(total=Count('pk')):
+            actual[row['post_id']] += row['total']
+        fixed = 0
+        stored = Post.objects.filter(pk__in=post_ids).values_list(
+            'pk', 'published_comment_count'
+        )
+        for pk, count in stored:
+            if count != actual[pk]:
+                fixed += Post.objects.filter(pk=pk).update(
+                    published_comment_count=actual[pk]
+                )
+        return fixed
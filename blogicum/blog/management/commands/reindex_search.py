@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from blog.models import Post
+from blog.search import index_posts, prune_index
+
+
+class Command(BaseCommand):
+    help = ('Перестраивает поисковый индекс публикаций порциями, '
+            'не блокируя базу на всё время работы.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, batch_size, **options):
+        last_id = 0
+        total = 0
+        while True:
+            batch = list(
+                Post.objects.filter(pk__gt=last_id)
+                .order_by('pk')
+                .values_list('pk', 'title', 'text')[:batch_size]
+            )
+            if not batch:
+                break
+            last_id = batch[-1][0]
+            with transaction.atomic():
+                index_posts(batch)
+            total += len(batch)
+        pruned = prune_index()
+        self.stdout.write(
+            f'Проиндексировано публикаций: {total}, '
+            f'удалено лишних записей: {pruned}.'
+        )
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from blog.models import Comment, Post
+
+
+class Command(BaseCommand):
+    help = ('Заполняет сохранённые начало текста и HTML у публикаций '
+            'и комментариев, записанных до их появления.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Перерендерить все записи, а не только пустые.'
+        )
+
+    def handle(self, *args, batch_size, **options):
+        jobs = (
+            (Post, ('excerpt', 'text_html'), {'text_html': ''}),
+            (Comment, ('text_html',), {'text_html': ''}),
+        )
+        for model, fields, pending in jobs:
+            queryset = model.objects.all()
+            if not options['all']:
+                queryset = queryset.filter(**pending)
+            total = self.render_in_batches(queryset, fields, batch_size)
+            self.stdout.write(
+                f'{model._meta.verbose_name_plural}: обработано {total}.'
+            )
+
+    def render_in_batches(self, queryset, fields, batch_size):
+        last_id = 0
+        total = 0
+        while True:
+            batch = list(
+                queryset.filter(pk__gt=last_id)
+                .order_by('pk')
+                .only('pk', 'text')[:batch_size]
+            )
+            if not batch:
+                return total
+            last_id = batch[-1].pk
+            for item in batch:
+                item.render_text()
+            with transaction.atomic():
+                queryset.model.objects.bulk_update(batch, fields)
+            total += len(batch)
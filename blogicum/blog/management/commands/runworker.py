@@ -0,0 +1,68 @@
+import multiprocessing
+import os
+import signal
+import socket
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from blog.jobs import work
+
+
+def worker_name(number):
+    return f'{socket.gethostname()}:{os.getpid()}:{number}'
+
+
+def serve(number, stop, poll_interval):
+    # A forked child must not share the parent's database connections.
+    connections.close_all()
+    # Both signals finish the current job first; the parent passes
+    # Ctrl+C on through `stop`.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda *args: stop.set())
+    work(worker_name(number), stop=stop, poll_interval=poll_interval)
+
+
+class Command(BaseCommand):
+    help = ('Выполняет фоновые задачи из очереди в базе данных '
+            'несколькими процессами.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=2)
+        parser.add_argument('--poll-interval', type=float, default=1.0)
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выполнить готовые задачи в этом процессе и завершиться.',
+        )
+
+    def handle(self, *args, processes, poll_interval, once, **options):
+        if once:
+            self.report(work(worker_name(0), once=True))
+            return
+        connections.close_all()
+        stop = multiprocessing.Event()
+        pool = [
+            multiprocessing.Process(
+                target=serve, args=(number, stop, poll_interval),
+                daemon=True,
+            )
+            for number in range(processes)
+        ]
+        for process in pool:
+            process.start()
+        signal.signal(signal.SIGTERM, lambda *args: stop.set())
+        try:
+            for process in pool:
+                process.join()
+        except KeyboardInterrupt:
+            stop.set()
+            for process in pool:
+                process.join()
+
+    def report(self, jobs):
+        for job in jobs:
+            self.stdout.write(
+                f'{job}: {job.get_status_display()}, '
+                f'попытка {job.attempts}, {job.duration * 1000:.1f} мс'
+            )
+        self.stdout.write(f'Выполнено задач: {len(jobs)}.')
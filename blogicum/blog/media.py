@@ -0,0 +1,146 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+from .storage import BLOB_NAME_RE
+
+# A content-addressed file never changes under its name, so caches may
+# keep it for a year without revalidating.
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class FileRange:
+    # The part of an open file a Range request asked for.
+
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    # (start, end) of a single `bytes=` range, end inclusive; None for a
+    # header to ignore (several ranges are served as the whole file) and
+    # () for a range outside the file.
+    match = RANGE_RE.match(header.replace(' ', ''))
+    if match is None or match.group(1) == match.group(2) == '':
+        return None
+    first, last = match.groups()
+    if first == '':
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start > end:
+        return ()
+    return start, end
+
+
+def range_applies(request, etag, mtime):
+    # If-Range: the range holds only for the version the client has.
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return etag is not None and if_range == etag
+    return parse_http_date_safe(if_range) == int(mtime)
+
+
+def cache_headers(response, etag, mtime, immutable):
+    response['Last-Modified'] = http_date(mtime)
+    if etag:
+        response['ETag'] = etag
+    response['Cache-Control'] = (
+        IMMUTABLE_CACHE_CONTROL if immutable
+        else f'public, max-age={settings.BLOG_MEDIA_MAX_AGE}'
+    )
+    return response
+
+
+def accelerated(path, full_path):
+    # An empty response the front proxy replaces with the file.
+    response = HttpResponse()
+    if settings.BLOG_MEDIA_ACCEL == 'x-accel-redirect':
+        response['X-Accel-Redirect'] = (
+            settings.BLOG_MEDIA_ACCEL_PREFIX + quote(path)
+        )
+    else:
+        response['X-Sendfile'] = full_path
+    return response
+
+
+def streamed(request, full_path, size, etag, mtime):
+    response_range = None
+    if 'HTTP_RANGE' in request.META and range_applies(request, etag, mtime):
+        response_range = parse_range(request.META['HTTP_RANGE'], size)
+    if response_range == ():
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+    file = open(full_path, 'rb')
+    if response_range is None:
+        response = FileResponse(file)
+    else:
+        start, end = response_range
+        response = FileResponse(FileRange(file, start, end - start + 1))
+        response.status_code = 206
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = end - start + 1
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+@require_safe
+def serve_media(request, path):
+    # Media files, with the transfer left to the front proxy when
+    # BLOG_MEDIA_ACCEL is set; otherwise streamed from a worker.
+    # Hidden entries include the uploads still being written.
+    if any(part.startswith('.') for part in path.split('/')):
+        raise Http404
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    try:
+        stat = os.stat(full_path)
+    except (FileNotFoundError, NotADirectoryError):
+        raise Http404
+    if not os.path.isfile(full_path):
+        raise Http404
+    fingerprint = BLOB_NAME_RE.match(path)
+    etag = f'"{fingerprint.group(3)}"' if fingerprint else None
+    response = get_conditional_response(
+        request, etag=etag, last_modified=int(stat.st_mtime)
+    )
+    if response is None:
+        if settings.BLOG_MEDIA_ACCEL:
+            response = accelerated(path, full_path)
+        else:
+            response = streamed(
+                request, full_path, stat.st_size, etag, stat.st_mtime
+            )
+        content_type, _ = mimetypes.guess_type(full_path)
+        response['Content-Type'] = content_type or 'application/octet-stream'
+    return cache_headers(
+        response, etag, stat.st_mtime, immutable=fingerprint is not None
+    )
@@ -0,0 +1,34 @@
+# Generated by Django 3.2.16 on 2026-10-18 10:00
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_published_comment_count(apps, schema_editor):
+    Post = apps.get_model('blog', 'Post')
+    Comment = apps.get_model('blog', 'Comment')
+    published_comments = Comment.objects.filter(
+        post=OuterRef('pk'), is_published=True
+    ).order_by().values('post').annotate(total=Count('pk')).values('total')
+    Post.objects.update(published_comment_count=Coalesce(
+        Subquery(published_comments, output_field=IntegerField()), 0
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0008_auto_20251129_0849'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='published_comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Опубликованных комментариев'),
+        ),
+        migrations.RunPython(
+            fill_published_comment_count, migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 3.2.16 on 2026-10-18 20:15
+
+from django.db import migrations, models
+
+
+def fill_is_publicly_visible(apps, schema_editor):
+    Post = apps.get_model('blog', 'Post')
+    Post.objects.filter(
+        is_published=True,
+        category__is_published=True,
+        location__is_published=True,
+    ).update(is_publicly_visible=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0010_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='post',
+            name='post_feed_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='post',
+            name='post_category_feed_idx',
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='is_publicly_visible',
+            field=models.BooleanField(default=False, editable=False, help_text='Публикация, её категория и местоположение опубликованы.', verbose_name='Видна читателям'),
+        ),
+        migrations.RunPython(
+            fill_is_publicly_visible, migrations.RunPython.noop
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(('is_publicly_visible', True)), fields=['-pub_date', '-id'], name='post_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(('is_publicly_visible', True)), fields=['category', '-pub_date', '-id'], name='post_category_feed_idx'),
+        ),
+    ]
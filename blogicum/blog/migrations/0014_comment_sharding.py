@@ -0,0 +1,59 @@
+# Generated by Django 3.2.16 on 2026-10-18 20:31
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, migrations, models
+import django.db.models.deletion
+
+
+def is_shard(alias):
+    return alias != DEFAULT_DB_ALIAS and alias in settings.BLOG_COMMENT_SHARDS
+
+
+class AlterFieldOutsideShards(migrations.AlterField):
+    # Restores the constraints dropped above everywhere, except in the
+    # comment shards: their posts and users are in another database.
+
+    def database_forwards(self, app_label, schema_editor, from_state,
+                          to_state):
+        if not is_shard(schema_editor.connection.alias):
+            super().database_forwards(
+                app_label, schema_editor, from_state, to_state
+            )
+
+    def database_backwards(self, app_label, schema_editor, from_state,
+                           to_state):
+        if not is_shard(schema_editor.connection.alias):
+            super().database_backwards(
+                app_label, schema_editor, from_state, to_state
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('blog', '0013_rendered_text'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='comment',
+            name='author',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='comments', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='comment',
+            name='post',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='comments', to='blog.post'),
+        ),
+        AlterFieldOutsideShards(
+            model_name='comment',
+            name='author',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='comments', to=settings.AUTH_USER_MODEL),
+        ),
+        AlterFieldOutsideShards(
+            model_name='comment',
+            name='post',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='comments', to='blog.post'),
+        ),
+    ]
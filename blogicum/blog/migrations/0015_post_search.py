@@ -0,0 +1,50 @@
+from django.db import migrations
+
+SQLITE_FORWARD = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS blog_post_search USING fts5("
+    "title, text, tokenize = 'unicode61 remove_diacritics 2')",
+    "INSERT INTO blog_post_search (rowid, title, text) "
+    "SELECT id, "
+    "replace(replace(title, 'ё', 'е'), 'Ё', 'Е'), "
+    "replace(replace(text, 'ё', 'е'), 'Ё', 'Е') "
+    "FROM blog_post",
+)
+SQLITE_BACKWARD = (
+    "DROP TABLE IF EXISTS blog_post_search",
+)
+POSTGRES_FORWARD = (
+    "ALTER TABLE blog_post ADD COLUMN search_vector tsvector",
+    "UPDATE blog_post SET search_vector = "
+    "setweight(to_tsvector('russian', title), 'A') || "
+    "setweight(to_tsvector('russian', text), 'B')",
+    "CREATE INDEX post_search_idx ON blog_post USING GIN (search_vector)",
+)
+POSTGRES_BACKWARD = (
+    "DROP INDEX IF EXISTS post_search_idx",
+    "ALTER TABLE blog_post DROP COLUMN IF EXISTS search_vector",
+)
+
+
+def run_for_vendor(sqlite, postgresql):
+    def run(apps, schema_editor):
+        statements = {
+            'sqlite': sqlite, 'postgresql': postgresql
+        }.get(schema_editor.connection.vendor, ())
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0014_comment_sharding'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_for_vendor(SQLITE_FORWARD, POSTGRES_FORWARD),
+            run_for_vendor(SQLITE_BACKWARD, POSTGRES_BACKWARD),
+            hints={'model_name': 'post'},
+        ),
+    ]
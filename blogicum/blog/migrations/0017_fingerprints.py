@@ -0,0 +1,39 @@
+# Generated by Django 3.2.16 on 2026-10-18 20:50
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0016_related_posts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Fingerprint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('post', 'публикация'), ('comment', 'комментарий')], max_length=16, verbose_name='Тип')),
+                ('object_id', models.BigIntegerField(verbose_name='Идентификатор')),
+                ('signature', models.BinaryField(verbose_name='Отпечаток')),
+            ],
+            options={
+                'verbose_name': 'отпечаток текста',
+                'verbose_name_plural': 'Отпечатки текстов',
+            },
+        ),
+        migrations.CreateModel(
+            name='FingerprintBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.BigIntegerField(db_index=True)),
+                ('fingerprint', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='buckets', to='blog.fingerprint')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='fingerprint',
+            constraint=models.UniqueConstraint(fields=('kind', 'object_id'), name='fingerprint_object_unique'),
+        ),
+    ]
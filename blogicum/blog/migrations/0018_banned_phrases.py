@@ -0,0 +1,26 @@
+# Generated by Django 3.2.16 on 2026-10-18 20:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0017_fingerprints'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BannedPhrase',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('phrase', models.CharField(max_length=256, unique=True, verbose_name='Фраза')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Добавлено')),
+            ],
+            options={
+                'verbose_name': 'запрещённая фраза',
+                'verbose_name_plural': 'Запрещённые фразы',
+                'ordering': ('phrase',),
+            },
+        ),
+    ]
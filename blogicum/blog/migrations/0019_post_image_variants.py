@@ -0,0 +1,18 @@
+# Generated by Django 3.2.16 on 2026-10-18 20:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0018_banned_phrases'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=list, editable=False, help_text='Уменьшенные копии фото и оригинал, от узких к широким.', verbose_name='Размеры изображения'),
+        ),
+    ]
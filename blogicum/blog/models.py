@@ -1,10 +1,20 @@
-from django.db import models
+from django.db import models, router, transaction
+from django.db.models.functions import Substr
 
 from django.contrib.auth import get_user_model
 
+from .projections import CARD_FIELDS, EXCERPT_SOURCE_LENGTH, PostRowIterable
+from .sharding import CommentQuerySet, new_comment_id, sharding_enabled
+from .text import make_excerpt, render_html
+
 User = get_user_model()
 
 
+class RenderedHTMLField(models.TextField):
+    # Escaped HTML rendered from a text field when the model is saved.
+    pass
+
+
 class TimeManagementAbstractModel(models.Model):
     is_published = models.BooleanField(default=True,
                                        verbose_name='Опубликовано',
@@ -17,7 +27,15 @@ class TimeManagementAbstractModel(models.Model):
         abstract = True
 
 
-class Category(TimeManagementAbstractModel):
+class UpdateTrackingAbstractModel(models.Model):
+    updated_at = models.DateTimeField(auto_now=True,
+                                      verbose_name='Изменено')
+
+    class Meta:
+        abstract = True
+
+
+class Category(TimeManagementAbstractModel, UpdateTrackingAbstractModel):
     title = models.CharField(max_length=256, verbose_name='Заголовок')
     description = models.TextField(verbose_name='Описание')
     slug = models.SlugField(unique=True, verbose_name='Идентификатор',
@@ -28,25 +46,63 @@ class Category(TimeManagementAbstractModel):
     class Meta:
         verbose_name = 'категория'
         verbose_name_plural = 'Категории'
+        indexes = (
+            models.Index(fields=('updated_at',), name='category_updated_idx'),
+        )
 
     def __str__(self):
         return self.title
 
 
-class Location(TimeManagementAbstractModel):
+class Location(TimeManagementAbstractModel, UpdateTrackingAbstractModel):
     name = models.CharField(max_length=256, verbose_name='Название места')
 
     class Meta:
         verbose_name = 'местоположение'
         verbose_name_plural = 'Местоположения'
+        indexes = (
+            models.Index(fields=('updated_at',), name='location_updated_idx'),
+        )
 
     def __str__(self):
         return self.name
 
 
-class Post(TimeManagementAbstractModel):
+PUBLIC_VISIBILITY = models.Q(
+    is_published=True,
+    category__is_published=True,
+    location__is_published=True,
+)
+
+
+class PostQuerySet(models.QuerySet):
+    def refresh_public_visibility(self):
+        return (
+            self.filter(PUBLIC_VISIBILITY, is_publicly_visible=False)
+            .update(is_publicly_visible=True)
+            + self.exclude(PUBLIC_VISIBILITY)
+            .filter(is_publicly_visible=True)
+            .update(is_publicly_visible=False)
+        )
+
+    def card_rows(self, *extra_fields):
+        rows = self.annotate(excerpt_source=models.Case(
+            models.When(
+                excerpt='', then=Substr('text', 1, EXCERPT_SOURCE_LENGTH)
+            ),
+            default=models.Value(''),
+        )).values(*CARD_FIELDS, *extra_fields)
+        rows._iterable_class = PostRowIterable
+        return rows
+
+
+class Post(TimeManagementAbstractModel, UpdateTrackingAbstractModel):
     title = models.CharField(max_length=256, verbose_name='Заголовок')
     text = models.TextField(verbose_name='Текст')
+    excerpt = models.TextField(editable=False, blank=True,
+                               verbose_name='Начало текста')
+    text_html = RenderedHTMLField(editable=False, blank=True,
+                                  verbose_name='Текст в HTML')
     pub_date = models.DateTimeField(verbose_name='Дата и время публикации',
                                     help_text='Если установить дату и время'
                                     ' в будущем '
@@ -73,18 +129,132 @@ class Post(TimeManagementAbstractModel):
     )
 
     image = models.ImageField('Фото', upload_to='post_images', blank=True)
+    image_variants = models.JSONField(
+        default=list,
+        blank=True,
+        editable=False,
+        verbose_name='Размеры изображения',
+        help_text='Уменьшенные копии фото и оригинал, от узких к широким.',
+    )
+    published_comment_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Опубликованных комментариев',
+    )
+    is_publicly_visible = models.BooleanField(
+        default=False,
+        editable=False,
+        verbose_name='Видна читателям',
+        help_text='Публикация, её категория и местоположение опубликованы.',
+    )
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'публикация'
         verbose_name_plural = 'Публикации'
         ordering = ('-pub_date',)
+        indexes = (
+            models.Index(
+                fields=('-pub_date', '-id'),
+                condition=models.Q(is_publicly_visible=True),
+                name='post_feed_idx',
+            ),
+            models.Index(
+                fields=('category', '-pub_date', '-id'),
+                condition=models.Q(is_publicly_visible=True),
+                name='post_category_feed_idx',
+            ),
+            models.Index(
+                fields=('author', '-pub_date', '-id'),
+                name='post_author_feed_idx',
+            ),
+            models.Index(fields=('updated_at',), name='post_updated_idx'),
+            models.Index(
+                fields=('category', 'updated_at'),
+                name='post_category_updated_idx',
+            ),
+            models.Index(
+                fields=('author', 'updated_at'),
+                name='post_author_updated_idx',
+            ),
+        )
 
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_page_scopes()
+        instance.remember_image()
+        return instance
+
+    def remember_page_scopes(self):
+        # Category and author as stored in the database, so that moving a
+        # post also invalidates the cached pages it is moved away from.
+        self._stored_category_id = self.__dict__.get('category_id')
+        self._stored_author_id = self.__dict__.get('author_id')
+
+    def remember_image(self):
+        self._stored_image_name = str(self.__dict__.get('image') or '')
+
+    def reset_image_variants(self):
+        # A new upload is stored as is; the resized copies are made by a
+        # background job queued from the post_save signal.
+        image = self.image
+        self._stored_image_name = getattr(self, '_stored_image_name', '')
+        self._stored_image_variants = []
+        self._image_changed = image.name != self._stored_image_name
+        if self._image_changed and self.pk is not None:
+            # As stored now: the worker may have added copies since this
+            # instance was loaded, and their references are released.
+            stored = type(self).objects.filter(pk=self.pk).values_list(
+                'image', 'image_variants'
+            ).first()
+            if stored is not None:
+                self._stored_image_name, self._stored_image_variants = stored
+                self._image_changed = image.name != stored[0]
+        if not self._image_changed:
+            return
+        if image and not image._committed:
+            image.save(image.name, image.file, save=False)
+        self.image_variants = []
+
+    def compute_public_visibility(self):
+        return bool(
+            self.is_published
+            and self.category is not None and self.category.is_published
+            and self.location is not None and self.location.is_published
+        )
+
+    def render_text(self):
+        self.excerpt = make_excerpt(self.text)
+        self.text_html = render_html(self.text)
+
+    def save(self, *args, **kwargs):
+        self.is_publicly_visible = self.compute_public_visibility()
+        self.render_text()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'image' in update_fields:
+            self.reset_image_variants()
+        if update_fields is not None:
+            kwargs['update_fields'] = {
+                *update_fields, 'is_publicly_visible', 'excerpt', 'text_html'
+            }
+            if 'image' in update_fields:
+                kwargs['update_fields'].add('image_variants')
+        super().save(*args, **kwargs)
+        self.remember_page_scopes()
+        self.remember_image()
+
 
 class Comment(TimeManagementAbstractModel):
     text = models.TextField('Текст коммнетария')
+    text_html = RenderedHTMLField(editable=False, blank=True,
+                                  verbose_name='Текст в HTML')
+    # The comment tables of the shards have no constraints on these, see
+    # migration 0014: the posts and users live in `default`.
     post = models.ForeignKey(
         Post,
         on_delete=models.CASCADE,
@@ -93,8 +263,226 @@ class Comment(TimeManagementAbstractModel):
     author = models.ForeignKey(User, on_delete=models.CASCADE,
                                related_name='comments')
 
+    objects = CommentQuerySet.as_manager()
+
     class Meta:
         ordering = ('created_at',)
+        indexes = (
+            models.Index(
+                fields=('post', 'created_at'),
+                name='comment_post_created_idx',
+            ),
+        )
 
     def __str__(self):
         return self.text
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_counted_state()
+        return instance
+
+    def remember_counted_state(self):
+        # Post and visibility as stored in the database; the comment counter
+        # signals compare against them to know which Post row to adjust.
+        self._counted_post_id = self.__dict__.get('post_id')
+        self._counted_is_published = self.__dict__.get('is_published')
+
+    def render_text(self):
+        self.text_html = render_html(self.text)
+
+    def save(self, *args, **kwargs):
+        self.render_text()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'text_html'}
+        if sharding_enabled() and self.pk is None:
+            self.pk = new_comment_id()
+            kwargs['force_insert'] = True
+        loaded_from = None if self._state.adding else self._state.db
+        using = kwargs.get('using') or router.db_for_write(
+            type(self), instance=self
+        )
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
+        if loaded_from and loaded_from != self._state.db:
+            # Moved to another post on another shard: drop the old row
+            # without the delete signals, the counters already moved.
+            type(self)._base_manager.using(loaded_from).filter(
+                pk=self.pk
+            )._raw_delete(loaded_from)
+        self.remember_counted_state()
+
+
+class RelatedPost(models.Model):
+    # Nearest neighbours of a post by text similarity, precomputed by
+    # `manage.py compute_related_posts`.
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='related_links',
+        verbose_name='Публикация',
+    )
+    related = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Похожая публикация',
+    )
+    score = models.FloatField(verbose_name='Сходство')
+
+    class Meta:
+        verbose_name = 'похожая публикация'
+        verbose_name_plural = 'Похожие публикации'
+        ordering = ('post', '-score')
+        constraints = (
+            models.UniqueConstraint(
+                fields=('post', 'related'), name='related_post_unique'
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('post', '-score'), name='related_post_score_idx'
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.post_id} -> {self.related_id}'
+
+
+class Fingerprint(models.Model):
+    # MinHash signature of a post or comment text, see
+    # blog/fingerprints.py. Comments may live in a shard, so the object is
+    # referenced by id only.
+    POST = 'post'
+    COMMENT = 'comment'
+    KINDS = ((POST, 'публикация'), (COMMENT, 'комментарий'))
+
+    kind = models.CharField(max_length=16, choices=KINDS,
+                            verbose_name='Тип')
+    object_id = models.BigIntegerField(verbose_name='Идентификатор')
+    signature = models.BinaryField(verbose_name='Отпечаток')
+
+    class Meta:
+        verbose_name = 'отпечаток текста'
+        verbose_name_plural = 'Отпечатки текстов'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('kind', 'object_id'), name='fingerprint_object_unique'
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.kind} {self.object_id}'
+
+
+class FingerprintBucket(models.Model):
+    # One LSH band of a signature: texts sharing any bucket are compared.
+    fingerprint = models.ForeignKey(
+        Fingerprint,
+        on_delete=models.CASCADE,
+        related_name='buckets',
+    )
+    key = models.BigIntegerField(db_index=True)
+
+    def __str__(self):
+        return str(self.key)
+
+
+class BannedPhrase(models.Model):
+    # Compiled into one automaton by blog/moderation.py; saving or
+    # deleting a phrase makes every process rebuild it.
+    phrase = models.CharField(max_length=256, unique=True,
+                              verbose_name='Фраза')
+    created_at = models.DateTimeField(auto_now_add=True,
+                                      verbose_name='Добавлено')
+
+    class Meta:
+        verbose_name = 'запрещённая фраза'
+        verbose_name_plural = 'Запрещённые фразы'
+        ordering = ('phrase',)
+
+    def __str__(self):
+        return self.phrase
+
+
+class Job(models.Model):
+    # A unit of background work for `manage.py runworker`, see
+    # blog/jobs.py.
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (QUEUED, 'в очереди'),
+        (RUNNING, 'выполняется'),
+        (DONE, 'выполнено'),
+        (FAILED, 'ошибка'),
+    )
+
+    task = models.CharField(max_length=64, verbose_name='Задача')
+    payload = models.JSONField(default=dict, verbose_name='Параметры')
+    status = models.CharField(max_length=16, choices=STATUSES,
+                              default=QUEUED, verbose_name='Состояние')
+    attempts = models.PositiveSmallIntegerField(default=0,
+                                                verbose_name='Попыток')
+    run_after = models.DateTimeField(verbose_name='Не раньше')
+    worker = models.CharField(max_length=64, blank=True,
+                              verbose_name='Обработчик')
+    created_at = models.DateTimeField(auto_now_add=True,
+                                      verbose_name='Добавлено')
+    started_at = models.DateTimeField(null=True, blank=True,
+                                      verbose_name='Начато')
+    finished_at = models.DateTimeField(null=True, blank=True,
+                                       verbose_name='Завершено')
+    duration = models.FloatField(null=True, blank=True,
+                                 verbose_name='Длительность, с')
+    error = models.TextField(blank=True, verbose_name='Последняя ошибка')
+
+    class Meta:
+        verbose_name = 'фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+        ordering = ('run_after', 'id')
+        indexes = (
+            models.Index(
+                fields=('run_after', 'id'),
+                condition=models.Q(status='queued'),
+                name='job_queued_idx',
+            ),
+            models.Index(
+                fields=('started_at',),
+                condition=models.Q(status='running'),
+                name='job_running_idx',
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.task} #{self.pk}'
+
+
+class MediaBlob(models.Model):
+    # A file of the content-addressed storage (blog/storage.py) and the
+    # number of posts referring to it as their image or image variant.
+    name = models.CharField(max_length=255, unique=True,
+                            verbose_name='Путь')
+    size = models.PositiveBigIntegerField(verbose_name='Размер, байт')
+    references = models.IntegerField(default=0, verbose_name='Ссылок')
+    created_at = models.DateTimeField(auto_now_add=True,
+                                      verbose_name='Добавлено')
+    updated_at = models.DateTimeField(auto_now=True,
+                                      verbose_name='Изменено')
+
+    class Meta:
+        verbose_name = 'файл'
+        verbose_name_plural = 'Файлы'
+        indexes = (
+            models.Index(
+                fields=('updated_at',),
+                condition=models.Q(references__lte=0),
+                name='media_blob_unreferenced_idx',
+            ),
+        )
+
+    def __str__(self):
+        return self.name
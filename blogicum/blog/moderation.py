@@ -0,0 +1,156 @@
+import threading
+import time
+from collections import deque, namedtuple
+
+from django.core.cache import cache
+
+from .models import BannedPhrase
+
+VERSION_KEY = 'blog:banned-phrases-version'
+# Matching is case-insensitive and treats ё as е and any space as a
+# space. Every character maps to exactly one, so match positions stay
+# valid in the original text; runs of spaces are collapsed in `find`.
+_TRANSLATION = str.maketrans({
+    'ё': 'е', '\t': ' ', '\n': ' ', '\r': ' ', '\xa0': ' ',
+})
+
+Match = namedtuple('Match', ('start', 'end', 'phrase'))
+
+
+def normalize(text):
+    lowered = text.lower()
+    if len(lowered) != len(text):
+        lowered = ''.join(
+            char.lower() if len(char.lower()) == 1 else char for char in text
+        )
+    return lowered.translate(_TRANSLATION)
+
+
+def _is_word_char(char):
+    return char.isalnum() or char == '_'
+
+
+class PhraseMatcher:
+    # Aho-Corasick automaton: one pass over the text finds every phrase,
+    # however many there are. States are trie nodes; `fail` leads to the
+    # longest proper suffix that is also a trie node, and `output` lists
+    # the phrases ending in a state or in its suffixes.
+
+    def __init__(self, phrases):
+        self.phrases = []
+        self.longest = 0
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [()]
+        for phrase in phrases:
+            self.add(phrase)
+        self.link()
+
+    def add(self, phrase):
+        normalized = ' '.join(normalize(phrase).split())
+        if not normalized:
+            return
+        state = 0
+        for char in normalized:
+            following = self.goto[state].get(char)
+            if following is None:
+                following = len(self.goto)
+                self.goto[state][char] = following
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append(())
+            state = following
+        self.output[state] += (len(self.phrases),)
+        self.phrases.append(normalized)
+        self.longest = max(self.longest, len(normalized))
+
+    def link(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, following in self.goto[state].items():
+                queue.append(following)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                suffix = self.goto[fallback].get(char, 0)
+                self.fail[following] = suffix
+                self.output[following] += self.output[suffix]
+
+    def find(self, text):
+        # Whole-word occurrences, so that a banned word inside a longer
+        # innocent one is not reported.
+        goto, fail, output = self.goto, self.fail, self.output
+        normalized = normalize(text)
+        # Original positions of the last characters fed to the automaton;
+        # repeated spaces are skipped.
+        fed = deque(maxlen=self.longest or 1)
+        matches = []
+        state = 0
+        previous = ''
+        for position, char in enumerate(normalized):
+            if char == ' ' == previous:
+                continue
+            previous = char
+            fed.append(position)
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for index in output[state]:
+                start, end = fed[-len(self.phrases[index])], position + 1
+                if self.bounded(normalized, start, end):
+                    matches.append(Match(start, end, text[start:end]))
+        return matches
+
+    @staticmethod
+    def bounded(text, start, end):
+        return not (
+            start > 0 and _is_word_char(text[start])
+            and _is_word_char(text[start - 1])
+        ) and not (
+            end < len(text) and _is_word_char(text[end - 1])
+            and _is_word_char(text[end])
+        )
+
+
+def current_version():
+    # Starts from the clock, so that a cache restart never brings back
+    # a version some process has already compiled.
+    cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+    return cache.get(VERSION_KEY)
+
+
+def reload_banned_phrases():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+
+
+class BannedPhrases:
+    # The automaton compiled in this process, rebuilt when the version
+    # in the shared cache moves.
+
+    def __init__(self):
+        self.matcher = None
+        self.version = None
+        self.lock = threading.Lock()
+
+    def get(self):
+        version = current_version()
+        with self.lock:
+            if self.matcher is None or self.version != version:
+                self.matcher = PhraseMatcher(
+                    BannedPhrase.objects.values_list(
+                        'phrase', flat=True
+                    ).iterator()
+                )
+                self.version = version
+            return self.matcher
+
+
+banned_phrases = BannedPhrases()
+
+
+def find_banned(text):
+    return banned_phrases.get().find(text)
@@ -0,0 +1,129 @@
+import heapq
+import os
+import tempfile
+from collections import namedtuple
+from itertools import groupby, islice
+
+from .models import MediaBlob, Post
+from .storage import INCOMING_DIR
+
+# Referenced names sorted in memory at a time; longer lists are sorted in
+# runs spilled to temporary files and merged.
+SORT_CHUNK = 100_000
+
+MediaFile = namedtuple('MediaFile', ('name', 'size', 'mtime'))
+
+
+def sort_key(name):
+    # Orders names component by component, the order `walk` lists them
+    # in: '\0' sorts before any character a file name can have.
+    return name.replace('/', '\0')
+
+
+def walk(root, prefix):
+    # Files under root/prefix by name, from one directory at a time, so
+    # memory does not grow with the number of files.
+    try:
+        with os.scandir(os.path.join(root, prefix)) as scanned:
+            entries = sorted(scanned, key=lambda entry: entry.name)
+    except FileNotFoundError:
+        return
+    for entry in entries:
+        name = f'{prefix}/{entry.name}'
+        if entry.is_dir(follow_symlinks=False):
+            yield from walk(root, name)
+        elif entry.is_file(follow_symlinks=False):
+            stat = entry.stat(follow_symlinks=False)
+            yield MediaFile(name, stat.st_size, stat.st_mtime)
+
+
+def referenced_names():
+    # Every image and image copy a post refers to, unsorted.
+    rows = Post.objects.exclude(image='').values_list(
+        'image', 'image_variants'
+    ).order_by().iterator(chunk_size=2000)
+    for image, variants in rows:
+        yield image
+        for item in variants or ():
+            yield item['name']
+
+
+def _spill(names):
+    run = tempfile.TemporaryFile('w+', encoding='utf-8')
+    run.writelines(f'{name}\n' for name in names)
+    run.seek(0)
+    return run
+
+
+def _read(run):
+    for line in run:
+        yield line[:-1]
+
+
+def external_sort(names, chunk_size=SORT_CHUNK):
+    # Sorted by `sort_key`, without duplicates, holding at most
+    # `chunk_size` names in memory.
+    names = iter(names)
+    runs = []
+    try:
+        while True:
+            chunk = sorted(islice(names, chunk_size), key=sort_key)
+            if not chunk:
+                break
+            runs.append(_spill(chunk))
+        merged = heapq.merge(*map(_read, runs), key=sort_key)
+        for name, _ in groupby(merged):
+            yield name
+    finally:
+        for run in runs:
+            run.close()
+
+
+def find_orphans(root, directory, referenced, cutoff):
+    # Merges the sorted files under `directory` with the sorted
+    # `referenced` names: files neither referenced nor changed after
+    # `cutoff` (a timestamp) are orphans.
+    referenced = iter(referenced)
+    reference = next(referenced, None)
+    for file in walk(root, directory):
+        key = sort_key(file.name)
+        while reference is not None and sort_key(reference) < key:
+            reference = next(referenced, None)
+        if reference == file.name or file.mtime >= cutoff:
+            continue
+        yield file
+    # Temporary files of uploads that never finished.
+    for file in walk(root, INCOMING_DIR):
+        if file.mtime < cutoff:
+            yield file
+
+
+def collect(root, directory, cutoff, dry_run=False,
+            chunk_size=SORT_CHUNK, batch_size=1000):
+    # Deletes the orphans (unless `dry_run`) and their MediaBlob rows;
+    # yields every orphan found.
+    referenced = external_sort(referenced_names(), chunk_size)
+    orphans = find_orphans(root, directory, referenced, cutoff)
+    while True:
+        batch = list(islice(orphans, batch_size))
+        if not batch:
+            break
+        if not dry_run:
+            batch = [file for file in batch if remove(root, file, cutoff)]
+            MediaBlob.objects.filter(
+                name__in=[file.name for file in batch]
+            ).delete()
+        yield from batch
+
+
+def remove(root, file, cutoff):
+    # Checked again: a new upload of the same content refreshes the file
+    # and is about to refer to it.
+    path = os.path.join(root, file.name)
+    try:
+        if os.stat(path).st_mtime >= cutoff:
+            return False
+        os.remove(path)
+    except FileNotFoundError:
+        return False
+    return True
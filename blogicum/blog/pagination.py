@@ -0,0 +1,239 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import FieldDoesNotExist
+from django.core.paginator import (
+    EmptyPage, Page, PageNotAnInteger, Paginator,
+)
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+from .counts import cached_count, store_count
+
+# Page numbers past this are treated as this one: beyond any real page.
+MAX_PAGE_NUMBER = 10 ** 6
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def encode_cursor(direction, values):
+    payload = json.dumps([direction, *values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    padded = cursor + '=' * (-len(cursor) % 4)
+    try:
+        direction, *values = json.loads(base64.urlsafe_b64decode(padded))
+    except (binascii.Error, ValueError, TypeError):
+        raise InvalidCursor(cursor)
+    if direction not in (NEXT, PREVIOUS):
+        raise InvalidCursor(cursor)
+    return direction, values
+
+
+class CursorPage:
+    is_cursor_page = True
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f'<CursorPage of {len(self)} items>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    # Keyset pagination over a unique ordering such as ('-pub_date', '-id'):
+    # pages are addressed by opaque cursors, so neither OFFSET nor COUNT(*)
+    # is sent to the database.
+
+    def __init__(self, queryset, per_page, ordering):
+        descending = {field.startswith('-') for field in ordering}
+        if len(descending) != 1:
+            raise ValueError('Cursor ordering must have a single direction.')
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = tuple(ordering)
+        self.descending = descending.pop()
+        self.fields = tuple(field.lstrip('-') for field in ordering)
+
+    def _values_of(self, obj):
+        return [getattr(obj, field) for field in self.fields]
+
+    def _serialize(self, obj):
+        return [
+            value.isoformat() if hasattr(value, 'isoformat') else value
+            for value in self._values_of(obj)
+        ]
+
+    def _deserialize(self, values):
+        if len(values) != len(self.fields):
+            raise InvalidCursor(values)
+        try:
+            return [
+                self._to_python(field, value)
+                for field, value in zip(self.fields, values)
+            ]
+        except Exception:
+            raise InvalidCursor(values)
+
+    def _to_python(self, field, value):
+        try:
+            model_field = self.queryset.model._meta.get_field(field)
+        except FieldDoesNotExist:
+            # An annotation such as a search rank: JSON numbers only.
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise InvalidCursor(value)
+            return value
+        return model_field.to_python(value)
+
+    def _seek(self, values, forward):
+        lookup = 'lt' if self.descending == forward else 'gt'
+        condition = Q()
+        for position, field in enumerate(self.fields):
+            step = Q(**{f'{field}__{lookup}': values[position]})
+            for previous_field, value in zip(
+                self.fields[:position], values[:position]
+            ):
+                step &= Q(**{previous_field: value})
+            condition |= step
+        return condition
+
+    def _reversed_ordering(self):
+        if self.descending:
+            return self.fields
+        return tuple(f'-{field}' for field in self.fields)
+
+    def page(self, cursor=None):
+        if not cursor:
+            direction, values = NEXT, None
+        else:
+            direction, values = decode_cursor(cursor)
+            values = self._deserialize(values)
+
+        forward = direction == NEXT
+        queryset = self.queryset.order_by(
+            *(self.ordering if forward else self._reversed_ordering())
+        )
+        if values is not None:
+            queryset = queryset.filter(self._seek(values, forward))
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if not forward:
+            rows.reverse()
+        if not rows:
+            return self.page() if values is not None else CursorPage(rows)
+
+        has_next = has_more if forward else True
+        has_previous = values is not None if forward else has_more
+        return CursorPage(
+            rows,
+            next_cursor=(
+                encode_cursor(NEXT, self._serialize(rows[-1]))
+                if has_next else None
+            ),
+            previous_cursor=(
+                encode_cursor(PREVIOUS, self._serialize(rows[0]))
+                if has_previous else None
+            ),
+        )
+
+    def get_page(self, cursor=None):
+        try:
+            return self.page(cursor)
+        except InvalidCursor:
+            return self.page()
+
+
+class CachedCountPage(Page):
+    @property
+    def elided_page_range(self):
+        return self.paginator.get_elided_page_range(self.number)
+
+
+class CachedCountPaginator(Paginator):
+    # Numbered pages whose total comes from the count cache under
+    # `count_name` instead of a COUNT(*) per request. The total may lag
+    # behind the scopes for a moment; the page rows never do, and the
+    # total is corrected from them whenever they prove it wrong.
+
+    def __init__(self, object_list, per_page, count_name, scopes, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count_name = count_name
+        self.scopes = tuple(scopes)
+
+    @cached_property
+    def count(self):
+        return cached_count(self.count_name, self.object_list, self.scopes)
+
+    def _correct_count(self, count):
+        self.__dict__['count'] = count
+        self.__dict__.pop('num_pages', None)
+
+    def validate_number(self, number):
+        try:
+            return super().validate_number(number)
+        except EmptyPage:
+            # Past the cached total: page() decides from the rows. Far
+            # past any real page is capped, so the OFFSET stays valid.
+            if int(number) > 1:
+                return min(int(number), MAX_PAGE_NUMBER)
+            raise
+
+    def get_page(self, number):
+        # As Paginator.get_page, also when page() finds the cached total
+        # too high: it stores the counted one, and the last page is shown.
+        try:
+            number = self.validate_number(number)
+        except PageNotAnInteger:
+            number = 1
+        except EmptyPage:
+            number = self.num_pages
+        try:
+            return self.page(number)
+        except EmptyPage:
+            return self.page(self.num_pages)
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and number > 1:
+            self._correct_count(
+                store_count(self.count_name, self.object_list, self.scopes)
+            )
+            raise EmptyPage('That page contains no results')
+        if len(rows) > self.per_page:
+            self._correct_count(max(self.count, bottom + len(rows)))
+        else:
+            self._correct_count(bottom + len(rows))
+        return self._get_page(rows[:self.per_page], number, self)
+
+    def _get_page(self, *args, **kwargs):
+        return CachedCountPage(*args, **kwargs)
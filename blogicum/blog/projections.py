@@ -0,0 +1,121 @@
+from django.db.models.query import ValuesIterable
+
+from .text import make_excerpt
+
+# Enough characters to hold the excerpt words of any sane text, so the
+# feed never has to load the full `text` column.
+EXCERPT_SOURCE_LENGTH = 1000
+
+CARD_FIELDS = (
+    'id',
+    'title',
+    'excerpt',
+    'excerpt_source',
+    'pub_date',
+    'is_published',
+    'image',
+    'image_variants',
+    'published_comment_count',
+    'author__username',
+    'category_id',
+    'category__title',
+    'category__slug',
+    'category__is_published',
+    'location_id',
+    'location__name',
+    'location__is_published',
+)
+
+
+class AuthorRow:
+    __slots__ = ('username',)
+
+    def __init__(self, username):
+        self.username = username
+
+
+class CategoryRow:
+    __slots__ = ('title', 'slug', 'is_published')
+
+    def __init__(self, title, slug, is_published):
+        self.title = title
+        self.slug = slug
+        self.is_published = is_published
+
+
+class LocationRow:
+    __slots__ = ('name', 'is_published')
+
+    def __init__(self, name, is_published):
+        self.name = name
+        self.is_published = is_published
+
+
+class ImageRow:
+    __slots__ = ('name', 'storage')
+
+    def __init__(self, name, storage):
+        self.name = name
+        self.storage = storage
+
+    def __bool__(self):
+        return bool(self.name)
+
+    def __str__(self):
+        return self.name or ''
+
+    @property
+    def url(self):
+        return self.storage.url(self.name)
+
+
+class PostRow:
+    # Only what includes/post_card.html reads, under the same attribute
+    # names as on Post, so the template does not care which one it gets.
+    __slots__ = (
+        'id', 'title', 'excerpt', 'pub_date', 'is_published', 'image',
+        'image_variants', 'published_comment_count', 'author',
+        'category_id', 'category', 'location_id', 'location', 'search_rank',
+    )
+
+    def __init__(self, values, image_storage):
+        self.id = values['id']
+        self.title = values['title']
+        # Rows saved before excerpts were stored carry a text prefix.
+        source = values['excerpt_source']
+        self.excerpt = values['excerpt'] or make_excerpt(
+            source, complete=len(source) < EXCERPT_SOURCE_LENGTH
+        )
+        self.pub_date = values['pub_date']
+        self.is_published = values['is_published']
+        self.image = ImageRow(values['image'], image_storage)
+        self.image_variants = values['image_variants']
+        self.published_comment_count = values['published_comment_count']
+        self.author = AuthorRow(values['author__username'])
+        self.category_id = values['category_id']
+        self.category = CategoryRow(
+            values['category__title'],
+            values['category__slug'],
+            values['category__is_published'],
+        ) if self.category_id else None
+        self.location_id = values['location_id']
+        self.location = LocationRow(
+            values['location__name'],
+            values['location__is_published'],
+        ) if self.location_id else None
+        # Only search results carry it, for their cursors.
+        self.search_rank = values.get('search_rank')
+
+    @property
+    def pk(self):
+        return self.id
+
+    def __repr__(self):
+        return f'<PostRow: {self.id}>'
+
+
+class PostRowIterable(ValuesIterable):
+    def __iter__(self):
+        storage = self.queryset.model._meta.get_field('image').storage
+        for values in super().__iter__():
+            yield PostRow(values, storage)
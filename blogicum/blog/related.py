@@ -0,0 +1,361 @@
+import json
+import os
+import zlib
+from collections import Counter, defaultdict
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .cache import bump_generations, post_scope
+from .models import Post, RelatedPost
+from .search import TERM_RE, fold
+
+# Words are hashed into a fixed number of TF-IDF buckets, and the sparse
+# vectors are reduced to DIMS dense ones by a fixed random ±1 projection,
+# which keeps cosine similarity approximately. The vectors live in a
+# memory-mapped file, so apart from the id arrays a run holds one block
+# of posts in memory whatever their number.
+BUCKETS = 2 ** 16
+DIMS = 256
+PROJECTION_SEED = 20180
+TITLE_WEIGHT = 3
+MIN_WORD_LENGTH = 3
+# Unrelated posts score around zero, give or take the projection noise.
+MIN_SCORE = 0.1
+RELATED_PER_POST = 5
+BLOCK_SIZE = 1024
+READ_CHUNK = 1000
+
+
+def word_buckets(title, text):
+    counts = Counter()
+    for source, weight in ((title, TITLE_WEIGHT), (text, 1)):
+        for word in TERM_RE.findall(fold(source.lower())):
+            if len(word) >= MIN_WORD_LENGTH:
+                counts[zlib.crc32(word.encode()) % BUCKETS] += weight
+    return counts
+
+
+def projection(dims):
+    generator = np.random.default_rng(PROJECTION_SEED)
+    return generator.choice(
+        np.array((-1, 1), dtype=np.int8), size=(BUCKETS, dims)
+    )
+
+
+def vectorize(rows, idf, matrix):
+    # `rows` are (id, title, text); returns unit vectors, zero for posts
+    # without a single word.
+    vectors = np.zeros((len(rows), matrix.shape[1]), dtype=np.float32)
+    for position, (_, title, text) in enumerate(rows):
+        counts = word_buckets(title, text)
+        if not counts:
+            continue
+        buckets = np.fromiter(counts, dtype=np.int64, count=len(counts))
+        frequencies = np.fromiter(
+            counts.values(), dtype=np.float32, count=len(counts)
+        )
+        weights = (1 + np.log(frequencies)) * idf[buckets]
+        vectors[position] = weights @ matrix[buckets]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    np.divide(vectors, norms, out=vectors, where=norms > 0)
+    return vectors
+
+
+def visible_posts(now):
+    return Post.objects.filter(is_publicly_visible=True, pub_date__lte=now)
+
+
+def post_chunks(posts):
+    last_id = 0
+    while True:
+        rows = list(
+            posts.filter(pk__gt=last_id)
+            .order_by('pk')
+            .values_list('pk', 'title', 'text')[:READ_CHUNK]
+        )
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1][0]
+
+
+class VectorStore:
+    # Files of the last run in BLOG_RELATED_POSTS_DIR: post ids, their
+    # vectors row by row, the score a new neighbour has to beat for each
+    # of them, the idf weights and the run state.
+
+    def __init__(self, directory=None):
+        self.directory = Path(directory or settings.BLOG_RELATED_POSTS_DIR)
+
+    def path(self, name):
+        return self.directory / name
+
+    def load_state(self):
+        try:
+            with open(self.path('state.json')) as file:
+                state = json.load(file)
+        except FileNotFoundError:
+            return None
+        state['ids'] = np.load(self.path('ids.npy'))
+        state['floors'] = np.load(self.path('floors.npy'))
+        state['idf'] = np.load(self.path('idf.npy'))
+        return state
+
+    def vectors(self, count, dims, mode='r'):
+        return np.memmap(
+            self.path('vectors.f32'), dtype=np.float32, mode=mode,
+            shape=(count, dims),
+        )
+
+    def save_state(self, ids, floors, idf, dims, computed_at):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        np.save(self.path('ids.npy'), ids)
+        np.save(self.path('floors.npy'), floors)
+        np.save(self.path('idf.npy'), idf)
+        self._write('state.json', json.dumps({
+            'dims': dims,
+            'computed_at': computed_at.isoformat(),
+        }).encode())
+
+    def _write(self, name, data):
+        # Replaced at once, so a crashed run leaves the previous file.
+        temporary = self.path(name + '.tmp')
+        temporary.write_bytes(data)
+        os.replace(temporary, self.path(name))
+
+
+def similarity_blocks(queries, query_rows, vectors, block_size):
+    # Cosine similarities of `queries` to `vectors`, one block of vectors
+    # at a time; a query never matches its own row in `vectors`.
+    queries = np.asarray(queries)
+    for start in range(0, len(vectors), block_size):
+        block = np.asarray(vectors[start:start + block_size])
+        scores = queries @ block.T
+        own = query_rows - start
+        inside = (own >= 0) & (own < len(block))
+        scores[np.nonzero(inside)[0], own[inside]] = -np.inf
+        yield start, scores
+
+
+def top_k(queries, query_rows, vectors, k, block_size, on_block=None):
+    # Rows of `vectors` most similar to each query, best first.
+    best_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+    best_rows = np.full((len(queries), k), -1, dtype=np.int64)
+    for start, scores in similarity_blocks(
+        queries, query_rows, vectors, block_size
+    ):
+        if on_block is not None:
+            on_block(start, scores)
+        rows = np.broadcast_to(
+            np.arange(start, start + scores.shape[1]), scores.shape
+        )
+        scores = np.concatenate((best_scores, scores), axis=1)
+        rows = np.concatenate((best_rows, rows), axis=1)
+        keep = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        best_scores = np.take_along_axis(scores, keep, axis=1)
+        best_rows = np.take_along_axis(rows, keep, axis=1)
+    order = np.argsort(-best_scores, axis=1)
+    return (
+        np.take_along_axis(best_scores, order, axis=1),
+        np.take_along_axis(best_rows, order, axis=1),
+    )
+
+
+def neighbour_lists(post_ids, ids, scores, rows):
+    return {
+        int(post_id): [
+            (int(ids[row]), float(score))
+            for score, row in zip(post_scores, post_rows)
+            if row >= 0 and score > MIN_SCORE
+        ]
+        for post_id, post_scores, post_rows in zip(post_ids, scores, rows)
+    }
+
+
+def floor_of(neighbours, k):
+    return neighbours[-1][1] if len(neighbours) >= k else MIN_SCORE
+
+
+def store_lists(lists):
+    # Replaces the related posts of every post in `lists`; returns the
+    # ids of posts whose list of neighbours changed.
+    stored = defaultdict(list)
+    for post_id, related_id in RelatedPost.objects.filter(
+        post_id__in=lists
+    ).order_by('post_id', '-score').values_list('post_id', 'related_id'):
+        stored[post_id].append(related_id)
+    with transaction.atomic():
+        RelatedPost.objects.filter(post_id__in=lists).delete()
+        RelatedPost.objects.bulk_create(
+            RelatedPost(post_id=post_id, related_id=related_id, score=score)
+            for post_id, neighbours in lists.items()
+            for related_id, score in neighbours
+        )
+    return [
+        post_id for post_id, neighbours in lists.items()
+        if stored[post_id] != [related_id for related_id, _ in neighbours]
+    ]
+
+
+def drop_hidden(now):
+    posts = visible_posts(now)
+    hidden = list(
+        RelatedPost.objects.exclude(post__in=posts)
+        .values_list('post_id', flat=True).distinct()
+    )
+    RelatedPost.objects.filter(post_id__in=hidden).delete()
+    return hidden
+
+
+def locate(ids, sorter, wanted):
+    # Rows of `wanted` ids in the unsorted `ids`, and which were found.
+    if not len(ids):
+        return np.zeros(len(wanted), dtype=np.int64), np.zeros(
+            len(wanted), dtype=bool
+        )
+    positions = sorter[np.minimum(
+        np.searchsorted(ids, wanted, sorter=sorter), len(ids) - 1
+    )]
+    return positions, ids[positions] == wanted
+
+
+def compute_all(k=RELATED_PER_POST, dims=DIMS, block_size=BLOCK_SIZE,
+                store=None):
+    store = store or VectorStore()
+    now = timezone.now()
+    posts = visible_posts(now)
+    frequencies = np.zeros(BUCKETS, dtype=np.int64)
+    id_chunks = []
+    for rows in post_chunks(posts):
+        for _, title, text in rows:
+            frequencies[list(word_buckets(title, text))] += 1
+        id_chunks.append(np.array([row[0] for row in rows], dtype=np.int64))
+    ids = np.concatenate(id_chunks) if id_chunks else np.zeros(0, np.int64)
+    idf = (
+        np.log((1 + len(ids)) / (1 + frequencies)) + 1
+    ).astype(np.float32)
+    floors = np.full(len(ids), MIN_SCORE, dtype=np.float32)
+    changed = drop_hidden(now)
+    if not len(ids):
+        store.save_state(ids, floors, idf, dims, now)
+        bump_generations(*map(post_scope, changed))
+        return 0
+
+    store.directory.mkdir(parents=True, exist_ok=True)
+    matrix = projection(dims)
+    vectors = store.vectors(len(ids), dims, mode='w+')
+    for rows in post_chunks(posts.filter(pk__lte=int(ids[-1]))):
+        # Posts published between the passes have no idf yet and wait
+        # for the next run.
+        chunk_ids = np.array([row[0] for row in rows], dtype=np.int64)
+        positions = np.searchsorted(ids, chunk_ids)
+        known = ids[np.minimum(positions, len(ids) - 1)] == chunk_ids
+        vectors[positions[known]] = vectorize(
+            [row for row, keep in zip(rows, known) if keep], idf, matrix
+        )
+    vectors.flush()
+
+    for start in range(0, len(ids), block_size):
+        query_rows = np.arange(start, min(start + block_size, len(ids)))
+        scores, rows = top_k(
+            vectors[query_rows], query_rows, vectors, k, block_size
+        )
+        lists = neighbour_lists(ids[query_rows], ids, scores, rows)
+        floors[query_rows] = [
+            floor_of(lists[int(post_id)], k) for post_id in ids[query_rows]
+        ]
+        changed += store_lists(lists)
+    store.save_state(ids, floors, idf, dims, now)
+    bump_generations(*map(post_scope, changed))
+    return len(ids)
+
+
+def compute_pending(k=RELATED_PER_POST, block_size=BLOCK_SIZE, store=None):
+    # Posts published, edited or made visible since the last run get
+    # their vectors and related posts, and enter the lists of older posts
+    # they are closer to than the weakest neighbour there. Scores of
+    # older posts are not lowered; a full run puts everything in order.
+    store = store or VectorStore()
+    state = store.load_state()
+    if state is None:
+        return compute_all(k=k, block_size=block_size, store=store)
+    now = timezone.now()
+    since = datetime.fromisoformat(state['computed_at'])
+    ids, floors, idf, dims = (
+        state['ids'], state['floors'], state['idf'], state['dims']
+    )
+    pending = visible_posts(now).filter(
+        Q(pk__gt=int(ids.max(initial=0)))
+        | Q(updated_at__gt=since)
+        | Q(pub_date__gt=since)
+    )
+    matrix = projection(dims)
+    sorter = np.argsort(ids)
+    pending_rows = []
+    for rows in post_chunks(pending):
+        chunk_ids = np.array([row[0] for row in rows], dtype=np.int64)
+        chunk_vectors = vectorize(rows, idf, matrix)
+        positions, known = locate(ids, sorter, chunk_ids)
+        if known.any():
+            vectors = store.vectors(len(ids), dims, mode='r+')
+            vectors[positions[known]] = chunk_vectors[known]
+            vectors.flush()
+        with open(store.path('vectors.f32'), 'ab') as file:
+            file.write(chunk_vectors[~known].tobytes())
+        pending_rows += [
+            *positions[known],
+            *range(len(ids), len(ids) + int((~known).sum())),
+        ]
+        ids = np.concatenate((ids, chunk_ids[~known]))
+        floors = np.concatenate((
+            floors, np.full((~known).sum(), MIN_SCORE, dtype=np.float32)
+        ))
+        sorter = np.argsort(ids)
+    changed = drop_hidden(now)
+    if not pending_rows:
+        store.save_state(ids, floors, idf, dims, now)
+        bump_generations(*map(post_scope, changed))
+        return 0
+
+    vectors = store.vectors(len(ids), dims)
+    pending_rows = np.array(sorted(pending_rows), dtype=np.int64)
+    closer = defaultdict(list)
+
+    def collect_closer(start, scores):
+        block_floors = floors[start:start + scores.shape[1]]
+        for query, column in zip(*np.nonzero(scores > block_floors)):
+            closer[start + column].append(
+                (int(ids[query_rows[query]]), float(scores[query, column]))
+            )
+
+    for start in range(0, len(pending_rows), block_size):
+        query_rows = pending_rows[start:start + block_size]
+        scores, rows = top_k(
+            vectors[query_rows], query_rows, vectors, k, block_size,
+            on_block=collect_closer,
+        )
+        lists = neighbour_lists(ids[query_rows], ids, scores, rows)
+        floors[query_rows] = [
+            floor_of(lists[int(post_id)], k) for post_id in ids[query_rows]
+        ]
+        changed += store_lists(lists)
+
+    for row in set(closer) - set(pending_rows.tolist()):
+        post_id = int(ids[row])
+        neighbours = dict(
+            RelatedPost.objects.filter(post_id=post_id)
+            .values_list('related_id', 'score')
+        )
+        neighbours.update(closer[row])
+        best = sorted(neighbours.items(), key=lambda item: -item[1])[:k]
+        floors[row] = floor_of(best, k)
+        changed += store_lists({post_id: best})
+    store.save_state(ids, floors, idf, dims, now)
+    bump_generations(*map(post_scope, changed))
+    return len(pending_rows)
@@ -0,0 +1,72 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+_replica_reads = ContextVar('blog_replica_reads', default=False)
+
+
+def replica_reads(view):
+    # Marks a read-only view whose queries may be served by a replica.
+    view.replica_reads = True
+    return view
+
+
+def reading_from_replica():
+    return _replica_reads.get() and bool(settings.BLOG_READ_REPLICAS)
+
+
+class ReplicaRouter:
+    # Reads go to a random replica while a view marked with
+    # `replica_reads` runs; everything else, writes included, goes to
+    # the primary `default` database.
+
+    def db_for_read(self, model, **hints):
+        if reading_from_replica():
+            return random.choice(settings.BLOG_READ_REPLICAS)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        # Instances read from a replica are still saved to the primary.
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.BLOG_READ_REPLICAS}
+        if {obj1._state.db, obj2._state.db} <= databases:
+            return True
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    # Lets marked views read from the replicas, except for a user who
+    # wrote something in the last BLOG_PRIMARY_PIN_SECONDS: the pin
+    # cookie keeps them on the primary until the replicas caught up, so
+    # they see their own comment.
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _replica_reads.set(False)
+        try:
+            response = self.get_response(request)
+        finally:
+            _replica_reads.reset(token)
+        if request.method not in SAFE_METHODS:
+            response.set_cookie(
+                settings.BLOG_PRIMARY_PIN_COOKIE, '1',
+                max_age=settings.BLOG_PRIMARY_PIN_SECONDS,
+                httponly=True, samesite='Lax',
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (
+            request.method in SAFE_METHODS
+            and getattr(view_func, 'replica_reads', False)
+            and settings.BLOG_PRIMARY_PIN_COOKIE not in request.COOKIES
+        ):
+            _replica_reads.set(True)
@@ -0,0 +1,85 @@
+import math
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Min
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .cache import FEED_SCOPE, get_generations
+from .models import Post
+
+NEXT_PUBLICATION_KEY = 'blog:next-publication:{}:{}'
+NOTHING_SCHEDULED = 'none'
+
+
+def scheduled_posts(scope):
+    # Posts whose publication changes the public pages of the scope.
+    kind, _, value = scope.partition(':')
+    posts = Post.objects.using(DEFAULT_DB_ALIAS).filter(
+        is_publicly_visible=True
+    )
+    if scope == FEED_SCOPE:
+        return posts
+    if kind == 'category':
+        return posts.filter(category__slug=value)
+    if kind == 'author':
+        return posts.filter(author__username=value)
+    return None
+
+
+def next_publication(scope):
+    # The earliest pub_date still in the future for the scope, or None.
+    # Until that moment `pub_date <= now` selects exactly the same posts
+    # as `pub_date < boundary`, so feed queries stay identical and pages
+    # of the scope can be cached right up to the boundary. The result is
+    # stored under the scope generation, which every post change bumps,
+    # so it is read from the primary: a lagging replica would store a
+    # stale boundary under the new generation.
+    posts = scheduled_posts(scope)
+    if posts is None:
+        return None
+    now = timezone.now()
+    generation = get_generations((scope,))[scope]
+    key = NEXT_PUBLICATION_KEY.format(scope, generation)
+    stored = cache.get(key)
+    if stored == NOTHING_SCHEDULED:
+        return None
+    if stored is not None:
+        boundary = parse_datetime(stored)
+        if boundary > now:
+            return boundary
+
+    boundary = posts.filter(pub_date__gt=now).aggregate(
+        boundary=Min('pub_date')
+    )['boundary']
+    if boundary is None:
+        cache.set(key, NOTHING_SCHEDULED, settings.BLOG_SCHEDULE_CACHE_TIMEOUT)
+    else:
+        cache.set(key, boundary.isoformat(), seconds_until(boundary, now))
+    return boundary
+
+
+def seconds_until(moment, now=None):
+    now = now or timezone.now()
+    return max(1, math.ceil((moment - now).total_seconds()))
+
+
+def published_before(scope):
+    # Lookup selecting the published part of the scope, snapped to the
+    # next publication boundary instead of the current microsecond. With
+    # no boundary known the current time still applies: a stale "nothing
+    # scheduled" must not publish anything early.
+    boundary = next_publication(scope)
+    if boundary is None:
+        return {'pub_date__lte': timezone.now()}
+    return {'pub_date__lt': boundary}
+
+
+def cache_timeout(scopes, timeout):
+    for scope in scopes:
+        boundary = next_publication(scope)
+        if boundary is not None:
+            timeout = min(timeout, seconds_until(boundary))
+    return timeout
@@ -0,0 +1,143 @@
+import re
+
+from django.db import connections, router
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+from .models import Post
+
+# The inverted index itself is created by migration 0015: an FTS5 table
+# on SQLite, a tsvector column with a GIN index on PostgreSQL. Other
+# backends fall back to substring matching.
+SQLITE_TABLE = 'blog_post_search'
+POSTGRES_CONFIG = 'russian'
+# Title matches weigh more than text matches.
+SQLITE_RANK = f'bm25({SQLITE_TABLE}, 10.0, 1.0)'
+POSTGRES_VECTOR = (
+    f"setweight(to_tsvector('{POSTGRES_CONFIG}', title), 'A') || "
+    f"setweight(to_tsvector('{POSTGRES_CONFIG}', text), 'B')"
+)
+
+MAX_TERMS = 10
+TERM_RE = re.compile(r'\w+')
+
+
+def fold(text):
+    # unicode61 folds Latin diacritics only; ё and е must match as well.
+    return text.replace('ё', 'е').replace('Ё', 'Е')
+
+
+def search_terms(query):
+    return TERM_RE.findall(fold(query.lower()))[:MAX_TERMS]
+
+
+def _fts5_match(terms):
+    # Every term is quoted, so user input is never read as FTS5 syntax,
+    # and matched as a prefix: unicode61 does no stemming, and a prefix
+    # also covers Russian word endings and a word still being typed.
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def _connection():
+    return connections[router.db_for_write(Post)]
+
+
+def index_posts(posts):
+    # `posts` are (id, title, text) triples.
+    posts = list(posts)
+    if not posts:
+        return
+    connection = _connection()
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.executemany(
+                f'DELETE FROM {SQLITE_TABLE} WHERE rowid = %s',
+                [(post_id,) for post_id, _, _ in posts],
+            )
+            cursor.executemany(
+                f'INSERT INTO {SQLITE_TABLE} (rowid, title, text) '
+                f'VALUES (%s, %s, %s)',
+                [
+                    (post_id, fold(title), fold(text))
+                    for post_id, title, text in posts
+                ],
+            )
+        elif connection.vendor == 'postgresql':
+            cursor.execute(
+                f'UPDATE blog_post SET search_vector = {POSTGRES_VECTOR} '
+                f'WHERE id = ANY(%s)',
+                [[post_id for post_id, _, _ in posts]],
+            )
+
+
+def unindex_posts(post_ids):
+    # PostgreSQL keeps the vector in the post row, which is gone already.
+    connection = _connection()
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {SQLITE_TABLE} WHERE rowid = %s',
+                [(post_id,) for post_id in post_ids],
+            )
+
+
+def prune_index():
+    # Drops index rows left behind by posts deleted without signals.
+    connection = _connection()
+    if connection.vendor != 'sqlite':
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {SQLITE_TABLE} '
+            f'WHERE rowid NOT IN (SELECT id FROM blog_post)'
+        )
+        pruned = cursor.rowcount
+        cursor.execute(
+            f"INSERT INTO {SQLITE_TABLE} ({SQLITE_TABLE}) VALUES ('optimize')"
+        )
+    return pruned
+
+
+def search_posts(posts, query):
+    # Narrows `posts` to those matching `query` and annotates
+    # `search_rank`: lower is more relevant, ties are broken by id.
+    terms = search_terms(query)
+    if not terms:
+        return posts.none().annotate(
+            search_rank=Value(0.0, output_field=FloatField())
+        )
+    vendor = connections[posts.db].vendor
+    if vendor == 'sqlite':
+        # Joined once: MATCH runs a single time per query, and bm25() of
+        # the joined row is what the rank, the ordering and the cursor
+        # read.
+        return posts.extra(
+            tables=[SQLITE_TABLE],
+            where=[
+                f'{SQLITE_TABLE}.rowid = blog_post.id',
+                f'{SQLITE_TABLE} MATCH %s',
+            ],
+            params=[_fts5_match(terms)],
+        ).annotate(
+            search_rank=RawSQL(SQLITE_RANK, [], output_field=FloatField())
+        )
+    if vendor == 'postgresql':
+        match = (
+            f"blog_post.search_vector @@ "
+            f"to_tsquery('{POSTGRES_CONFIG}', %s)"
+        )
+        rank = (
+            f"-ts_rank_cd(blog_post.search_vector, "
+            f"to_tsquery('{POSTGRES_CONFIG}', %s))"
+        )
+        params = [' & '.join(terms) + ':*']
+    else:
+        condition = Q()
+        for term in terms:
+            condition &= Q(title__icontains=term) | Q(text__icontains=term)
+        return posts.filter(condition).annotate(
+            search_rank=Value(0.0, output_field=FloatField())
+        )
+    return posts.extra(where=[match], params=params).annotate(
+        search_rank=RawSQL(rank, params, output_field=FloatField())
+    )
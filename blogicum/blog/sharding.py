@@ -0,0 +1,235 @@
+import random
+import time
+import zlib
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, NotSupportedError, models
+
+# Comment ids are unique across shards: milliseconds since 2020 above
+# 22 random bits, instead of a sequence local to each database.
+ID_EPOCH_MS = 1577836800000
+ID_RANDOM_BITS = 22
+
+POST_LOOKUPS = ('post', 'post_id', 'post__pk', 'post__id')
+
+
+def comment_shards():
+    return tuple(settings.BLOG_COMMENT_SHARDS)
+
+
+def sharding_enabled():
+    return bool(settings.BLOG_COMMENT_SHARDS)
+
+
+def shard_for_post(post_id, shards=None):
+    shards = shards or comment_shards()
+    return shards[zlib.crc32(str(post_id).encode()) % len(shards)]
+
+
+def new_comment_id():
+    millis = int(time.time() * 1000) - ID_EPOCH_MS
+    return millis << ID_RANDOM_BITS | random.getrandbits(ID_RANDOM_BITS)
+
+
+def _is_comment(model):
+    return model._meta.label_lower == 'blog.comment'
+
+
+def shard_from_hints(hints):
+    # The shard implied by the instance Django passes along: a comment,
+    # or the post whose comments are being read.
+    instance = hints.get('instance')
+    if instance is None:
+        return None
+    if instance._meta.label_lower == 'blog.post':
+        post_id = instance.pk
+    else:
+        post_id = instance.__dict__.get('post_id')
+    if post_id is None:
+        return None
+    return shard_for_post(post_id)
+
+
+class CommentShardRouter:
+    # Sends comments to the database chosen by their post id when
+    # BLOG_COMMENT_SHARDS is set; other models are left to the next
+    # router. A query the router cannot place fans out over all shards,
+    # see CommentQuerySet.
+
+    def db_for_read(self, model, **hints):
+        if _is_comment(model) and sharding_enabled():
+            return shard_from_hints(hints)
+        return None
+
+    db_for_write = db_for_read
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if sharding_enabled() and (_is_comment(obj1) or _is_comment(obj2)):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Shards hold nothing but the comment table.
+        if db == DEFAULT_DB_ALIAS or db not in comment_shards():
+            return None
+        return app_label == 'blog' and model_name == 'comment'
+
+
+def _ordering_key(field):
+    field = 'id' if field == 'pk' else field
+
+    def key(row):
+        if isinstance(row, dict):
+            value = row.get(field)
+        else:
+            value = row
+            for part in field.split('__'):
+                value = getattr(value, part, None)
+        return (value is not None, value)
+    return key
+
+
+class CommentQuerySet(models.QuerySet):
+    # Without shards this is a plain QuerySet. With them, filtering by
+    # post pins the query to that post's shard; anything else is run on
+    # every shard and the results are merged.
+
+    def _fans_out(self):
+        return (
+            sharding_enabled()
+            and self._db is None
+            and shard_from_hints(self._hints) is None
+        )
+
+    def _on_shards(self):
+        for alias in comment_shards():
+            queryset = self.using(alias)
+            queryset.query.clear_limits()
+            yield queryset
+
+    def filter(self, *args, **kwargs):
+        queryset = super().filter(*args, **kwargs)
+        if not sharding_enabled() or queryset._db is not None:
+            return queryset
+        for lookup in POST_LOOKUPS:
+            post = kwargs.get(lookup)
+            if isinstance(post, models.Model):
+                post = post.pk
+            if isinstance(post, (int, str)):
+                return queryset.using(shard_for_post(post))
+        return queryset
+
+    def select_related(self, *fields):
+        # Posts and users are not in the shard, so they cannot be joined.
+        if not sharding_enabled() or fields == (None,):
+            return super().select_related(*fields)
+        return self.prefetch_related(*(fields or ('post', 'author')))
+
+    def _fan_out_rows(self):
+        low, high = self.query.low_mark, self.query.high_mark
+        rows = []
+        for queryset in self._on_shards():
+            if high is not None:
+                queryset.query.set_limits(high=high)
+            rows.extend(queryset)
+        ordering = self.query.order_by or (
+            self.model._meta.ordering if self.query.default_ordering else ()
+        )
+        for field in reversed(ordering):
+            if not isinstance(field, str) or field == '?':
+                continue
+            rows.sort(
+                key=_ordering_key(field.lstrip('-')),
+                reverse=field.startswith('-'),
+            )
+        return rows[low:high]
+
+    def _fetch_all(self):
+        if self._result_cache is None and self._fans_out():
+            self._result_cache = self._fan_out_rows()
+        super()._fetch_all()
+
+    def iterator(self, chunk_size=2000):
+        if not self._fans_out():
+            yield from super().iterator(chunk_size)
+            return
+        # Shard by shard: rows are not merged into the query ordering.
+        for queryset in self._on_shards():
+            yield from queryset.iterator(chunk_size)
+
+    def count(self):
+        if not self._fans_out() or self._result_cache is not None:
+            return super().count()
+        total = sum(queryset.count() for queryset in self._on_shards())
+        low, high = self.query.low_mark, self.query.high_mark
+        if high is not None:
+            total = min(total, high)
+        return max(total - low, 0)
+
+    def exists(self):
+        if not self._fans_out() or self._result_cache is not None:
+            return super().exists()
+        return any(queryset.exists() for queryset in self._on_shards())
+
+    def aggregate(self, *args, **kwargs):
+        if self._fans_out():
+            raise NotSupportedError(
+                'Aggregates over all comment shards are not supported; '
+                'filter by post or pick a shard with using().'
+            )
+        return super().aggregate(*args, **kwargs)
+
+    def update(self, **kwargs):
+        if not self._fans_out():
+            return super().update(**kwargs)
+        return sum(queryset.update(**kwargs) for queryset in self._on_shards())
+
+    update.alters_data = True
+
+    def delete(self):
+        if not self._fans_out():
+            return super().delete()
+        total, per_model = 0, Counter()
+        for queryset in self._on_shards():
+            deleted, counts = queryset.delete()
+            total += deleted
+            per_model.update(counts)
+        return total, dict(per_model)
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+    def create(self, **kwargs):
+        # Model.save() asks the router, which knows the shard of the post.
+        instance = self.model(**kwargs)
+        self._for_write = True
+        instance.save(force_insert=True, using=self._db)
+        return instance
+
+    def bulk_create(self, objs, *args, **kwargs):
+        if not self._fans_out():
+            return super().bulk_create(objs, *args, **kwargs)
+        by_shard = defaultdict(list)
+        for obj in objs:
+            if obj.pk is None:
+                obj.pk = new_comment_id()
+            by_shard[shard_for_post(obj.post_id)].append(obj)
+        for alias, shard_objs in by_shard.items():
+            super(CommentQuerySet, self.using(alias)).bulk_create(
+                shard_objs, *args, **kwargs
+            )
+        return objs
+
+    def bulk_update(self, objs, fields, batch_size=None):
+        if not self._fans_out():
+            return super().bulk_update(objs, fields, batch_size)
+        by_shard = defaultdict(list)
+        for obj in objs:
+            by_shard[obj._state.db or shard_for_post(obj.post_id)].append(obj)
+        for alias, shard_objs in by_shard.items():
+            super(CommentQuerySet, self.using(alias)).bulk_update(
+                shard_objs, fields, batch_size
+            )
+
+    bulk_update.alters_data = True
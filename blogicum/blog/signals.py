@@ -0,0 +1,283 @@
+from django.contrib.auth import get_user_model
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import (
+    post_delete, post_init, post_save, pre_delete,
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .autocomplete import SOURCES, record_change, source_of
+from .cache import (
+    FEED_SCOPE, SHARED_SCOPE, author_scope, bump_generations, category_scope,
+    post_scope,
+)
+from .fingerprints import forget_fingerprint, store_fingerprint
+from .jobs import enqueue
+from .models import (
+    BannedPhrase, Category, Comment, Fingerprint, Location, Post, RelatedPost,
+)
+from .moderation import reload_banned_phrases
+from .search import index_posts, unindex_posts
+from .sharding import sharding_enabled
+from .storage import adjust_references, image_names
+
+User = get_user_model()
+
+
+def touch_post(post_id, comment_delta=0):
+    changes = {'updated_at': timezone.now()}
+    if comment_delta:
+        changes['published_comment_count'] = Greatest(
+            F('published_comment_count') + comment_delta, 0
+        )
+    Post.objects.filter(pk=post_id).update(**changes)
+
+
+@receiver(post_save, sender=Comment)
+def count_saved_comment(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    was_counted = (
+        not created
+        and getattr(instance, '_counted_is_published', False)
+        and getattr(instance, '_counted_post_id', None) is not None
+    )
+    old_post_id = instance._counted_post_id if was_counted else None
+    new_post_id = instance.post_id if instance.is_published else None
+    deltas = {instance.post_id: 0}
+    if old_post_id != new_post_id:
+        if old_post_id is not None:
+            deltas[old_post_id] = deltas.get(old_post_id, 0) - 1
+        if new_post_id is not None:
+            deltas[new_post_id] = deltas.get(new_post_id, 0) + 1
+    for post_id, delta in deltas.items():
+        touch_post(post_id, delta)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    counted = getattr(instance, '_counted_is_published', instance.is_published)
+    touch_post(
+        getattr(instance, '_counted_post_id', instance.post_id),
+        -1 if counted else 0,
+    )
+
+
+@receiver(pre_delete, sender=Post)
+@receiver(pre_delete, sender=User)
+def delete_sharded_comments(sender, instance, **kwargs):
+    # The cascade only sees comments in the database of the deleted row.
+    if not sharding_enabled():
+        return
+    if sender is Post:
+        Comment.objects.filter(post=instance).delete()
+    else:
+        Comment.objects.filter(author=instance).delete()
+
+
+@receiver(post_save, sender=Post)
+def index_saved_post(sender, instance, raw, update_fields=None, **kwargs):
+    if update_fields is not None and not {'title', 'text'} & set(
+        update_fields
+    ):
+        return
+    index_posts([(instance.pk, instance.title, instance.text)])
+
+
+@receiver(post_save, sender=Post)
+def queue_image_variants(sender, instance, raw, **kwargs):
+    if raw or not getattr(instance, '_image_changed', False):
+        return
+    instance._image_changed = False
+    adjust_references(
+        added=[instance.image.name],
+        removed=image_names(
+            instance._stored_image_name, instance._stored_image_variants,
+        ),
+    )
+    if instance.image:
+        enqueue(
+            'make_image_variants',
+            post_id=instance.pk, image=instance.image.name,
+        )
+
+
+@receiver(post_delete, sender=Post)
+def unindex_deleted_post(sender, instance, **kwargs):
+    unindex_posts([instance.pk])
+
+
+@receiver(pre_delete, sender=Post)
+def release_deleted_image(sender, instance, **kwargs):
+    # Read back, since the worker may have stored copies since the post
+    # was loaded.
+    stored = Post.objects.filter(pk=instance.pk).values_list(
+        'image', 'image_variants'
+    ).first()
+    if stored is not None:
+        adjust_references(removed=image_names(*stored))
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=Comment)
+def fingerprint_saved_text(sender, instance, raw, update_fields=None,
+                           **kwargs):
+    if update_fields is not None and not {'title', 'text'} & set(
+        update_fields
+    ):
+        return
+    if sender is Post:
+        store_fingerprint(
+            Fingerprint.POST, instance.pk,
+            f'{instance.title}\n{instance.text}',
+        )
+    else:
+        store_fingerprint(Fingerprint.COMMENT, instance.pk, instance.text)
+
+
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=Comment)
+def forget_deleted_fingerprint(sender, instance, **kwargs):
+    kind = Fingerprint.POST if sender is Post else Fingerprint.COMMENT
+    forget_fingerprint(kind, instance.pk)
+
+
+@receiver(post_save, sender=BannedPhrase)
+@receiver(post_delete, sender=BannedPhrase)
+def recompile_banned_phrases(sender, **kwargs):
+    reload_banned_phrases()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Location)
+@receiver(post_delete, sender=Location)
+def log_autocomplete_change(sender, instance, update_fields=None, **kwargs):
+    source = source_of(sender)
+    _, label_field = SOURCES[source]
+    if update_fields is not None and label_field not in update_fields:
+        return
+    record_change(source, instance.pk)
+
+
+def invalidate_feeds_of(posts):
+    # Bulk visibility updates bypass the post signals; the feeds showing
+    # the posts are invalidated here instead.
+    scopes = {FEED_SCOPE}
+    for slug, username in posts.values_list(
+        'category__slug', 'author__username'
+    ).order_by().distinct().iterator():
+        if slug:
+            scopes.add(category_scope(slug))
+        scopes.add(author_scope(username))
+    bump_generations(*scopes)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Location)
+def refresh_posts_visibility(sender, instance, raw, **kwargs):
+    if raw:
+        return
+    if instance.is_published:
+        changed = instance.posts.refresh_public_visibility()
+    else:
+        changed = instance.posts.filter(
+            is_publicly_visible=True
+        ).update(is_publicly_visible=False)
+    if changed:
+        invalidate_feeds_of(instance.posts.all())
+
+
+@receiver(pre_delete, sender=Category)
+@receiver(pre_delete, sender=Location)
+def hide_posts_of_deleted(sender, instance, **kwargs):
+    if instance.posts.filter(
+        is_publicly_visible=True
+    ).update(is_publicly_visible=False):
+        invalidate_feeds_of(instance.posts.all())
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_pages(sender, instance, **kwargs):
+    category_ids = {
+        instance.category_id, getattr(instance, '_stored_category_id', None)
+    }
+    author_ids = {
+        instance.author_id, getattr(instance, '_stored_author_id', None)
+    }
+    slugs = Category.objects.filter(
+        pk__in=category_ids - {None}
+    ).values_list('slug', flat=True)
+    usernames = User.objects.filter(
+        pk__in=author_ids - {None}
+    ).values_list('username', flat=True)
+    bump_generations(
+        FEED_SCOPE,
+        post_scope(instance.pk),
+        *map(category_scope, slugs),
+        *map(author_scope, usernames),
+    )
+
+
+@receiver(post_save, sender=Post)
+@receiver(pre_delete, sender=Post)
+def invalidate_related_pages(sender, instance, **kwargs):
+    # Pages listing the post among their related posts show its title.
+    post_ids = RelatedPost.objects.filter(
+        related=instance
+    ).values_list('post_id', flat=True)
+    bump_generations(*map(post_scope, post_ids))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment_pages(sender, instance, **kwargs):
+    scopes = [FEED_SCOPE]
+    post_ids = {
+        instance.post_id, getattr(instance, '_counted_post_id', None)
+    }
+    for post_id in post_ids - {None}:
+        scopes.append(post_scope(post_id))
+        slug, username = Post.objects.filter(pk=post_id).values_list(
+            'category__slug', 'author__username'
+        ).first() or (None, None)
+        if slug:
+            scopes.append(category_scope(slug))
+        if username:
+            scopes.append(author_scope(username))
+    bump_generations(*scopes)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Location)
+@receiver(post_delete, sender=Location)
+def invalidate_shared_pages(sender, **kwargs):
+    bump_generations(SHARED_SCOPE)
+
+
+@receiver(post_init, sender=User)
+def remember_username(sender, instance, **kwargs):
+    # The user name as stored: pages everywhere show it, the rest of the
+    # profile only the user's own pages.
+    instance._stored_username = instance.__dict__.get('username')
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_pages(sender, instance, signal, created=False,
+                          update_fields=None, **kwargs):
+    stored = getattr(instance, '_stored_username', None)
+    instance._stored_username = instance.username
+    if created or (
+        update_fields is not None and set(update_fields) <= {'last_login'}
+    ):
+        return
+    if signal is post_delete or stored != instance.username:
+        bump_generations(SHARED_SCOPE)
+    else:
+        bump_generations(author_scope(instance.username))
@@ -0,0 +1,62 @@
+import random
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import OperationalError, connection, transaction
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+OPTIMIZE_KEY = 'blog:sqlite-optimize:{}'
+
+# Writers of this process take turns here instead of fighting over the
+# database lock; other processes are kept in line by busy_timeout.
+_write_lock = threading.Lock()
+
+
+@receiver(connection_created)
+def configure_connection(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.BLOG_SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+        # Fresh statistics for the query planner, at most once per
+        # interval for each database file.
+        interval = settings.BLOG_SQLITE_OPTIMIZE_INTERVAL
+        if interval and cache.add(
+            OPTIMIZE_KEY.format(connection.settings_dict['NAME']), True,
+            timeout=interval,
+        ):
+            cursor.execute('PRAGMA optimize')
+
+
+def is_locked_error(error):
+    message = str(error).lower()
+    return 'database is locked' in message or 'database is busy' in message
+
+
+def serialized_write(func):
+    # Runs `func` in its own transaction behind the process write lock
+    # and retries it with jittered exponential backoff when SQLite still
+    # reports the database as locked. A deferred transaction that reads
+    # before writing fails at once on a busy database, whatever the busy
+    # timeout, so retrying the whole unit is the only way through. Inside
+    # an outer transaction nothing can be retried and `func` runs as is.
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if connection.vendor != 'sqlite' or connection.in_atomic_block:
+            return func(*args, **kwargs)
+        retries = settings.BLOG_SQLITE_WRITE_RETRIES
+        for attempt in range(retries + 1):
+            try:
+                with _write_lock, transaction.atomic():
+                    return func(*args, **kwargs)
+            except OperationalError as error:
+                if attempt == retries or not is_locked_error(error):
+                    raise
+            delay = settings.BLOG_SQLITE_WRITE_BACKOFF * 2 ** attempt
+            time.sleep(delay * random.uniform(0.5, 1.5))
+    return wrapper
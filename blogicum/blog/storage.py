@@ -0,0 +1,125 @@
+import hashlib
+import os
+import re
+import tempfile
+from collections import Counter
+from pathlib import PurePosixPath
+
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db.models import F
+from django.utils import timezone
+
+from .models import MediaBlob
+
+# Uploads are written here first, since their final name is only known
+# once the whole content has been hashed.
+INCOMING_DIR = '.incoming'
+BLOB_NAME_RE = re.compile(
+    r'^(?:[^/]+/)?([0-9a-f]{2})/([0-9a-f]{2})/(\1\2[0-9a-f]{60})(\.\w+)?$'
+)
+
+
+def blob_name(name, digest):
+    # <upload_to>/ab/cd/abcd…<extension>: two levels of 256 directories
+    # keep every directory small even with millions of files.
+    path = PurePosixPath(name)
+    extension = path.suffix.lower() if re.fullmatch(
+        r'\.\w{1,10}', path.suffix
+    ) else ''
+    prefix = f'{path.parts[0]}/' if len(path.parts) > 1 else ''
+    return f'{prefix}{digest[:2]}/{digest[2:4]}/{digest}{extension}'
+
+
+def is_content_addressed(name):
+    return BLOB_NAME_RE.match(name) is not None
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    # Stores every file once, under the SHA-256 of its content. Saving
+    # the same bytes again returns the name of the stored file, so
+    # identical uploads share one file and one URL, and the content
+    # behind a URL never changes.
+
+    def get_available_name(self, name, max_length=None):
+        return name
+
+    def _save(self, name, content):
+        incoming = self.path(INCOMING_DIR)
+        os.makedirs(incoming, exist_ok=True)
+        handle, temporary = tempfile.mkstemp(dir=incoming)
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with os.fdopen(handle, 'wb') as file:
+                if hasattr(content, 'seek'):
+                    content.seek(0)
+                for chunk in content.chunks():
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode()
+                    digest.update(chunk)
+                    file.write(chunk)
+                    size += len(chunk)
+            name = blob_name(name, digest.hexdigest())
+            full_path = self.path(name)
+            if os.path.exists(full_path):
+                # Refreshed, so that the collector's grace period counts
+                # from this upload rather than the first one.
+                os.utime(full_path)
+            else:
+                os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                if self.file_permissions_mode is not None:
+                    os.chmod(temporary, self.file_permissions_mode)
+                # Atomic: a concurrent upload of the same content replaces
+                # the file with identical bytes.
+                os.replace(temporary, full_path)
+                temporary = None
+        finally:
+            if temporary is not None:
+                os.unlink(temporary)
+        blob, created = MediaBlob.objects.get_or_create(
+            name=name, defaults={'size': size}
+        )
+        if not created:
+            blob.save(update_fields=('updated_at',))
+        return name
+
+    def delete(self, name):
+        # A file still referenced by a post stays.
+        if MediaBlob.objects.filter(name=name, references__gt=0).exists():
+            return
+        super().delete(name)
+        MediaBlob.objects.filter(name=name).delete()
+
+
+def adjust_references(added=(), removed=()):
+    # Counts post references to stored files. Files are shared, so one
+    # left without references is not deleted right away: another upload
+    # of the same content may be about to refer to it again. `manage.py
+    # gcmedia` removes it later.
+    delta = Counter(name for name in added if name)
+    delta.subtract(name for name in removed if name)
+    now = timezone.now()
+    for name, change in delta.items():
+        if not change:
+            continue
+        updated = MediaBlob.objects.filter(name=name).update(
+            references=F('references') + change, updated_at=now
+        )
+        if not updated and change > 0 and default_storage.exists(name):
+            # A file stored before the references were counted.
+            MediaBlob.objects.get_or_create(
+                name=name,
+                defaults={
+                    'size': default_storage.size(name), 'references': change,
+                },
+            )
+
+
+def variant_names(image, variants):
+    # The resized copies of an image; `variants` lists the image too.
+    return {item['name'] for item in variants or ()} - {str(image or '')}
+
+
+def image_names(image, variants):
+    # Every file a post refers to: the image and its resized copies.
+    return {str(image or '')} | variant_names(image, variants)
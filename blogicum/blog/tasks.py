@@ -0,0 +1,41 @@
+from .images import make_variants
+from .jobs import task
+from .models import Post
+from .signals import invalidate_post_pages
+from .storage import adjust_references, variant_names
+
+
+def replace_image_variants(post):
+    # Stores fresh copies of the post image unless the image has been
+    # replaced meanwhile; returns whether it has not.
+    variants = make_variants(post.image)
+    updated = Post.objects.filter(pk=post.pk, image=post.image.name).update(
+        image_variants=variants
+    )
+    if updated:
+        adjust_references(
+            added=variant_names(post.image, variants),
+            removed=variant_names(post.image, post.image_variants),
+        )
+    return bool(updated)
+
+
+def show_original_image(post_id, image):
+    # The copies could not be made: the original is shown instead of the
+    # placeholder.
+    post = Post.objects.filter(pk=post_id, image=image).first()
+    if post is None:
+        return
+    if Post.objects.filter(pk=post_id, image=image, image_variants=[]).update(
+        image_variants=[{'name': image, 'width': None, 'height': None}]
+    ):
+        invalidate_post_pages(Post, post)
+
+
+@task('make_image_variants', on_failure=show_original_image)
+def make_post_image_variants(post_id, image):
+    # The post may have been deleted or given another image meanwhile;
+    # then there is nothing to do, the newer upload has its own job.
+    post = Post.objects.filter(pk=post_id, image=image).first()
+    if post is not None and replace_image_variants(post):
+        invalidate_post_pages(Post, post)
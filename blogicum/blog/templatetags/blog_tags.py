@@ -0,0 +1,66 @@
+import hashlib
+
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+
+from blog.cache import SHARED_SCOPE, get_generations, post_scope
+from blog.images import responsive_attrs
+
+register = template.Library()
+
+CARD_KEY = 'blog:card:{}:{}'
+
+
+def card_cache_key(post, generations):
+    version = hashlib.md5(
+        '|'.join(map(str, (
+            generations[post_scope(post.id)],
+            generations[SHARED_SCOPE],
+            post.category_id,
+            post.location_id,
+            post.published_comment_count,
+        ))).encode()
+    ).hexdigest()
+    return CARD_KEY.format(post.id, version)
+
+
+def render_card(post):
+    return render_to_string('includes/post_card.html', {'post': post})
+
+
+@register.simple_tag
+def post_cards(posts):
+    posts = list(posts)
+    timeout = settings.BLOG_CARD_CACHE_TIMEOUT
+    if not timeout:
+        return [render_card(post) for post in posts]
+
+    generations = get_generations(
+        [SHARED_SCOPE, *(post_scope(post.id) for post in posts)]
+    )
+    keys = [card_cache_key(post, generations) for post in posts]
+    cached = cache.get_many(keys)
+    rendered = {}
+    cards = []
+    for post, key in zip(posts, keys):
+        card = cached.get(key)
+        if card is None:
+            card = rendered[key] = render_card(post)
+        cards.append(card)
+    if rendered:
+        cache.set_many(rendered, timeout)
+    return cards
+
+
+@register.inclusion_tag('includes/post_image.html')
+def post_image(post, sizes, lazy=False, placeholder=False):
+    # Works with Post and with the PostRow of the feeds alike.
+    return {
+        'image': responsive_attrs(
+            post.image, post.image_variants, placeholder
+        ),
+        'sizes': sizes,
+        'lazy': lazy,
+    }
@@ -0,0 +1,18 @@
+from django.template.defaultfilters import linebreaksbr
+from django.utils.text import Truncator
+
+EXCERPT_WORDS = 10
+
+
+def make_excerpt(text, complete=True):
+    # Same output as `truncatewords:10`; pass complete=False when `text`
+    # is only a prefix of the real text.
+    excerpt = Truncator(text).words(EXCERPT_WORDS, truncate=' …')
+    if not complete and len(text.split()) <= EXCERPT_WORDS:
+        excerpt += ' …'
+    return excerpt
+
+
+def render_html(text):
+    # Same output as `linebreaksbr` with autoescaping on.
+    return str(linebreaksbr(text, autoescape=True))
@@ -6,6 +6,9 @@ app_name = 'blog'
 
 urlpatterns = [
     path('', views.index, name='index'),
+    path('search/', views.search, name='search'),
+    path('autocomplete/<str:source>/',
+         views.autocomplete, name='autocomplete'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
     path('profile/edit/',
          views.ProfileUpdateView.as_view(), name='edit_profile'),
@@ -0,0 +1,13 @@
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment
+
+
+def published_comment_count_subquery():
+    published_comments = Comment.objects.filter(
+        post=OuterRef('pk'), is_published=True
+    ).order_by().values('post').annotate(total=Count('pk')).values('total')
+    return Coalesce(
+        Subquery(published_comments, output_field=IntegerField()), 0
+    )
@@ -1,55 +1,78 @@
 from django.shortcuts import render, get_object_or_404, redirect
-from django.db.models import Q, Count
-from django.http import Http404
+from django.db.models import Q
+from django.core.exceptions import PermissionDenied
+from django.http import Http404, JsonResponse
 from django.utils import timezone
 from django.contrib.auth import get_user_model
-from django.core.paginator import Paginator
+from django.conf import settings
 from django.urls import reverse_lazy
 from django.contrib.auth.decorators import login_required
 from django.views.generic import DeleteView, UpdateView
 from django.contrib.auth.mixins import LoginRequiredMixin
 
-from datetime import datetime
-from django.utils import timezone
-
-from .models import Category, Post, Comment
+from .autocomplete import (
+    AUTOCOMPLETE_PAGE_SIZE, SOURCES, STAFF_SOURCES, get_index,
+)
+from .cache import (
+    FEED_SCOPE, author_scope, cache_anonymous_page, category_scope,
+    post_scope,
+)
+from .conditional import (
+    category_validators, conditional_page, index_validators,
+    post_validators, profile_validators,
+)
+from .models import Category, Post, Comment, RelatedPost
 from .forms import PostForm, CommentForm
+from .pagination import CachedCountPaginator, CursorPaginator
+from .routing import replica_reads
+from .scheduling import published_before
+from .search import search_posts
+from .sqlite import serialized_write
 
 User = get_user_model()
 
+POSTS_PER_PAGE = 10
+FEED_CURSOR_ORDERING = ('-pub_date', '-id')
+SEARCH_CURSOR_ORDERING = ('search_rank', 'id')
+COMMENTS_PER_PAGE = 50
+COMMENT_CURSOR_ORDERING = ('created_at', 'id')
 
-def get_post_list_with_comment_count(filtrate=False, special_filters=None):
-    posts = Post.objects.select_related(
-        'author', 'category', 'location'
-    )
+
+def get_post_list_with_comment_count(filtrate=False, special_filters=None,
+                                     scope=FEED_SCOPE):
+    posts = Post.objects.all()
     if filtrate:
         posts = posts.filter(
-            Q(category__is_published=True)
-            & Q(is_published=True)
-            & Q(pub_date__lte=datetime.now())
-            & Q(location__is_published=True)
+            Q(is_publicly_visible=True)
+            & Q(**published_before(scope))
         )
     if special_filters:
         posts = posts.filter(
             special_filters
         )
-    posts = posts.annotate(
-        comment_count=Count(
-            'comments',
-            filter=(
-                Q(comments__is_published=True)
-            )
-        )
-    ).order_by(*Post._meta.ordering)
-    return posts
+    return posts.order_by(*Post._meta.ordering).card_rows()
 
 
-def get_paginator_page(request, posts):
-    paginator = Paginator(posts, 10)
+def get_paginator_page(request, posts, scope=FEED_SCOPE, count_name=None):
+    cursor = request.GET.get('cursor')
+    use_cursor = cursor is not None or (
+        settings.BLOG_CURSOR_PAGINATION and 'page' not in request.GET
+    )
+    if use_cursor:
+        paginator = CursorPaginator(
+            posts, POSTS_PER_PAGE, FEED_CURSOR_ORDERING
+        )
+        return paginator.get_page(cursor)
+    paginator = CachedCountPaginator(
+        posts, POSTS_PER_PAGE, count_name or scope, (scope,)
+    )
     page_number = request.GET.get('page')
     return paginator.get_page(page_number)
 
 
+@replica_reads
+@conditional_page(index_validators)
+@cache_anonymous_page(lambda: (FEED_SCOPE,))
 def index(request):
     template = 'blog/index.html'
     post_list = get_post_list_with_comment_count(
@@ -61,53 +84,129 @@ def index(request):
     return render(request, template, context)
 
 
+@replica_reads
+@cache_anonymous_page(lambda: (FEED_SCOPE,))
+def search(request):
+    template = 'blog/search.html'
+    query = request.GET.get('q', '').strip()
+    page_obj = None
+    if query:
+        post_list = search_posts(
+            Post.objects.filter(
+                Q(is_publicly_visible=True)
+                & Q(**published_before(FEED_SCOPE))
+            ),
+            query,
+        ).card_rows('search_rank')
+        page_obj = CursorPaginator(
+            post_list, POSTS_PER_PAGE, SEARCH_CURSOR_ORDERING
+        ).get_page(request.GET.get('cursor'))
+    context = {'query': query, 'page_obj': page_obj}
+    return render(request, template, context)
+
+
+@login_required
+def autocomplete(request, source):
+    if source not in SOURCES:
+        raise Http404
+    if source in STAFF_SOURCES and not request.user.is_staff:
+        raise PermissionDenied
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        page = 1
+    found, more = get_index(source).search(
+        request.GET.get('q', '').strip(),
+        offset=(page - 1) * AUTOCOMPLETE_PAGE_SIZE,
+    )
+    return JsonResponse({
+        'results': [{'id': pk, 'text': label} for pk, label in found],
+        'more': more,
+    })
+
+
+@replica_reads
+@conditional_page(post_validators)
+@cache_anonymous_page(lambda post_id: (post_scope(post_id),))
 def post_detail(request, post_id):
     template = 'blog/detail.html'
-    post = get_object_or_404(Post, pk=post_id)
-    if not post.is_published and request.user != post.author:
-        raise Http404
-    if not post.category.is_published and request.user != post.author:
+    post = get_object_or_404(
+        Post.objects.select_related('author', 'category', 'location'),
+        pk=post_id,
+    )
+    if not post.is_publicly_visible and request.user != post.author:
         raise Http404
     if post.pub_date > timezone.now() and request.user != post.author:
         raise Http404
+    comments = CursorPaginator(
+        Comment.objects.filter(post=post).select_related('author'),
+        COMMENTS_PER_PAGE,
+        COMMENT_CURSOR_ORDERING,
+    ).get_page(request.GET.get('comments_after'))
+    # Precomputed by `manage.py compute_related_posts`.
+    related_posts = RelatedPost.objects.filter(
+        post=post,
+        related__is_publicly_visible=True,
+        related__pub_date__lte=timezone.now(),
+    ).order_by('-score').values_list('related_id', 'related__title')
     context = {'post': post}
     context['form'] = CommentForm()
-    context['comments'] = Comment.objects.filter(post=post)
+    context['comments'] = comments
+    context['related_posts'] = related_posts
     return render(request, template, context)
 
 
+@replica_reads
+@conditional_page(category_validators)
+@cache_anonymous_page(
+    lambda category_slug: (category_scope(category_slug),)
+)
 def category_posts(request, category_slug):
     template = 'blog/category.html'
     category = get_object_or_404(Category, slug=category_slug)
     if not category.is_published:
         raise Http404
+    scope = category_scope(category_slug)
     post_list = get_post_list_with_comment_count(
         filtrate=True,
-        special_filters=Q(category=category)
+        special_filters=Q(category=category),
+        scope=scope,
     )
 
-    page_obj = get_paginator_page(request=request, posts=post_list)
+    page_obj = get_paginator_page(
+        request=request, posts=post_list, scope=scope
+    )
     context = {'category': category, 'post_list': post_list}
     context['page_obj'] = page_obj
     return render(request, template, context)
 
 
+@replica_reads
+@conditional_page(profile_validators)
+@cache_anonymous_page(lambda username: (author_scope(username),))
 def view_profile(request, username):
     template = 'blog/profile.html'
 
     user_profile = get_object_or_404(User, username=username)
+    scope = author_scope(username)
     if (request.user == user_profile):
         post_list = post_list = get_post_list_with_comment_count(
             filtrate=False,
             special_filters=Q(author=user_profile)
         )
+        # The author also sees hidden posts, so the total differs.
+        count_name = f'{scope}:own'
     else:
         post_list = get_post_list_with_comment_count(
             filtrate=True,
-            special_filters=Q(author=user_profile)
+            special_filters=Q(author=user_profile),
+            scope=scope,
         )
+        count_name = scope
 
-    page_obj = get_paginator_page(request=request, posts=post_list)
+    page_obj = get_paginator_page(
+        request=request, posts=post_list, scope=scope, count_name=count_name
+    )
     context = {'page_obj': page_obj, 'profile': user_profile}
 
     return render(request, template, context)
@@ -119,7 +218,7 @@ def create_post(request, pk=None):
     if form.is_valid():
         post = form.save(commit=False)
         post.author = request.user
-        post.save()
+        serialized_write(post.save)()
         return redirect('blog:profile', username=request.user.username)
     context = {'form': form}
     return render(request, 'blog/create.html', context)
@@ -132,7 +231,7 @@ def edit_post(request, post_id):
         if form.is_valid():
             post = form.save(commit=False)
             post.author = request.user
-            post.save()
+            serialized_write(post.save)()
             return redirect('blog:post_detail', post_id=post_id)
 
         form = PostForm(instance=post)
@@ -150,7 +249,7 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        serialized_write(comment.save)()
     return redirect('blog:post_detail', post_id=post_id)
 
 
@@ -163,7 +262,7 @@ def edit_comment(request, post_id, comment_id):
             comment = form.save(commit=False)
             comment.author = request.user
             comment.post = post
-            comment.save()
+            serialized_write(comment.save)()
             return redirect('blog:post_detail', post_id=post_id)
 
         form = CommentForm(instance=comment)
@@ -177,7 +276,7 @@ def delete_comment(request, post_id, comment_id):
     context = {'comment': comment}
     if comment.author == request.user:
         if request.method == 'POST':
-            comment.delete()
+            serialized_write(comment.delete)()
             return redirect('blog:post_detail', post_id=post_id)
     return render(request, 'blog/comment.html', context)
 
@@ -193,6 +292,10 @@ class PostDeleteView(LoginRequiredMixin, DeleteView):
             return Post.objects.all()
         return Post.objects.filter(author=user)
 
+    def delete(self, request, *args, **kwargs):
+        # The cascade deletes comments, fingerprints and related rows.
+        return serialized_write(super().delete)(request, *args, **kwargs)
+
     def get_success_url(self):
         return reverse_lazy('blog:profile',
                             kwargs={'username': self.request.user.username})
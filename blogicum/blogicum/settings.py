@@ -53,6 +53,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'blog.routing.ReplicaRoutingMiddleware',
 ]
 
 ROOT_URLCONF = 'blogicum.urls'
@@ -88,6 +89,55 @@ DATABASES = {
     }
 }
 
+DATABASE_ROUTERS = [
+    'blog.sharding.CommentShardRouter',
+    'blog.routing.ReplicaRouter',
+]
+
+# Aliases from DATABASES to spread comments over by a hash of their post
+# id; empty keeps them in `default`. After changing the list, migrate
+# each new alias and run `manage.py rebalance_comments`.
+BLOG_COMMENT_SHARDS = []
+
+# Aliases from DATABASES holding read-only copies of `default`. Feed and
+# post pages read from them; a user who has just written is pinned to
+# the primary by a cookie for BLOG_PRIMARY_PIN_SECONDS, which should
+# exceed the replication lag.
+BLOG_READ_REPLICAS = []
+BLOG_PRIMARY_PIN_COOKIE = 'blog_primary'
+BLOG_PRIMARY_PIN_SECONDS = 10
+
+# Applied to every new SQLite connection by blog/sqlite.py. In WAL mode
+# readers keep working while a writer commits, and busy_timeout (ms)
+# makes a writer wait for the lock instead of failing at once.
+BLOG_SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -20000,
+    'busy_timeout': 5000,
+}
+
+# `PRAGMA optimize` runs on a new connection at most once per interval.
+BLOG_SQLITE_OPTIMIZE_INTERVAL = 60 * 60
+
+# Views writing through `serialized_write` retry a locked database this
+# many times, sleeping about BACKOFF * 2 ** attempt seconds in between.
+BLOG_SQLITE_WRITE_RETRIES = 5
+BLOG_SQLITE_WRITE_BACKOFF = 0.05
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+# Use a shared backend (Memcached, Redis) when running several workers,
+# otherwise every process keeps its own copy of pages and counters.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -148,3 +198,69 @@ EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = BASE_DIR / 'sent_emails'
 
 MEDIA_ROOT = BASE_DIR / 'media'
+
+MEDIA_URL = '/media/'
+
+# Media files are served by blog.media.serve_media. Behind nginx set ACCEL
+# to 'x-accel-redirect' and map ACCEL_PREFIX to MEDIA_ROOT:
+#     location /protected-media/ { internal; alias <MEDIA_ROOT>/; }
+# behind Apache mod_xsendfile or lighttpd set it to 'x-sendfile'. Then the
+# proxy sends the bytes; with '' the view streams them itself. Files not
+# named by their content are cached for MAX_AGE seconds, the others for
+# a year.
+BLOG_MEDIA_ACCEL = ''
+BLOG_MEDIA_ACCEL_PREFIX = '/protected-media/'
+BLOG_MEDIA_MAX_AGE = 60 * 60
+
+# Uploads are stored once per content, under their SHA-256 digest, and
+# counted by the posts referring to them (blog/storage.py). Files no post
+# refers to any more are deleted by `manage.py gcmedia`.
+DEFAULT_FILE_STORAGE = 'blog.storage.ContentAddressedStorage'
+
+# Keyset pagination for the feeds: pages are linked with opaque `?cursor=`
+# tokens instead of `?page=N`; old numbered links keep working.
+BLOG_CURSOR_PAGINATION = False
+
+# Anonymous readers get feed and post pages from the cache for this many
+# seconds at most; model signals invalidate them earlier. 0 disables it.
+BLOG_PAGE_CACHE_TIMEOUT = 60 * 15
+
+# Totals for the numbered feed pages are cached per feed; after a change
+# the old total is shown while a background thread counts the new one.
+BLOG_COUNT_REFRESH_ASYNC = True
+# Counts expire after this many seconds even if no refresh replaced
+# them, so a refresh that failed cannot leave a total stale for good.
+BLOG_COUNT_CACHE_TIMEOUT = 60 * 60
+
+# Rendered post cards are shared by the index, category and profile feeds
+# and cached under a version derived from the post; 0 disables it.
+BLOG_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+# How long "nothing is scheduled" is remembered for a feed; any post
+# change in the feed forgets it earlier.
+BLOG_SCHEDULE_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Vectors of the posts for `manage.py compute_related_posts`, kept between
+# runs so that `--incremental` only vectorizes new and changed posts.
+# Saving a post does not recompute anything: edits show up after the
+# next run, so schedule the command (e.g. hourly with --incremental).
+BLOG_RELATED_POSTS_DIR = BASE_DIR / 'related_posts'
+
+# What PostForm and CommentForm do with a near-duplicate of a stored text:
+# 'reject' it, or 'flag' it by saving it unpublished; '' turns it off.
+# `manage.py fingerprint_content` fingerprints the texts saved before.
+BLOG_NEAR_DUPLICATES = 'reject'
+
+# Widths of the copies made of every uploaded post image for `srcset`,
+# and the JPEG quality they are encoded at. They are made by
+# `manage.py runworker`; `manage.py make_image_variants` makes them for
+# images uploaded before.
+BLOG_IMAGE_WIDTHS = (320, 640, 1024, 1600)
+BLOG_IMAGE_QUALITY = 82
+
+# Background jobs of `manage.py runworker`: a failed job is retried up to
+# MAX_ATTEMPTS times after about BACKOFF * 2 ** attempt seconds, and a job
+# running longer than TIMEOUT seconds is taken for lost and run again.
+BLOG_JOB_MAX_ATTEMPTS = 5
+BLOG_JOB_BACKOFF = 5
+BLOG_JOB_TIMEOUT = 10 * 60
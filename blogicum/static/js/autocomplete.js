@@ -0,0 +1,81 @@
+// Turns every <select data-autocomplete-url> into a search box backed by
+// the blog autocomplete endpoint, so the page never ships all options.
+(function () {
+  'use strict';
+
+  function attach(select) {
+    var input = document.createElement('input');
+    var list = document.createElement('ul');
+    var query = '';
+    var page = 1;
+    var timer = null;
+
+    input.type = 'search';
+    input.className = 'form-control mb-1';
+    input.placeholder = 'Начните вводить';
+    input.autocomplete = 'off';
+    list.className = 'list-group position-absolute w-100 shadow-sm';
+    list.style.zIndex = 1000;
+    select.parentNode.style.position = 'relative';
+    select.parentNode.insertBefore(input, select);
+    select.parentNode.insertBefore(list, select.nextSibling);
+
+    function choose(id, text) {
+      var option = select.querySelector('option[value="' + id + '"]');
+      if (!option) {
+        option = new Option(text, id);
+        select.appendChild(option);
+      }
+      select.value = String(id);
+      select.dispatchEvent(new Event('change', {bubbles: true}));
+      list.innerHTML = '';
+      input.value = '';
+    }
+
+    function item(text, onClick, extraClass) {
+      var li = document.createElement('li');
+      li.className = 'list-group-item list-group-item-action ' + (extraClass || '');
+      li.textContent = text;
+      li.style.cursor = 'pointer';
+      li.addEventListener('mousedown', function (event) {
+        event.preventDefault();
+        onClick();
+      });
+      list.appendChild(li);
+    }
+
+    function load(append) {
+      var url = select.dataset.autocompleteUrl +
+        '?q=' + encodeURIComponent(query) + '&page=' + page;
+      fetch(url, {credentials: 'same-origin'})
+        .then(function (response) { return response.json(); })
+        .then(function (data) {
+          if (!append) {
+            list.innerHTML = '';
+          } else if (list.lastChild) {
+            list.removeChild(list.lastChild);
+          }
+          data.results.forEach(function (result) {
+            item(result.text, function () { choose(result.id, result.text); });
+          });
+          if (data.more) {
+            item('Ещё…', function () { page += 1; load(true); }, 'text-muted');
+          }
+        });
+    }
+
+    input.addEventListener('input', function () {
+      clearTimeout(timer);
+      timer = setTimeout(function () {
+        query = input.value.trim();
+        page = 1;
+        load(false);
+      }, 200);
+    });
+    input.addEventListener('blur', function () { list.innerHTML = ''; });
+  }
+
+  document.addEventListener('DOMContentLoaded', function () {
+    document.querySelectorAll('select[data-autocomplete-url]').forEach(attach);
+  });
+})();
@@ -41,6 +41,22 @@ def enable_debug_false():
         yield
 
 
+@pytest.fixture(autouse=True)
+def clear_cache():
+    # The database is rolled back between tests, the cache is not.
+    from django.core.cache import cache
+
+    cache.clear()
+    yield
+
+
+@pytest.fixture(autouse=True)
+def sync_count_refresh():
+    # Background threads would not see the data of the test transaction.
+    with override_settings(BLOG_COUNT_REFRESH_ASYNC=False):
+        yield
+
+
 class SafeImportFromContextManager:
     def __init__(
             self,
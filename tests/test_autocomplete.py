@@ -0,0 +1,103 @@
+from http import HTTPStatus
+
+import pytest
+from mixer.backend.django import Mixer
+
+pytestmark = [pytest.mark.django_db]
+
+
+@pytest.fixture
+def fresh_indexes():
+    # Indexes live in the process, the database is rolled back per test.
+    from blog import autocomplete
+
+    for index in autocomplete._indexes.values():
+        index.index = index.version = None
+
+
+def results(client, source, **params):
+    response = client.get(f"/autocomplete/{source}/", params)
+    assert response.status_code == HTTPStatus.OK
+    return response.json()
+
+
+def test_autocomplete_pages_by_prefix(
+        mixer: Mixer, user_client, fresh_indexes, monkeypatch):
+    from blog.autocomplete import AUTOCOMPLETE_PAGE_SIZE, SourceIndex
+
+    titles = [f"Путешествие {i:02}" for i in range(AUTOCOMPLETE_PAGE_SIZE + 3)]
+    for title in titles:
+        mixer.blend("blog.Category", title=title)
+    mixer.blend("blog.Category", title="Природа")
+
+    data = results(user_client, "categories", q="пУТ")
+    assert [item["text"] for item in data["results"]] == (
+        titles[:AUTOCOMPLETE_PAGE_SIZE]
+    ), "Убедитесь, что подсказки ищутся по началу строки без учёта регистра."
+    assert data["more"]
+    data = results(user_client, "categories", q="пут", page=2)
+    assert [item["text"] for item in data["results"]] == (
+        titles[AUTOCOMPLETE_PAGE_SIZE:]
+    )
+    assert not data["more"]
+
+    rebuilds = []
+    monkeypatch.setattr(
+        SourceIndex, "rebuild",
+        lambda self, version: rebuilds.append(self.name),
+    )
+    category = mixer.blend("blog.Category", title="Пруд")
+    data = results(user_client, "categories", q="пр")
+    assert [item["text"] for item in data["results"]] == ["Природа", "Пруд"]
+    category.delete()
+    data = results(user_client, "categories", q="пр")
+    assert [item["text"] for item in data["results"]] == ["Природа"]
+    assert not rebuilds, (
+        "Убедитесь, что индекс подсказок обновляется по изменениям, "
+        "а не перестраивается целиком."
+    )
+    assert user_client.get("/autocomplete/posts/").status_code == 404
+    assert user_client.get("/autocomplete/users/").status_code == 403, (
+        "Убедитесь, что список пользователей в подсказках доступен только "
+        "персоналу."
+    )
+
+
+def test_post_form_renders_selected_option_only(
+        mixer: Mixer, user_client, post_with_published_location):
+    mixer.cycle(30).blend("blog.Location")
+    post = post_with_published_location
+    content = user_client.get(f"/posts/{post.id}/edit/").content.decode()
+    assert content.count("<option") <= 4, (
+        "Убедитесь, что форма поста не выводит все категории и "
+        "местоположения списком."
+    )
+    assert f'value="{post.location_id}" selected' in content
+    assert "data-autocomplete-url" in content
+
+
+def test_invalid_choice_is_a_form_error(
+        user_client, admin_client, post_with_published_location):
+    post = post_with_published_location
+    response = user_client.post("/posts/create/", {
+        "title": "Заголовок", "text": "Текст", "category": "abc",
+        "pub_date": "2020-01-01T10:00",
+    })
+    assert response.status_code == HTTPStatus.OK, (
+        "Убедитесь, что неверное значение в поле с подсказками "
+        "показывается как ошибка формы."
+    )
+    assert "category" in response.context["form"].errors
+    response = admin_client.post(
+        f"/admin/blog/post/{post.id}/change/", {"category": "zz"}
+    )
+    assert response.status_code == HTTPStatus.OK
+
+
+def test_admin_post_form_uses_autocomplete(
+        admin_client, mixer: Mixer, fresh_indexes):
+    mixer.cycle(30).blend("auth.User")
+    content = admin_client.get("/admin/blog/post/add/").content.decode()
+    assert content.count("data-autocomplete-url") == 3
+    assert content.count("<option") <= 3
+    assert results(admin_client, "users", q="adm")["results"]
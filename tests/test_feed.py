@@ -0,0 +1,606 @@
+from datetime import timedelta
+from http import HTTPStatus
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.test import override_settings
+from django.utils import timezone
+from mixer.backend.django import Mixer
+
+from conftest import N_PER_PAGE
+
+pytestmark = [pytest.mark.django_db]
+
+
+@pytest.fixture
+def feed_posts(mixer: Mixer, user, published_location, published_category):
+    now = timezone.now()
+    # Two posts share every pub_date to exercise the `id` tie-breaker.
+    pub_dates = (
+        now - timedelta(hours=i // 2) for i in range(1, N_PER_PAGE * 2 + 6)
+    )
+    return mixer.cycle(N_PER_PAGE * 2 + 5).blend(
+        "blog.Post",
+        author=user,
+        category=published_category,
+        location=published_location,
+        pub_date=pub_dates,
+    )
+
+
+def _walk(client, url, cursor_key):
+    pages = []
+    response = client.get(url)
+    while True:
+        assert response.status_code == HTTPStatus.OK
+        page_obj = response.context["page_obj"]
+        pages.append([post.id for post in page_obj])
+        cursor = getattr(page_obj, cursor_key)
+        if cursor is None:
+            return pages, page_obj
+        response = client.get(url, {"cursor": cursor})
+
+
+def test_cursor_pagination_walks_feed(user_client, feed_posts):
+    expected = [
+        post.id for post in sorted(
+            feed_posts, key=lambda post: (post.pub_date, post.id),
+            reverse=True)
+    ]
+    pages, last_page = _walk(user_client, "/?cursor=", "next_cursor")
+    assert [len(page) for page in pages] == [10, 10, 5], (
+        "Убедитесь, что при курсорной пагинации на странице выводится"
+        " не более 10 публикаций."
+    )
+    assert sum(pages, []) == expected, (
+        "Убедитесь, что курсорная пагинация выводит каждую публикацию ровно"
+        " один раз в порядке «от новых к старым»."
+    )
+
+    back = user_client.get("/", {"cursor": last_page.previous_cursor})
+    assert [post.id for post in back.context["page_obj"]] == pages[1]
+
+
+@override_settings(BLOG_CURSOR_PAGINATION=True)
+def test_cursor_mode_keeps_page_links(user_client, feed_posts):
+    response = user_client.get("/")
+    assert getattr(response.context["page_obj"], "is_cursor_page", False)
+    assert "?cursor=" in response.content.decode("utf-8")
+
+    response = user_client.get("/", {"page": 2})
+    assert response.context["page_obj"].number == 2, (
+        "Убедитесь, что ссылки вида `?page=N` продолжают работать."
+    )
+
+
+def test_invalid_cursor_falls_back_to_first_page(user_client, feed_posts):
+    response = user_client.get("/", {"cursor": "not-a-cursor"})
+    assert response.status_code == HTTPStatus.OK
+    assert not response.context["page_obj"].has_previous()
+
+
+def test_published_comment_count_follows_comments(
+        mixer: Mixer, post_with_published_location, CommentModel):
+    post = post_with_published_location
+
+    def stored_count():
+        post.refresh_from_db()
+        return post.published_comment_count
+
+    comments = mixer.cycle(3).blend(
+        CommentModel, post=post, is_published=True)
+    assert stored_count() == 3, (
+        "Убедитесь, что счётчик комментариев публикации увеличивается при"
+        " добавлении комментария."
+    )
+
+    comments[0].is_published = False
+    comments[0].save()
+    assert stored_count() == 2
+    comments[0].save()
+    assert stored_count() == 2
+
+    comments[0].delete()
+    assert stored_count() == 2
+    comments[1].delete()
+    assert stored_count() == 1
+
+    CommentModel.objects.filter(pk=comments[2].pk).update(is_published=False)
+    call_command("recount_comments", batch_size=1, stdout=StringIO())
+    assert stored_count() == 0, (
+        "Убедитесь, что команда `recount_comments` исправляет разошедшиеся"
+        " счётчики комментариев."
+    )
+
+
+def test_public_visibility_follows_category_and_location(
+        post_with_published_location):
+    post = post_with_published_location
+
+    def is_visible():
+        post.refresh_from_db()
+        return post.is_publicly_visible
+
+    assert is_visible()
+    category, location = post.category, post.location
+
+    category.is_published = False
+    category.save()
+    assert not is_visible(), (
+        "Убедитесь, что снятие категории с публикации скрывает её посты."
+    )
+    category.is_published = True
+    category.save()
+    assert is_visible()
+
+    location.is_published = False
+    location.save()
+    assert not is_visible()
+    location.is_published = True
+    location.save()
+    assert is_visible()
+
+    post.is_published = False
+    post.save()
+    assert not is_visible()
+    post.is_published = True
+    post.save()
+
+    category.delete()
+    assert not is_visible()
+
+
+def test_anonymous_pages_are_cached_and_invalidated(
+        mixer: Mixer, client, user_client, post_with_published_location,
+        CommentModel):
+    post = post_with_published_location
+    urls = (
+        "/",
+        f"/posts/{post.id}/",
+        f"/category/{post.category.slug}/",
+        f"/profile/{post.author.username}/",
+    )
+    for url in urls:
+        assert client.get(url)["X-Page-Cache"] == "MISS"
+        assert client.get(url)["X-Page-Cache"] == "HIT", (
+            f"Убедитесь, что страница {url} кэшируется для анонимных"
+            " читателей."
+        )
+    assert "X-Page-Cache" not in user_client.get("/")
+
+    mixer.blend(CommentModel, post=post, is_published=True)
+    for url in urls:
+        response = client.get(url)
+        assert response["X-Page-Cache"] == "MISS", (
+            f"Убедитесь, что комментарий сбрасывает кэш страницы {url}."
+        )
+    assert "Комментарии (1)" in client.get("/").content.decode("utf-8")
+
+    other_category = mixer.blend("blog.Category", is_published=True)
+    for url in urls:
+        client.get(url)
+    mixer.blend(
+        "blog.Post", author=post.author, location=post.location,
+        category=other_category)
+    assert client.get(f"/posts/{post.id}/")["X-Page-Cache"] == "HIT"
+    assert client.get(
+        f"/category/{post.category.slug}/")["X-Page-Cache"] == "HIT"
+    assert client.get("/")["X-Page-Cache"] == "MISS"
+    assert client.get(
+        f"/profile/{post.author.username}/")["X-Page-Cache"] == "MISS"
+
+
+def test_user_changes_invalidate_their_pages(
+        mixer: Mixer, client, post_with_published_location):
+    author = post_with_published_location.author
+    profile = f"/profile/{author.username}/"
+    for url in ("/", profile):
+        client.get(url)
+    mixer.blend("auth.User")
+    assert client.get("/")["X-Page-Cache"] == "HIT", (
+        "Убедитесь, что регистрация пользователя не сбрасывает кэш"
+        " всех страниц."
+    )
+    author.first_name = "Новое имя"
+    author.save()
+    assert client.get("/")["X-Page-Cache"] == "HIT"
+    assert client.get(profile)["X-Page-Cache"] == "MISS", (
+        "Убедитесь, что изменение профиля сбрасывает кэш страницы автора."
+    )
+    author.username = "renamed"
+    author.save()
+    assert client.get("/")["X-Page-Cache"] == "MISS", (
+        "Убедитесь, что смена имени пользователя сбрасывает кэш всех"
+        " страниц."
+    )
+
+
+def test_invalidations_are_counted_per_scope():
+    from blog import cache
+
+    cache.reset_stats()
+    cache.bump_generations()
+    cache.bump_generations("feed")
+    cache.bump_generations("feed", "post:1", "post:2", "post:1")
+    assert cache.get_stats()["invalidations"] == 4, (
+        "Убедитесь, что счётчик сбросов растёт на число сброшенных"
+        " областей кэша."
+    )
+
+
+def test_post_cards_are_cached_per_post(
+        monkeypatch, user_client, post_with_published_location):
+    from blog.templatetags import blog_tags
+
+    post = post_with_published_location
+    rendered = []
+    original_render_card = blog_tags.render_card
+
+    def counting_render_card(item):
+        rendered.append(item.id)
+        return original_render_card(item)
+
+    monkeypatch.setattr(blog_tags, "render_card", counting_render_card)
+    user_client.get("/")
+    user_client.get(f"/profile/{post.author.username}/")
+    assert rendered == [post.id], (
+        "Убедитесь, что карточка публикации рендерится один раз и"
+        " переиспользуется на других страницах ленты."
+    )
+    post.title = "Новый заголовок"
+    post.save()
+    content = user_client.get("/").content.decode("utf-8")
+    assert rendered == [post.id, post.id]
+    assert "Новый заголовок" in content
+
+
+def test_conditional_get(
+        mixer: Mixer, client, user_client, post_with_published_location,
+        CommentModel):
+    post = post_with_published_location
+    for url in ("/", f"/posts/{post.id}/", f"/profile/{post.author.username}/",
+                f"/category/{post.category.slug}/"):
+        response = client.get(url)
+        assert response.has_header("ETag") and response.has_header(
+            "Last-Modified"), (
+            f"Убедитесь, что страница {url} отдаёт заголовки ETag и"
+            " Last-Modified."
+        )
+        not_modified = client.get(
+            url, HTTP_IF_NONE_MATCH=response["ETag"])
+        assert not_modified.status_code == HTTPStatus.NOT_MODIFIED
+        assert client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]
+        ).status_code == HTTPStatus.NOT_MODIFIED
+
+    detail_url = f"/posts/{post.id}/"
+    etag = client.get(detail_url)["ETag"]
+    assert user_client.get(
+        detail_url, HTTP_IF_NONE_MATCH=etag).status_code == HTTPStatus.OK, (
+        "Убедитесь, что ETag зависит от пользователя."
+    )
+    mixer.blend(CommentModel, post=post, is_published=True)
+    assert client.get(
+        detail_url, HTTP_IF_NONE_MATCH=etag).status_code == HTTPStatus.OK, (
+        "Убедитесь, что новый комментарий меняет ETag страницы поста."
+    )
+
+
+def test_scheduled_post_goes_live_at_boundary(
+        monkeypatch, mixer: Mixer, client, user_client,
+        post_with_published_location):
+    from blog import scheduling
+
+    post = post_with_published_location
+    pub_date = timezone.now() + timedelta(hours=1)
+    scheduled = mixer.blend(
+        "blog.Post", author=post.author, category=post.category,
+        location=post.location, pub_date=pub_date)
+
+    assert scheduling.next_publication("feed") == pub_date
+    response = client.get("/")
+    assert scheduled.id not in [
+        item.id for item in response.context["page_obj"]]
+    assert scheduling.cache_timeout(("feed",), 10 ** 6) <= 3600, (
+        "Убедитесь, что кэш ленты истекает к моменту отложенной публикации."
+    )
+
+    later = pub_date + timedelta(seconds=1)
+    monkeypatch.setattr(scheduling.timezone, "now", lambda: later)
+    assert scheduling.next_publication("feed") is None
+    response = user_client.get("/")
+    assert scheduled.id in [
+        item.id for item in response.context["page_obj"]], (
+        "Убедитесь, что отложенная публикация появляется в ленте, когда"
+        " наступает её время."
+    )
+
+
+def test_card_rows_render_like_models(post_with_published_location):
+    from django.template.loader import render_to_string
+
+    from blog.models import Post
+
+    post = post_with_published_location
+    post.text = " ".join(f"слово{i}" for i in range(30))
+    post.save()
+    row = Post.objects.filter(pk=post.pk).card_rows().get()
+    assert not hasattr(row, "__dict__"), (
+        "Убедитесь, что строки ленты объявляют `__slots__`."
+    )
+    assert render_to_string(
+        "includes/post_card.html", {"post": row}
+    ) == render_to_string(
+        "includes/post_card.html", {"post": Post.objects.get(pk=post.pk)}
+    )
+
+
+def test_rendered_text_is_stored_and_backfilled(
+        mixer: Mixer, post_with_published_location, CommentModel):
+    from blog.models import Post
+
+    post = post_with_published_location
+    post.text = "<b>первая</b>\nвторая"
+    post.save()
+    assert post.text_html == "&lt;b&gt;первая&lt;/b&gt;<br>вторая"
+    assert post.excerpt == "<b>первая</b> вторая"
+    comment = mixer.blend(CommentModel, post=post, text="а\nб")
+    assert comment.text_html == "а<br>б"
+
+    Post.objects.filter(pk=post.pk).update(excerpt="", text_html="")
+    CommentModel.objects.filter(pk=comment.pk).update(text_html="")
+    call_command("render_texts", batch_size=1, stdout=StringIO())
+    post.refresh_from_db()
+    comment.refresh_from_db()
+    assert post.text_html and post.excerpt and comment.text_html, (
+        "Убедитесь, что команда `render_texts` заполняет сохранённый HTML."
+    )
+
+
+def test_post_detail_pages_comments(
+        mixer: Mixer, client, django_assert_max_num_queries,
+        post_with_published_location, CommentModel):
+    from blog.views import COMMENTS_PER_PAGE
+
+    post = post_with_published_location
+    # Equal created_at values exercise the `id` tie-breaker.
+    created_at = timezone.now()
+    comments = mixer.cycle(COMMENTS_PER_PAGE + 5).blend(
+        CommentModel, post=post, created_at=created_at
+    )
+    CommentModel.objects.filter(post=post).update(created_at=created_at)
+    url = f"/posts/{post.id}/"
+    with django_assert_max_num_queries(4):
+        response = client.get(url)
+    assert response.status_code == HTTPStatus.OK
+    page = response.context["comments"]
+    assert [c.id for c in page] == [
+        c.id for c in comments[:COMMENTS_PER_PAGE]
+    ], "Убедитесь, что первая страница комментариев идёт по порядку."
+    assert page.has_next
+
+    response = client.get(url, {"comments_after": page.next_cursor})
+    assert [c.id for c in response.context["comments"]] == [
+        c.id for c in comments[COMMENTS_PER_PAGE:]
+    ], (
+        "Убедитесь, что параметр `comments_after` открывает следующую "
+        "страницу комментариев."
+    )
+    response = client.get(url, {"comments_after": "мусор"})
+    assert response.status_code == HTTPStatus.OK
+
+
+def test_numbered_pages_use_cached_count(
+        client, feed_posts, settings, monkeypatch):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    def count_queries(url):
+        with CaptureQueriesContext(connection) as captured:
+            response = client.get(url)
+        return response, [
+            q["sql"] for q in captured.captured_queries
+            if "COUNT(" in q["sql"]
+        ]
+
+    settings.BLOG_PAGE_CACHE_TIMEOUT = 0
+    response, counts = count_queries("/?page=2")
+    assert len(counts) == 1
+    assert response.context["page_obj"].paginator.num_pages == 3
+    response, counts = count_queries("/?page=1")
+    assert not counts, (
+        "Убедитесь, что число постов ленты берётся из кеша."
+    )
+    assert list(response.context["page_obj"].elided_page_range) == [1, 2, 3]
+
+    # A stale total never hides rows: the last page is read in full.
+    feed_posts[0].delete()
+    settings.BLOG_COUNT_REFRESH_ASYNC = True
+    from blog import counts
+
+    calls = []
+    monkeypatch.setattr(
+        counts._refresher, "submit", lambda *args: calls.append(args)
+    )
+    response, _ = count_queries("/?page=3")
+    page = response.context["page_obj"]
+    assert len(calls) == 1, (
+        "Убедитесь, что устаревшее число постов пересчитывается в фоне."
+    )
+    assert len(page) == N_PER_PAGE * 2 + 4 - 2 * N_PER_PAGE
+    assert page.paginator.count == N_PER_PAGE * 2 + 4
+    assert not page.has_next()
+
+
+def test_page_past_the_end_shows_last_page(
+        client, feed_posts, settings, published_category, user):
+    settings.BLOG_PAGE_CACHE_TIMEOUT = 0
+    for url in (
+        "/", f"/category/{published_category.slug}/",
+        f"/profile/{user.username}/",
+    ):
+        for page in ("9", "99999999999999999999"):
+            response = client.get(url, {"page": page})
+            assert response.status_code == HTTPStatus.OK, (
+                "Убедитесь, что номер страницы за концом ленты показывает "
+                "последнюю страницу."
+            )
+            assert response.context["page_obj"].number == 3
+
+
+def test_cached_count_expires(monkeypatch, settings):
+    from blog import counts
+    from blog.models import Post
+
+    timeouts = []
+
+    class RecordingCache:
+        def get(self, key, default=None):
+            return default
+
+        def set(self, key, value, timeout):
+            timeouts.append(timeout)
+
+    monkeypatch.setattr(counts, "cache", RecordingCache())
+    settings.BLOG_COUNT_CACHE_TIMEOUT = 120
+    counts.cached_count("feed", Post.objects.all(), ())
+    assert timeouts == [120], (
+        "Убедитесь, что число постов хранится в кеше ограниченное время."
+    )
+
+
+def test_search_ranks_visible_posts(
+        mixer: Mixer, client, user, published_category, published_location):
+    from blog.models import Post
+
+    def blend(title, text, **kwargs):
+        kwargs.setdefault("pub_date", timezone.now() - timedelta(days=1))
+        return mixer.blend(
+            "blog.Post", title=title, text=text, author=user,
+            category=published_category, location=published_location,
+            **kwargs
+        )
+
+    in_title = blend("Ёлочные игрушки", "Про праздник.")
+    in_text = blend("Зима", "Достали с антресолей елочные игрушки.")
+    blend("Лето", "Ничего общего.")
+    blend("Елочные игрушки черновик", "Текст", is_published=False)
+    blend(
+        "Елочные игрушки завтра", "Текст",
+        pub_date=timezone.now() + timedelta(days=1),
+    )
+    extra = [
+        blend(f"Разное {i}", "Елочные игрушки и много другого текста.")
+        for i in range(12)
+    ]
+
+    response = client.get("/search/", {"q": "елочн игрушк"})
+    assert response.status_code == HTTPStatus.OK
+    page = response.context["page_obj"]
+    ids = [post.id for post in page]
+    assert ids[0] == in_title.id, (
+        "Убедитесь, что совпадения в заголовке ранжируются выше."
+    )
+    assert page.has_next()
+    response = client.get(
+        "/search/", {"q": "елочн игрушк", "cursor": page.next_cursor}
+    )
+    ids += [post.id for post in response.context["page_obj"]]
+    assert sorted(ids) == sorted(
+        [in_title.id, in_text.id] + [post.id for post in extra]
+    ), (
+        "Убедитесь, что поиск находит только видимые публикации и "
+        "листается курсором без пропусков и повторов."
+    )
+
+    in_text.title = "Антресоли"
+    in_text.text = "Пусто"
+    in_text.save()
+    Post.objects.filter(pk=in_title.pk).delete()
+    call_command("reindex_search", batch_size=3, stdout=StringIO())
+    response = client.get("/search/", {"q": "игрушки"})
+    found = {post.id for post in response.context["page_obj"]}
+    assert not found & {in_title.id, in_text.id}, (
+        "Убедитесь, что индекс обновляется при изменении и удалении постов."
+    )
+    assert client.get("/search/", {"q": '"OR( -'}).status_code == 200
+    response = client.get("/search/", {"q": "*"})
+    assert response.status_code == 200, (
+        "Убедитесь, что запрос без слов не приводит к ошибке."
+    )
+    assert not list(response.context["page_obj"])
+
+
+def test_related_posts_are_precomputed(
+        mixer: Mixer, client, user, published_location, published_category,
+        settings, tmp_path, django_assert_max_num_queries):
+    settings.BLOG_RELATED_POSTS_DIR = tmp_path
+    texts = (
+        ("Поход в горы", "Палатка, рюкзак и горная тропа к перевалу."),
+        ("Горы зимой", "Тропа к перевалу под снегом, палатка и рюкзак."),
+        ("Рецепт пирога", "Мука, яблоки, корица и сахар для пирога."),
+        ("Яблочный пирог", "Яблоки с корицей, мука и сахар в духовке."),
+    )
+    posts = [
+        mixer.blend(
+            "blog.Post", author=user, category=published_category,
+            location=published_location, title=title, text=text,
+            pub_date=timezone.now() - timedelta(days=1),
+        )
+        for title, text in texts
+    ]
+    call_command("compute_related_posts", stdout=StringIO())
+    response = client.get(f"/posts/{posts[0].id}/")
+    related = [post_id for post_id, _ in response.context["related_posts"]]
+    assert related and related[0] == posts[1].id, (
+        "Убедитесь, что первой среди похожих публикаций показана "
+        "публикация с близким текстом."
+    )
+    assert posts[1].title in response.content.decode()
+
+    new_post = mixer.blend(
+        "blog.Post", author=user, category=published_category,
+        location=published_location, title="Пирог с яблоками",
+        text="Яблоки, корица, мука и сахар для пирога.",
+        pub_date=timezone.now() - timedelta(minutes=1),
+    )
+    call_command("compute_related_posts", "--incremental", stdout=StringIO())
+    response = client.get(f"/posts/{new_post.id}/")
+    related = {post_id for post_id, _ in response.context["related_posts"]}
+    assert {posts[2].id, posts[3].id} <= related, (
+        "Убедитесь, что `--incremental` подбирает похожие публикации "
+        "для новых постов."
+    )
+    response = client.get(f"/posts/{posts[2].id}/")
+    assert new_post.id in {
+        post_id for post_id, _ in response.context["related_posts"]
+    }, (
+        "Убедитесь, что новая публикация попадает в похожие у старых "
+        "публикаций."
+    )
+
+
+def test_republished_category_keeps_scheduled_post_hidden(
+        mixer: Mixer, client, post_with_published_location):
+    post = post_with_published_location
+    scheduled = mixer.blend(
+        "blog.Post", author=post.author, category=post.category,
+        location=post.location, pub_date=timezone.now() + timedelta(days=1))
+    category = post.category
+    category.is_published = False
+    category.save()
+    assert client.get("/").context["page_obj"].object_list == []
+
+    category.is_published = True
+    category.save()
+    response = client.get("/")
+    ids = [item.id for item in response.context["page_obj"]]
+    assert post.id in ids
+    assert scheduled.id not in ids, (
+        "Убедитесь, что после повторной публикации категории отложенные "
+        "публикации не появляются в ленте раньше времени."
+    )
+    response = client.get(f"/category/{category.slug}/")
+    assert scheduled.id not in [
+        item.id for item in response.context["page_obj"]]
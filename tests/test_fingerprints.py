@@ -0,0 +1,74 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from mixer.backend.django import Mixer
+
+pytestmark = [pytest.mark.django_db]
+
+SPAM = (
+    "Лучшие скидки недели только у нас, переходите по ссылке в профиле "
+    "и получите подарок за первый заказ"
+)
+
+
+def test_near_duplicate_comment_is_rejected(
+        user_client, post_with_published_location, CommentModel):
+    post = post_with_published_location
+    url = f"/posts/{post.id}/comment/"
+    user_client.post(url, {"text": SPAM})
+    user_client.post(url, {"text": SPAM.replace("недели", "месяца") + "!"})
+    user_client.post(url, {"text": "Отличный пост, спасибо автору!"})
+    assert list(
+        CommentModel.objects.filter(post=post).values_list("text", flat=True)
+    ) == [SPAM, "Отличный пост, спасибо автору!"], (
+        "Убедитесь, что почти одинаковый комментарий не сохраняется, "
+        "а непохожий сохраняется."
+    )
+
+
+def test_near_duplicate_post_is_flagged(
+        mixer: Mixer, user, published_category, published_location,
+        settings):
+    from blog.forms import PostForm
+
+    settings.BLOG_NEAR_DUPLICATES = "flag"
+    mixer.blend("blog.Post", title="Распродажа", text=SPAM, author=user)
+    form = PostForm(data={
+        "title": "Распродажа",
+        "text": SPAM + " сегодня",
+        "pub_date": "2020-01-01T10:00",
+        "category": published_category.id,
+        "location": published_location.id,
+        "is_published": True,
+    })
+    assert form.is_valid(), form.errors
+    assert not form.save(commit=False).is_published, (
+        "Убедитесь, что в режиме `flag` почти одинаковая публикация "
+        "сохраняется снятой с публикации."
+    )
+
+
+def test_fingerprint_backfill_and_benchmark(
+        mixer: Mixer, user, settings):
+    from blog.fingerprints import find_duplicate
+    from blog.models import Fingerprint
+
+    post = mixer.blend("blog.Post", title="Распродажа", text=SPAM)
+    Fingerprint.objects.all().delete()
+    assert find_duplicate(Fingerprint.POST, "Распродажа\n" + SPAM) is None
+    call_command("fingerprint_content", stdout=StringIO())
+    assert find_duplicate(
+        Fingerprint.POST, "Распродажа\n" + SPAM
+    ) == post.id, (
+        "Убедитесь, что `fingerprint_content` сохраняет отпечатки "
+        "уже существующих публикаций."
+    )
+
+    out = StringIO()
+    call_command(
+        "bench_fingerprints", signatures=2000, lookups=20, seed=1,
+        stdout=out,
+    )
+    assert "найдено 20/20" in out.getvalue()
+    assert not Fingerprint.objects.filter(kind="bench").exists()
@@ -0,0 +1,129 @@
+from io import BytesIO, StringIO
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from PIL import Image
+
+pytestmark = [pytest.mark.django_db]
+
+
+def jpeg(width, height):
+    buffer = BytesIO()
+    Image.new("RGB", (width, height), color=(73, 109, 137)).save(
+        buffer, format="JPEG"
+    )
+    return SimpleUploadedFile(
+        "photo.jpg", buffer.getvalue(), content_type="image/jpeg"
+    )
+
+
+@pytest.fixture
+def media_root(settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+    settings.BLOG_IMAGE_WIDTHS = (320, 640, 1024)
+    return tmp_path
+
+
+def test_upload_makes_image_variants(
+        user_client, user, published_category, published_location,
+        media_root):
+    from blog.models import Post
+
+    user_client.post("/posts/create/", {
+        "title": "Фото",
+        "text": "Большое фото",
+        "pub_date": "2020-01-01T10:00",
+        "category": published_category.id,
+        "location": published_location.id,
+        "is_published": True,
+        "image": jpeg(2000, 1000),
+    })
+    post = Post.objects.get(author=user)
+    content = user_client.get("/").content.decode()
+    assert post.image_variants == [] and "placeholder.svg" in content, (
+        "Убедитесь, что до обработки фото в карточке показывается заглушка."
+    )
+
+    call_command("runworker", "--once", stdout=StringIO())
+    post.refresh_from_db()
+    assert [
+        (item["width"], item["height"]) for item in post.image_variants
+    ] == [(320, 160), (640, 320), (1024, 512), (2000, 1000)], (
+        "Убедитесь, что при загрузке фото создаются уменьшенные копии, "
+        "а их размеры сохраняются в модели."
+    )
+    for item in post.image_variants:
+        assert (media_root / item["name"]).exists()
+        with Image.open(media_root / item["name"]) as stored:
+            assert stored.size == (item["width"], item["height"])
+
+    for url in ("/", f"/posts/{post.id}/"):
+        content = user_client.get(url).content.decode()
+        assert "640w" in content and 'sizes="' in content, (
+            "Убедитесь, что фото выводится с атрибутами `srcset` и `sizes`."
+        )
+        assert 'width="2000" height="1000"' in content
+
+
+def test_make_image_variants_backfills(
+        mixer, user, published_category, published_location, media_root):
+    from blog.models import Post
+
+    post = mixer.blend(
+        "blog.Post", author=user, category=published_category,
+        location=published_location, image=jpeg(700, 700),
+    )
+    Post.objects.filter(pk=post.pk).update(image_variants=[])
+    call_command("make_image_variants", stdout=StringIO())
+    post.refresh_from_db()
+    assert [item["width"] for item in post.image_variants] == [320, 640, 700]
+
+
+def test_unreadable_upload_still_renders(
+        mixer, client, user, published_category, published_location,
+        media_root):
+    post = mixer.blend(
+        "blog.Post", author=user, category=published_category,
+        location=published_location, is_published=True,
+        image=SimpleUploadedFile("photo.jpg", b"not an image"),
+    )
+    call_command("runworker", "--once", stdout=StringIO())
+    post.refresh_from_db()
+    assert post.image_variants[0]["width"] is None
+    for url in ("/", f"/posts/{post.id}/"):
+        response = client.get(url)
+        assert response.status_code == 200, (
+            "Убедитесь, что повреждённое фото не ломает страницы."
+        )
+        content = response.content.decode()
+        assert post.image.url in content and "srcset" not in content
+
+
+def test_failed_variants_job_shows_original(
+        monkeypatch, settings, mixer, client, user, published_category,
+        published_location, media_root):
+    from blog import tasks
+    from blog.models import Job
+
+    def broken(image):
+        raise RuntimeError("Сбой")
+
+    settings.BLOG_JOB_MAX_ATTEMPTS = 1
+    monkeypatch.setattr(tasks, "make_variants", broken)
+    post = mixer.blend(
+        "blog.Post", author=user, category=published_category,
+        location=published_location, is_published=True,
+        image=jpeg(800, 400),
+    )
+    content = client.get(f"/posts/{post.id}/").content.decode()
+    assert "placeholder.svg" in content, (
+        "Убедитесь, что до обработки фото на странице публикации "
+        "показывается заглушка."
+    )
+    call_command("runworker", "--once", stdout=StringIO())
+    assert Job.objects.get().status == Job.FAILED
+    content = client.get("/").content.decode()
+    assert "placeholder.svg" not in content and post.image.url in content, (
+        "Убедитесь, что после неудачной обработки показывается оригинал."
+    )
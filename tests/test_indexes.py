@@ -0,0 +1,73 @@
+import re
+
+import pytest
+from django.db import connection
+from django.db.models import Q
+
+pytestmark = [pytest.mark.django_db]
+
+
+def explain(queryset):
+    sql, params = queryset.query.sql_with_params()
+    prefix = {
+        "sqlite": "EXPLAIN QUERY PLAN",
+        "postgresql": "EXPLAIN",
+        "mysql": "EXPLAIN",
+    }.get(connection.vendor)
+    if prefix is None:
+        pytest.skip(f"EXPLAIN не поддерживается для {connection.vendor}")
+    with connection.cursor() as cursor:
+        cursor.execute(f"{prefix} {sql}", params)
+        return "\n".join(" ".join(map(str, row)) for row in cursor.fetchall())
+
+
+def page_of(queryset):
+    return queryset[:10]
+
+
+def assert_uses_index(plan, index_name):
+    assert index_name in plan, (
+        f"Убедитесь, что запрос ленты использует индекс `{index_name}`."
+        f"\n{plan}"
+    )
+    if connection.vendor == "sqlite":
+        # An ordered walk of the index ("SCAN ... USING INDEX") stops after
+        # LIMIT rows; a bare "SCAN blog_post" would read the whole table.
+        assert not re.search(r"SCAN blog_post(?! USING)", plan), plan
+        assert "TEMP B-TREE" not in plan, plan
+
+
+@pytest.fixture
+def feed():
+    from blog.views import get_post_list_with_comment_count
+
+    return get_post_list_with_comment_count
+
+
+def test_global_feed_uses_index(feed):
+    plan = explain(page_of(feed(filtrate=True)))
+    assert_uses_index(plan, "post_feed_idx")
+
+
+def test_category_feed_uses_index(feed, published_category):
+    plan = explain(page_of(feed(
+        filtrate=True, special_filters=Q(category=published_category)
+    )))
+    assert_uses_index(plan, "post_category_feed_idx")
+
+
+def test_author_feed_uses_index(feed, user):
+    for filtrate in (True, False):
+        plan = explain(page_of(feed(
+            filtrate=filtrate, special_filters=Q(author=user)
+        )))
+        assert_uses_index(plan, "post_author_feed_idx")
+
+
+def test_comments_lookup_uses_index(post_with_published_location):
+    from blog.models import Comment
+
+    plan = explain(Comment.objects.filter(post=post_with_published_location))
+    assert "comment_post_created_idx" in plan, plan
+    if connection.vendor == "sqlite":
+        assert "TEMP B-TREE" not in plan, plan
@@ -0,0 +1,82 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+
+pytestmark = [pytest.mark.django_db]
+
+
+@pytest.fixture
+def flaky_task(settings):
+    from blog import jobs
+
+    settings.BLOG_JOB_MAX_ATTEMPTS = 2
+    calls = []
+
+    @jobs.task("test_flaky")
+    def flaky(fail_times):
+        calls.append(fail_times)
+        if len(calls) <= fail_times:
+            raise RuntimeError("Сбой")
+
+    yield calls
+    del jobs.TASKS["test_flaky"]
+
+
+def run_due_jobs():
+    call_command("runworker", "--once", stdout=StringIO())
+
+
+def test_failed_job_is_retried_with_backoff(flaky_task):
+    from blog.jobs import enqueue
+    from blog.models import Job
+
+    job = enqueue("test_flaky", fail_times=1)
+    run_due_jobs()
+    job.refresh_from_db()
+    assert job.status == Job.QUEUED and job.attempts == 1
+    assert job.run_after > timezone.now(), (
+        "Убедитесь, что упавшая задача повторяется не сразу, а с задержкой."
+    )
+    assert "RuntimeError" in job.error
+
+    Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+    run_due_jobs()
+    job.refresh_from_db()
+    assert job.status == Job.DONE and job.attempts == 2
+    assert job.duration is not None and job.finished_at is not None, (
+        "Убедитесь, что для задачи сохраняется время выполнения."
+    )
+
+
+def test_job_fails_after_max_attempts(flaky_task):
+    from blog.jobs import enqueue
+    from blog.models import Job
+
+    job = enqueue("test_flaky", fail_times=5)
+    for _ in range(2):
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        run_due_jobs()
+    job.refresh_from_db()
+    assert job.status == Job.FAILED and len(flaky_task) == 2
+
+
+def test_claimed_job_is_not_claimed_again(flaky_task, settings):
+    from datetime import timedelta
+
+    from blog.jobs import claim, enqueue, requeue_stale
+    from blog.models import Job
+
+    job = enqueue("test_flaky", fail_times=0)
+    assert claim("first").pk == job.pk
+    assert claim("second") is None, (
+        "Убедитесь, что задачу не может взять второй обработчик."
+    )
+    Job.objects.filter(pk=job.pk).update(
+        started_at=timezone.now() - timedelta(
+            seconds=settings.BLOG_JOB_TIMEOUT + 1
+        )
+    )
+    assert requeue_stale() == 1
+    assert claim("second").worker == "second"
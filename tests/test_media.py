@@ -0,0 +1,78 @@
+import os
+from io import BytesIO
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.utils.http import http_date
+from PIL import Image
+
+pytestmark = [pytest.mark.django_db]
+
+
+@pytest.fixture
+def media_root(settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+    settings.BLOG_MEDIA_ACCEL = ""
+    return tmp_path
+
+
+@pytest.fixture
+def post_image(mixer, user, published_category, published_location,
+               media_root):
+    buffer = BytesIO()
+    Image.new("RGB", (300, 200), color=(1, 2, 3)).save(buffer, format="PNG")
+    post = mixer.blend(
+        "blog.Post", author=user, category=published_category,
+        location=published_location,
+        image=SimpleUploadedFile("photo.png", buffer.getvalue()),
+    )
+    return post.image
+
+
+def test_media_is_served_with_range_and_caching(client, post_image,
+                                                media_root):
+    content = (media_root / post_image.name).read_bytes()
+    response = client.get(post_image.url)
+    assert response.status_code == 200
+    assert b"".join(response.streaming_content) == content
+    assert response["Content-Type"] == "image/png"
+    assert "immutable" in response["Cache-Control"], (
+        "Убедитесь, что файлы с адресом по содержимому отдаются с "
+        "заголовком `Cache-Control: immutable`."
+    )
+
+    response = client.get(post_image.url, HTTP_RANGE="bytes=10-19")
+    assert response.status_code == 206, (
+        "Убедитесь, что медиафайлы поддерживают запросы с заголовком `Range`."
+    )
+    assert b"".join(response.streaming_content) == content[10:20]
+    assert response["Content-Range"] == f"bytes 10-19/{len(content)}"
+    response = client.get(post_image.url, HTTP_RANGE="bytes=-5")
+    assert b"".join(response.streaming_content) == content[-5:]
+    response = client.get(
+        post_image.url, HTTP_RANGE=f"bytes={len(content)}-"
+    )
+    assert response.status_code == 416
+
+    mtime = os.stat(media_root / post_image.name).st_mtime
+    response = client.get(
+        post_image.url, HTTP_IF_MODIFIED_SINCE=http_date(mtime)
+    )
+    assert response.status_code == 304, (
+        "Убедитесь, что медиафайлы поддерживают `If-Modified-Since`."
+    )
+    assert client.get("/media/.incoming/x").status_code == 404
+    assert client.get("/media/../manage.py").status_code == 404
+
+
+def test_media_transfer_is_left_to_the_proxy(client, settings, post_image):
+    settings.BLOG_MEDIA_ACCEL = "x-accel-redirect"
+    response = client.get(post_image.url)
+    assert response["X-Accel-Redirect"] == (
+        "/protected-media/" + post_image.name
+    ), "Убедитесь, что передачу файла можно поручить nginx."
+    assert response.content == b""
+
+    settings.BLOG_MEDIA_ACCEL = "x-sendfile"
+    response = client.get(post_image.url)
+    assert response["X-Sendfile"] == post_image.path
@@ -0,0 +1,67 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+pytestmark = [pytest.mark.django_db]
+
+
+def test_phrase_matcher_reports_positions():
+    from blog.moderation import PhraseMatcher
+
+    matcher = PhraseMatcher(["спам", "купи", "купи слона", "ёж"])
+    text = "Купи слона! Класс спамеров, ЕЖ и спам."
+    assert [tuple(match) for match in matcher.find(text)] == [
+        (0, 4, "Купи"),
+        (0, 10, "Купи слона"),
+        (28, 30, "ЕЖ"),
+        (33, 37, "спам"),
+    ], (
+        "Убедитесь, что фильтр находит все фразы целыми словами, без "
+        "учёта регистра, и сообщает их позиции в исходном тексте."
+    )
+
+
+def test_banned_phrases_reload_without_restart(
+        user_client, post_with_published_location, CommentModel):
+    from blog.models import BannedPhrase
+
+    post = post_with_published_location
+    url = f"/posts/{post.id}/comment/"
+    user_client.post(url, {"text": "Заходите в наш казино-клуб"})
+    BannedPhrase.objects.create(phrase="казино")
+    user_client.post(url, {"text": "Лучшее казино в городе"})
+    BannedPhrase.objects.filter(phrase="казино").delete()
+    user_client.post(url, {"text": "Казино закрыли"})
+    assert list(
+        CommentModel.objects.filter(post=post).values_list("text", flat=True)
+    ) == ["Заходите в наш казино-клуб", "Казино закрыли"], (
+        "Убедитесь, что комментарии с запрещёнными фразами отклоняются и "
+        "что изменения списка фраз применяются без перезапуска."
+    )
+
+
+def test_post_form_reports_banned_phrases(published_category):
+    from blog.forms import PostForm
+    from blog.models import BannedPhrase
+
+    BannedPhrase.objects.create(phrase="быстрый заработок")
+    form = PostForm(data={
+        "title": "Работа",
+        "text": "Предлагаю быстрый  заработок.",
+        "pub_date": "2020-01-01T10:00",
+        "category": published_category.id,
+    })
+    assert not form.is_valid()
+    assert form.errors["text"] == [
+        "Текст содержит запрещённые фразы: «быстрый  заработок» (символ 11)."
+    ]
+
+
+def test_bench_banned_phrases():
+    out = StringIO()
+    call_command(
+        "bench_banned_phrases", phrases=200, megabytes=0.05, seed=1,
+        stdout=out,
+    )
+    assert "МБ/с" in out.getvalue()
@@ -0,0 +1,103 @@
+import sqlite3
+
+import pytest
+from django.db import connection, connections
+
+REPLICA = "replica"
+
+
+@pytest.fixture
+def snapshot_replica(tmp_path, settings):
+    # A second SQLite file standing in for a replica: it holds a copy of
+    # the primary taken when the test calls the fixture, and never
+    # receives later writes, like a replica lagging behind.
+    if connection.vendor != "sqlite":
+        pytest.skip("Реплика имитируется копией файла SQLite")
+    path = tmp_path / "replica.sqlite3"
+
+    def snapshot():
+        connection.ensure_connection()
+        target = sqlite3.connect(path)
+        connection.connection.backup(target)
+        target.close()
+        connections.settings[REPLICA] = {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": str(path),
+        }
+        connections.ensure_defaults(REPLICA)
+        connections.prepare_test_settings(REPLICA)
+        settings.BLOG_READ_REPLICAS = [REPLICA]
+
+    yield snapshot
+    if REPLICA in connections.settings:
+        connections[REPLICA].close()
+        del connections[REPLICA]
+        del connections.settings[REPLICA]
+
+
+def test_router_sends_writes_to_primary(settings):
+    from blog.models import Post
+    from blog.routing import ReplicaRouter, _replica_reads
+
+    settings.BLOG_READ_REPLICAS = [REPLICA]
+    router = ReplicaRouter()
+    assert router.db_for_read(Post) == "default"
+    token = _replica_reads.set(True)
+    try:
+        assert router.db_for_read(Post) == REPLICA
+        assert router.db_for_write(Post) == "default"
+    finally:
+        _replica_reads.reset(token)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_writer_is_pinned_to_primary(
+        settings, user_client, post_with_published_location,
+        snapshot_replica):
+    post = post_with_published_location
+    snapshot_replica()
+    url = f"/posts/{post.id}/"
+    text = "Только что написанный комментарий"
+
+    response = user_client.post(f"{url}comment/", {"text": text})
+    assert settings.BLOG_PRIMARY_PIN_COOKIE in response.cookies, (
+        "Убедитесь, что после записи пользователь закрепляется за основной "
+        "базой с помощью cookie."
+    )
+    assert text in user_client.get(url).content.decode(), (
+        "Убедитесь, что автор сразу видит свой комментарий."
+    )
+
+    del user_client.cookies[settings.BLOG_PRIMARY_PIN_COOKIE]
+    assert text not in user_client.get(url).content.decode(), (
+        "Убедитесь, что страница поста читается с реплики."
+    )
+
+
+@pytest.mark.django_db(transaction=True)
+def test_cached_boundaries_and_counts_come_from_primary(
+        mixer, post_with_published_location, snapshot_replica):
+    from datetime import timedelta
+
+    from django.utils import timezone
+
+    from blog import scheduling
+    from blog.counts import cached_count
+    from blog.models import Post
+    from blog.routing import _replica_reads
+
+    post = post_with_published_location
+    snapshot_replica()
+    pub_date = timezone.now() + timedelta(hours=1)
+    mixer.blend(
+        "blog.Post", author=post.author, category=post.category,
+        location=post.location, pub_date=pub_date)
+    token = _replica_reads.set(True)
+    try:
+        assert scheduling.next_publication("feed") == pub_date, (
+            "Убедитесь, что ближайшая отложенная публикация, которая "
+            "кэшируется, читается с основной базы, а не с реплики."
+        )
+        assert cached_count("test", Post.objects.all(), ("feed",)) == 2
+    finally:
+        _replica_reads.reset(token)
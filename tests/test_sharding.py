@@ -0,0 +1,168 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db import connection, connections
+from mixer.backend.django import Mixer
+
+pytestmark = [pytest.mark.django_db]
+
+SHARDS = ("comments_1", "comments_2", "comments_3")
+
+
+@pytest.fixture
+def comment_shards(tmp_path, settings, CommentModel):
+    # Local SQLite files standing in for the comment shard databases.
+    if connection.vendor != "sqlite":
+        pytest.skip("Шарды имитируются файлами SQLite")
+
+    def add_shards(aliases=SHARDS):
+        settings.BLOG_COMMENT_SHARDS = list(aliases)
+        for alias in set(aliases) - set(connections.settings):
+            connections.settings[alias] = {
+                "ENGINE": "django.db.backends.sqlite3",
+                "NAME": str(tmp_path / f"{alias}.sqlite3"),
+            }
+            connections.ensure_defaults(alias)
+            connections.prepare_test_settings(alias)
+            # The shards get the comment table only, without constraints
+            # on the posts and users of `default`.
+            call_command(
+                "migrate", "blog", database=alias, verbosity=0,
+                stdout=StringIO(),
+            )
+
+    yield add_shards
+    for alias in SHARDS:
+        if alias in connections.settings:
+            connections[alias].close()
+            del connections[alias]
+            del connections.settings[alias]
+
+
+@pytest.fixture
+def posts(mixer: Mixer, user, published_location, published_category):
+    return mixer.cycle(6).blend(
+        "blog.Post",
+        author=user,
+        category=published_category,
+        location=published_location,
+    )
+
+
+def stored_in(CommentModel, alias):
+    return set(
+        CommentModel._base_manager.using(alias).values_list("pk", flat=True)
+    )
+
+
+def test_comments_are_spread_by_post(
+        mixer: Mixer, comment_shards, posts, CommentModel, user):
+    from blog.sharding import shard_for_post
+
+    comment_shards()
+    comments = [
+        CommentModel.objects.create(post=post, author=user, text=f"№{i}")
+        for i, post in enumerate(posts * 2)
+    ]
+    for comment in comments:
+        assert comment.pk in stored_in(
+            CommentModel, shard_for_post(comment.post_id)
+        ), "Убедитесь, что комментарий хранится в шарде своего поста."
+    assert not stored_in(CommentModel, "default")
+    assert len({shard_for_post(post.pk) for post in posts}) > 1
+
+    post = posts[0]
+    assert CommentModel.objects.filter(post=post).count() == 2
+    assert post.comments.count() == 2
+    post.refresh_from_db()
+    assert post.published_comment_count == 2
+
+    newest = CommentModel.objects.order_by("-created_at", "-id")[:5]
+    assert [c.pk for c in newest] == [c.pk for c in comments[::-1][:5]], (
+        "Убедитесь, что выборка по всем шардам объединяется в порядке "
+        "сортировки."
+    )
+    assert CommentModel.objects.count() == len(comments)
+    assert CommentModel.objects.get(pk=comments[3].pk) == comments[3]
+
+
+def test_sharded_pages_and_admin(
+        comment_shards, posts, CommentModel, user, user_client, admin_client):
+    comment_shards()
+    for post in posts:
+        CommentModel.objects.create(
+            post=post, author=user, text=f"Комментарий к {post.pk}"
+        )
+    post = posts[0]
+    content = user_client.get(f"/posts/{post.id}/").content.decode()
+    assert f"Комментарий к {post.pk}" in content
+
+    response = admin_client.get("/admin/blog/comment/")
+    content = response.content.decode()
+    assert all(f"Комментарий к {post.pk}" in content for post in posts), (
+        "Убедитесь, что админка показывает комментарии всех шардов."
+    )
+
+    post.delete()
+    assert CommentModel.objects.count() == len(posts) - 1
+
+
+def test_rebalance_moves_comments(
+        comment_shards, posts, CommentModel, user):
+    from blog.sharding import shard_for_post
+
+    comments = [
+        CommentModel.objects.create(post=post, author=user, text="текст")
+        for post in posts
+    ]
+    comment_shards(SHARDS[:2])
+    call_command("rebalance_comments", batch_size=2, stdout=StringIO())
+    for comment in comments:
+        assert comment.pk in stored_in(
+            CommentModel, shard_for_post(comment.post_id)
+        ), "Убедитесь, что `rebalance_comments` переносит комментарии."
+    assert not stored_in(CommentModel, "default")
+
+    comment_shards(SHARDS)
+    call_command(
+        "rebalance_comments", dry_run=True, stdout=(out := StringIO())
+    )
+    assert stored_in(CommentModel, SHARDS[2]) == set()
+    call_command("rebalance_comments", stdout=StringIO())
+    assert CommentModel.objects.count() == len(comments)
+    for comment in comments:
+        assert comment.pk in stored_in(
+            CommentModel, shard_for_post(comment.post_id)
+        )
+    assert "Будет перенесено" in out.getvalue()
+
+    from blog.models import Post
+
+    Post.objects.update(published_comment_count=0)
+    call_command("recount_comments", stdout=StringIO())
+    assert set(Post.objects.filter(
+        pk__in=[post.pk for post in posts]
+    ).values_list("published_comment_count", flat=True)) == {1}, (
+        "Убедитесь, что `recount_comments` считает комментарии по шардам."
+    )
+
+
+def test_only_shards_drop_comment_constraints(comment_shards, CommentModel):
+    def foreign_keys(alias):
+        with connections[alias].cursor() as cursor:
+            constraints = connections[alias].introspection.get_constraints(
+                cursor, CommentModel._meta.db_table
+            )
+        return {
+            column
+            for item in constraints.values() if item["foreign_key"]
+            for column in item["columns"]
+        }
+
+    comment_shards()
+    assert {"post_id", "author_id"} <= foreign_keys("default"), (
+        "Убедитесь, что без шардирования комментарии сохраняют внешние "
+        "ключи на публикацию и автора."
+    )
+    assert not foreign_keys(SHARDS[0]) & {"post_id", "author_id"}
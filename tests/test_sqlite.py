@@ -0,0 +1,66 @@
+import pytest
+from django.db import connection
+
+pytestmark = [pytest.mark.django_db]
+
+
+def test_sqlite_connections_are_tuned(settings):
+    if connection.vendor != "sqlite":
+        pytest.skip("Настройки рассчитаны на SQLite")
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA busy_timeout")
+        busy_timeout = cursor.fetchone()[0]
+    assert busy_timeout == settings.BLOG_SQLITE_PRAGMAS["busy_timeout"], (
+        "Убедитесь, что новые соединения с SQLite получают настройки из "
+        "`BLOG_SQLITE_PRAGMAS`."
+    )
+
+
+@pytest.mark.django_db(transaction=True)
+def test_serialized_write_retries_locked_database(settings):
+    from django.db import OperationalError
+
+    from blog.sqlite import serialized_write
+
+    settings.BLOG_SQLITE_WRITE_BACKOFF = 0
+    attempts = []
+
+    @serialized_write
+    def write():
+        attempts.append(connection.in_atomic_block)
+        if len(attempts) < 3:
+            raise OperationalError("database is locked")
+        return "ok"
+
+    assert write() == "ok"
+    assert attempts == [True] * 3, (
+        "Убедитесь, что запись при заблокированной базе повторяется "
+        "в отдельной транзакции."
+    )
+
+    settings.BLOG_SQLITE_WRITE_RETRIES = 1
+    attempts.clear()
+    with pytest.raises(OperationalError):
+        write()
+    assert len(attempts) == 2
+
+
+def test_post_deletion_is_a_serialized_write(
+        monkeypatch, user_client, post_with_published_location):
+    from blog import views
+    from blog.models import Post
+
+    wrapped = []
+
+    def serialized_write(func):
+        wrapped.append(func)
+        return func
+
+    monkeypatch.setattr(views, "serialized_write", serialized_write)
+    post = post_with_published_location
+    user_client.post(f"/posts/{post.id}/delete/")
+    assert not Post.objects.filter(pk=post.id).exists()
+    assert wrapped, (
+        "Убедитесь, что удаление публикации проходит через "
+        "`serialized_write`."
+    )
@@ -0,0 +1,123 @@
+from io import BytesIO, StringIO
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from PIL import Image
+
+pytestmark = [pytest.mark.django_db]
+
+
+def jpeg(name, color):
+    buffer = BytesIO()
+    Image.new("RGB", (900, 600), color=color).save(buffer, format="JPEG")
+    return SimpleUploadedFile(
+        name, buffer.getvalue(), content_type="image/jpeg"
+    )
+
+
+@pytest.fixture
+def media_root(settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+    settings.BLOG_IMAGE_WIDTHS = (320,)
+    return tmp_path
+
+
+def blob(name):
+    from blog.models import MediaBlob
+
+    return MediaBlob.objects.filter(name=name).first()
+
+
+def test_identical_uploads_share_one_file(
+        mixer, user, published_category, published_location, media_root):
+    from blog.models import Post
+
+    first, second = (
+        mixer.blend(
+            "blog.Post", author=user, category=published_category,
+            location=published_location, image=jpeg(name, (10, 20, 30)),
+        )
+        for name in ("photo.jpg", "copy.JPG")
+    )
+    assert first.image.name == second.image.name, (
+        "Убедитесь, что одинаковые файлы сохраняются под одним именем."
+    )
+    assert first.image.url == second.image.url
+    assert first.image.name.startswith("post_images/")
+    assert first.image.name.endswith(".jpg")
+    stored = [path for path in media_root.rglob("*.jpg")]
+    assert len(stored) == 1
+    assert blob(first.image.name).references == 2, (
+        "Убедитесь, что файл считает ссылающиеся на него публикации."
+    )
+
+    call_command("runworker", "--once", stdout=StringIO())
+    second.refresh_from_db()
+    variant = second.image_variants[0]["name"]
+    assert blob(variant).references == 2
+
+    first.delete()
+    assert blob(first.image.name).references == 1
+    first.image.storage.delete(second.image.name)
+    assert (media_root / second.image.name).exists(), (
+        "Убедитесь, что файл, на который ссылается публикация, не удаляется."
+    )
+
+    second.image = jpeg("other.jpg", (200, 10, 10))
+    second.save()
+    assert blob(first.image.name).references == 0
+    assert blob(variant).references == 0
+    assert blob(second.image.name).references == 1
+    Post.objects.all().delete()
+    assert blob(second.image.name).references == 0
+
+
+def test_gcmedia_removes_orphans(
+        mixer, user, published_category, published_location, media_root):
+    import os
+    import time
+
+    from blog.models import MediaBlob, Post
+
+    kept, deleted = (
+        mixer.blend(
+            "blog.Post", author=user, category=published_category,
+            location=published_location, image=jpeg("photo.jpg", color),
+        )
+        for color in ((5, 5, 5), (250, 250, 250))
+    )
+    legacy = media_root / "post_images" / "legacy.jpg"
+    legacy.write_bytes(b"old upload")
+    Post.objects.filter(pk=kept.pk).update(
+        image_variants=[{"name": "post_images/legacy.jpg", "width": 10}]
+    )
+    orphan = media_root / deleted.image.name
+    deleted.delete()
+    fresh = media_root / "post_images" / "fresh.jpg"
+    fresh.write_bytes(b"in flight")
+    week_ago = time.time() - 7 * 24 * 60 * 60
+    for path in (orphan, legacy, media_root / kept.image.name):
+        os.utime(path, (week_ago, week_ago))
+
+    out = StringIO()
+    size = orphan.stat().st_size
+    call_command("gcmedia", "--dry-run", stdout=out)
+    assert "Можно удалить файлов: 1" in out.getvalue()
+    assert orphan.exists()
+
+    out = StringIO()
+    call_command("gcmedia", "--chunk-size", "1", stdout=out)
+    assert not orphan.exists(), (
+        "Убедитесь, что `gcmedia` удаляет файлы удалённых публикаций."
+    )
+    assert f"({size} байт)" in out.getvalue(), (
+        "Убедитесь, что `gcmedia` сообщает, сколько места освобождено."
+    )
+    assert all(path.exists() for path in (
+        legacy, fresh, media_root / kept.image.name,
+    )), (
+        "Убедитесь, что `gcmedia` оставляет используемые и только что "
+        "загруженные файлы."
+    )
+    assert not MediaBlob.objects.filter(name=deleted.image.name).exists()